@@ -0,0 +1,157 @@
+"""
+Handle the builds made by the programs that use the package as a library.
+
+The builds run in memory: the config is a dict instead of a file, and the generated files are returned instead of
+created. The state that doesn't depend on a config is kept between the builds of the process: the compiled templates,
+the decoded source images and the generated images. Then the next builds of a site only render what changed.
+"""
+from __future__ import annotations
+
+import collections
+import pathlib
+import threading
+from typing import Any
+from typing import Dict
+from typing import Mapping
+from typing import NamedTuple
+from typing import Optional
+from typing import Tuple
+
+from PIL import Image
+
+from cushead.generator import cache as generator_cache
+from cushead.generator import config as generator_config
+from cushead.generator import files
+from cushead.generator import report as generator_report
+
+# The maximum number of decoded source images kept in memory.
+DEFAULT_MAX_SOURCE_IMAGES = 16
+# The config keys of the source images that are decoded once per content.
+SOURCE_IMAGE_KEYS = ("favicon_png", "preview_png")
+
+
+class BuildResult(NamedTuple):
+    """
+    Store the result of a build.
+    """
+
+    # The generated files, with their paths relative to the output folder.
+    files: Tuple[files.File, ...]
+    build_report: generator_report.BuildReport
+
+
+class SourceImages:
+    """
+    Keep the decoded source images, so the builds that use the same file don't decode it again.
+
+    The images are identified by their resolved paths, modification times and sizes, then a changed file is decoded
+    again. The least recently used images are removed first.
+    """
+
+    def __init__(self, *, max_images: int = DEFAULT_MAX_SOURCE_IMAGES) -> None:
+        """
+        Initialize the source images.
+
+        Args:
+            max_images: the maximum number of decoded images kept in memory.
+        """
+        self.max_images = max_images
+        self.images: collections.OrderedDict[Tuple[pathlib.Path, int, int], Image.Image] = collections.OrderedDict()
+        self.lock = threading.Lock()
+
+    def get_image(self, *, path: pathlib.Path) -> Optional[Image.Image]:
+        """
+        Get a decoded PNG image.
+
+        Args:
+            path: the image path.
+
+        Returns:
+            The image, or None if the file isn't a PNG image. The invalid files are reported when the config is parsed.
+        """
+        try:
+            resolved_path = path.resolve()
+            stat = resolved_path.stat()
+        except OSError:
+            return None
+        key = (resolved_path, stat.st_mtime_ns, stat.st_size)
+        with self.lock:
+            if key in self.images:
+                self.images.move_to_end(key)
+                return self.images[key]
+        try:
+            image = Image.open(resolved_path)
+            if image.format != "PNG":
+                image.close()
+                return None
+            image.load()
+        except (OSError, Image.UnidentifiedImageError):
+            return None
+        with self.lock:
+            self.images[key] = image
+            while len(self.images) > self.max_images:
+                self.images.popitem(last=False)
+        return image
+
+    def get_images(self, *, sources: pathlib.Path, config: Mapping[str, Any]) -> Dict[pathlib.Path, Image.Image]:
+        """
+        Get the decoded source images of a config.
+
+        Args:
+            sources: the folder where the references of the config are resolved.
+            config: the config, that isn't validated.
+
+        Returns:
+            The images, by their resolved paths.
+        """
+        images = {}
+        for key in SOURCE_IMAGE_KEYS:
+            if isinstance(config.get(key), str) and config[key]:
+                image = self.get_image(path=sources / config[key])
+                if image is not None:
+                    images[(sources / config[key]).resolve()] = image
+        return images
+
+
+# The state shared by the builds of the process.
+shared_cache = generator_cache.MemoryCache()
+shared_source_images = SourceImages()
+
+
+def build(*, config: Mapping[str, Any], sources: pathlib.Path, jobs: int = 1, cache: Optional[generator_cache.DiskCache] = None) -> BuildResult:
+    """
+    Build a config in memory.
+
+    Nothing is printed and no file is created.
+
+    Args:
+        config: the config, with the same structure as a config file.
+        sources: the folder where the references of the config are resolved, like the folder of a config file.
+        jobs: the number of workers used to generate the images and the pages.
+        cache: the cache of the generated images. Default: a cache in memory shared by all the builds of the process.
+
+    Returns:
+        The generated files.
+
+    Raises:
+        MainException: when the config or its references are invalid.
+    """
+    config = dict(config)
+    generator_config.validate_config(config=config)
+    sources = pathlib.Path(sources)
+    images = shared_source_images.get_images(sources=sources, config=config)
+    parsed_config = generator_config.parse_config(path=sources, config=config, images=images)
+    build_report = generator_report.BuildReport()
+    try:
+        output_folder_path = parsed_config["output_folder_path"]
+        generated_files = tuple(
+            files.File(path=pathlib.Path(file.path).relative_to(output_folder_path), data=file.data)
+            for file in files.generate_files(config=parsed_config, jobs=jobs, cache=shared_cache if cache is None else cache, report=build_report)
+        )
+    finally:
+        # The images that aren't shared are opened for this build only.
+        shared_images = {id(image) for image in images.values()}
+        for image in (parsed_config["favicon_ico"], parsed_config["favicon_png"], parsed_config["preview_png"]):
+            if image is not None and id(image) not in shared_images:
+                image.close()
+    return BuildResult(files=generated_files, build_report=build_report)
@@ -0,0 +1,321 @@
+"""
+Handle the builds of many config files in one run.
+
+The sites are built in a pool of processes. The PNG images referenced by more than one config are decoded once in the
+main process and stored in shared memory, so the sites that use the same image don't decode it again, and the pixels
+aren't copied to each process. The other images are decoded by the process that builds their site.
+"""
+from __future__ import annotations
+
+import argparse
+import collections
+import contextlib
+import glob
+import os
+import pathlib
+from concurrent import futures
+from multiprocessing import shared_memory
+from typing import Any
+from typing import Counter
+from typing import Dict
+from typing import Iterator
+from typing import List
+from typing import Mapping
+from typing import NamedTuple
+from typing import Optional
+from typing import Tuple
+from typing import cast
+
+from PIL import Image
+
+from cushead import exceptions
+from cushead.console.arguments import config
+from cushead.console.arguments import files_creator
+from cushead.generator import cache as generator_cache
+from cushead.generator import images
+from cushead.generator import report as generator_report
+
+# The config keys of the images that can be shared.
+SHARED_IMAGE_KEYS = ("favicon_png", "preview_png")
+# The image modes that can be stored in shared memory as they are decoded.
+SHARED_IMAGE_MODES = ("L", "LA", "RGB", "RGBA")
+# The maximum size of the images stored in shared memory, in bytes.
+MAX_SHARED_SIZE = 64 * 1024 ** 2
+# The folder of the shared memory, on Linux.
+SHARED_MEMORY_FOLDER = "/dev/shm"
+
+
+class SharedImage(NamedTuple):
+    """
+    Store data about a decoded image stored in shared memory.
+    """
+
+    name: str
+    mode: str
+    size: Tuple[int, int]
+    info: Dict[str, Any]
+    filename: str
+
+
+class SiteResult(NamedTuple):
+    """
+    Store the result of the build of a config file.
+    """
+
+    path: pathlib.Path
+    created_files: int = 0
+    errors: Tuple[files_creator.Error, ...] = ()
+    build_report: Optional[generator_report.BuildReport] = None
+    exception: Optional[str] = None
+
+
+def get_config_paths(*, path: str) -> List[pathlib.Path]:
+    """
+    Get the config files of a batch.
+
+    Args:
+        path: a folder, whose subfolders have a config.json file each, or a glob pattern of the config files.
+
+    Returns:
+        The config files.
+
+    Raises:
+        BadReference: when there isn't any config file.
+    """
+    if pathlib.Path(path).is_dir():
+        config_paths = sorted(pathlib.Path(path).glob("*/config.json"))
+    else:
+        config_paths = sorted(pathlib.Path(match) for match in glob.glob(path, recursive=True) if pathlib.Path(match).is_file())
+    if not config_paths:
+        raise exceptions.BadReference(
+            "\n".join(
+                (
+                    f"The batch ({path}) doesn't match any config file.",
+                    f"ABSOLUTE PATH: {pathlib.Path(path).absolute()}",
+                ),
+            ),
+        )
+    return config_paths
+
+
+def get_image_paths(*, config_path: pathlib.Path) -> Iterator[pathlib.Path]:
+    """
+    Get the paths of the images of a config file that can be shared.
+
+    The config file isn't validated, the invalid ones are reported when the site is built.
+
+    Args:
+        config_path: the config file path.
+
+    Yields:
+        The resolved paths of the existing images.
+    """
+    try:
+        config_file = config.read_config_file(path=config_path)
+    except (OSError, exceptions.MainException):
+        return
+    if not isinstance(config_file, dict):
+        return
+    for key in SHARED_IMAGE_KEYS:
+        if isinstance(config_file.get(key), str):
+            image_path = (config_path.parent / config_file[key]).resolve()
+            if image_path.is_file():
+                yield image_path
+
+
+def get_shared_size_limit(*, max_size: int) -> int:
+    """
+    Get the maximum size of the images stored in shared memory.
+
+    On Linux, the shared memory is a folder in memory, that can be smaller than the maximum size in containers. Writing
+    past its free space stops the process instead of raising an error, so it's never exceeded.
+
+    Args:
+        max_size: the maximum size, in bytes.
+
+    Returns:
+        The maximum size, in bytes.
+    """
+    try:
+        stat = os.statvfs(SHARED_MEMORY_FOLDER)
+    except (OSError, AttributeError):
+        return max_size
+    return min(max_size, stat.f_bavail * stat.f_frsize)
+
+
+def get_image_paths_by_digest(*, config_paths: List[pathlib.Path]) -> Dict[str, List[pathlib.Path]]:
+    """
+    Get the images used by more than one config file, without decoding them.
+
+    Args:
+        config_paths: the config files.
+
+    Returns:
+        The resolved paths of the images, by the hash of their content.
+    """
+    digests: Dict[pathlib.Path, str] = {}
+    configs_by_digest: Counter[str] = collections.Counter()
+    for config_path in config_paths:
+        config_digests = set()
+        for image_path in get_image_paths(config_path=config_path):
+            if image_path not in digests:
+                try:
+                    digests[image_path] = images.get_file_digest(path=image_path)
+                except OSError:
+                    continue
+            config_digests.add(digests[image_path])
+        configs_by_digest.update(config_digests)
+
+    image_paths_by_digest: Dict[str, List[pathlib.Path]] = {}
+    for image_path, digest in digests.items():
+        if configs_by_digest[digest] > 1:
+            image_paths_by_digest.setdefault(digest, []).append(image_path)
+    return image_paths_by_digest
+
+
+@contextlib.contextmanager
+def share_images(*, config_paths: List[pathlib.Path], max_size: int = MAX_SHARED_SIZE) -> Iterator[Dict[pathlib.Path, SharedImage]]:
+    """
+    Decode the images used by more than one config file and store them in shared memory.
+
+    The files with the same content are decoded once. The images used by a single config file, the ones that don't fit
+    in the maximum size, the ones that can't be decoded or have a mode that can't be shared, and all of them when the
+    shared memory can't be created, are left to the process that builds the site.
+
+    Args:
+        config_paths: the config files.
+        max_size: the maximum size of the shared images, in bytes.
+
+    Yields:
+        The shared images, by their resolved paths. The shared memory is released at the exit.
+    """
+    shared_images: Dict[pathlib.Path, SharedImage] = {}
+    memories: List[shared_memory.SharedMemory] = []
+    available_size = get_shared_size_limit(max_size=max_size)
+    try:
+        for image_paths in get_image_paths_by_digest(config_paths=config_paths).values():
+            try:
+                with Image.open(image_paths[0]) as image:
+                    if image.format != "PNG" or image.mode not in SHARED_IMAGE_MODES:
+                        continue
+                    # The size is known from the header, before the image is decoded.
+                    size = image.width * image.height * len(image.getbands())
+                    if size > available_size:
+                        continue
+                    try:
+                        memory = shared_memory.SharedMemory(create=True, size=max(size, 1))
+                    except OSError:
+                        # The shared memory isn't available, so the remaining images are left to the workers too.
+                        break
+                    memories.append(memory)
+                    # The buffer is only None once the memory is closed.
+                    cast(memoryview, memory.buf)[:size] = image.tobytes()
+                    available_size -= size
+                    for image_path in image_paths:
+                        shared_images[image_path] = SharedImage(
+                            name=memory.name, mode=image.mode, size=image.size, info=dict(image.info), filename=str(image_path)
+                        )
+            except (OSError, Image.UnidentifiedImageError):
+                continue
+        yield shared_images
+    finally:
+        for memory in memories:
+            memory.close()
+            memory.unlink()
+
+
+# The shared memory attached by each worker process, by name.
+attached_memories: Dict[str, shared_memory.SharedMemory] = {}
+
+
+def attach_image(*, shared_image: SharedImage) -> Image.Image:
+    """
+    Get an image stored in shared memory, without copying its pixels.
+
+    Args:
+        shared_image: the shared image.
+
+    Returns:
+        The image, that can be used as if it was read from its file.
+    """
+    if shared_image.name not in attached_memories:
+        attached_memories[shared_image.name] = shared_memory.SharedMemory(name=shared_image.name)
+    memory = attached_memories[shared_image.name]
+    image = Image.frombuffer(shared_image.mode, shared_image.size, memory.buf, "raw", shared_image.mode, 0, 1)
+    image.info.update(shared_image.info)
+    image.format = "PNG"
+    # Used to compute the cache keys of the generated images.
+    image.filename = shared_image.filename
+    return image
+
+
+def build_site(
+    *,
+    path: pathlib.Path,
+    parser_namespace: argparse.Namespace,
+    shared_images: Mapping[pathlib.Path, SharedImage],
+    cache: Optional[generator_cache.DiskCache] = None,
+) -> SiteResult:
+    """
+    Build the site of a config file.
+
+    Args:
+        path: the config file path.
+        parser_namespace: the parser.
+        shared_images: the images stored in shared memory, by their resolved paths.
+        cache: the cache of the generated images and the compiled templates.
+
+    Returns:
+        The result of the build.
+    """
+    files_writer = files_creator.FilesWriter()
+    build_report = generator_report.BuildReport()
+    images = {image_path: attach_image(shared_image=shared_image) for image_path, shared_image in shared_images.items()}
+    try:
+        files_to_create = config.parse_config_file(
+            path=path,
+            png_profile=parser_namespace.png_profile,
+            minify=parser_namespace.minify,
+            precompress=parser_namespace.precompress,
+            fingerprint=parser_namespace.fingerprint,
+            images=images,
+            cache=cache,
+            skip_path=files_writer.skip_path,
+            report=build_report,
+        )
+        for file in files_to_create:
+            files_writer.write_file(file=file)
+    except exceptions.MainException as exception:
+        return SiteResult(path=path, exception=str(exception))
+    return SiteResult(path=path, created_files=files_writer.created_files, errors=tuple(files_writer.errors), build_report=build_report)
+
+
+def build_sites(*, path: str, parser_namespace: argparse.Namespace, cache: Optional[generator_cache.DiskCache] = None) -> Iterator[SiteResult]:
+    """
+    Build the sites of the config files of a batch in a pool of processes.
+
+    Each site is built by one process, and the number of processes is the number of jobs.
+
+    Args:
+        path: a folder, whose subfolders have a config.json file each, or a glob pattern of the config files.
+        parser_namespace: the parser.
+        cache: the cache of the generated images and the compiled templates, shared by all the sites.
+
+    Yields:
+        The result of each build, in the order of the config files.
+    """
+    config_paths = get_config_paths(path=path)
+    with share_images(config_paths=config_paths) as shared_images:
+        with futures.ProcessPoolExecutor(max_workers=parser_namespace.jobs or 1) as executor:
+            pending_sites = [
+                executor.submit(
+                    build_site,
+                    path=config_path,
+                    parser_namespace=parser_namespace,
+                    shared_images={image_path: shared_images[image_path] for image_path in get_image_paths(config_path=config_path) if image_path in shared_images},
+                    cache=cache,
+                )
+                for config_path in config_paths
+            ]
+            for pending_site in pending_sites:
+                yield pending_site.result()
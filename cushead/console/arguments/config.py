@@ -1,18 +1,29 @@
 """
 Handle the config file.
 """
+import collections
 import json
 import pathlib
 from json import decoder
 from typing import Any
-from typing import Tuple
+from typing import Callable
+from typing import Iterator
+from typing import Mapping
+from typing import Optional
 from typing import TypedDict
 
+from PIL import Image
+
 from cushead import exceptions
 from cushead import info
 from cushead.console.assets import assets
+from cushead.generator import cache as generator_cache
 from cushead.generator import config
+from cushead.generator import dependencies as generator_dependencies
 from cushead.generator import files
+from cushead.generator import pages
+from cushead.generator import report as generator_report
+from cushead.generator import sitemaps
 
 
 class DefaultConfig(TypedDict):
@@ -120,17 +131,99 @@ def read_config_file(*, path: pathlib.Path) -> Any:
         )
 
 
-def parse_config_file(*, path: pathlib.Path) -> Tuple[files.File, ...]:
+def load_config_file(
+    *,
+    path: pathlib.Path,
+    png_profile: Optional[str] = None,
+    minify: bool = False,
+    precompress: bool = False,
+    fingerprint: bool = False,
+    images: Optional[Mapping[pathlib.Path, Image.Image]] = None,
+) -> config.Config:
     """
-    Parse a config file.
+    Read, validate and parse a config file.
+
+    The referenced images are opened, but their pixel data isn't decoded.
 
     Args:
         path: path where the config file is stored.
+        png_profile: if defined, it replaces the png_profile key of the config file.
+        minify: if True, it replaces the minify key of the config file.
+        precompress: if True, it replaces the precompress key of the config file.
+        fingerprint: if True, it replaces the fingerprint key of the config file.
+        images: the PNG images that are already decoded, by their resolved paths.
 
     Returns:
-        The files to generate based on the config file.
+        The parsed config.
     """
     config_file = read_config_file(path=path)
+    if png_profile and isinstance(config_file, dict):
+        config_file["png_profile"] = png_profile
+    if minify and isinstance(config_file, dict):
+        config_file["minify"] = True
+    if precompress and isinstance(config_file, dict):
+        config_file["precompress"] = True
+    if fingerprint and isinstance(config_file, dict):
+        config_file["fingerprint"] = True
     config.validate_config(config=config_file)
-    parsed_config = config.parse_config(path=pathlib.Path(path).parent, config=config_file)
-    return files.generate_files(config=parsed_config)
+    return config.parse_config(path=pathlib.Path(path).parent, config=config_file, images=images)
+
+
+def check_config_file(*, path: pathlib.Path) -> None:
+    """
+    Check a config file and all its references, without generating any file.
+
+    Args:
+        path: path where the config file is stored.
+    """
+    parsed_config = load_config_file(path=path)
+    for key in ("favicon_ico", "favicon_png", "preview_png"):
+        image = parsed_config[key]
+        if image is not None:
+            try:
+                config.decode_image(key=key, image=image, verify_only=True)
+            finally:
+                image.close()
+    if parsed_config["sitemap_urls"]:
+        collections.deque(sitemaps.read_urls(path=parsed_config["sitemap_urls"]), maxlen=0)
+    if parsed_config["pages"]:
+        collections.deque(pages.read_pages(path=parsed_config["pages"]), maxlen=0)
+
+
+def parse_config_file(
+    *,
+    path: pathlib.Path,
+    jobs: int = 1,
+    png_profile: Optional[str] = None,
+    minify: bool = False,
+    precompress: bool = False,
+    fingerprint: bool = False,
+    images: Optional[Mapping[pathlib.Path, Image.Image]] = None,
+    cache: Optional[generator_cache.DiskCache] = None,
+    skip_path: Optional[Callable[[pathlib.Path], bool]] = None,
+    report: Optional[generator_report.BuildReport] = None,
+    dependencies: Optional[generator_dependencies.Dependencies] = None,
+) -> Iterator[files.File]:
+    """
+    Parse a config file.
+
+    The config is validated immediately, but the files are generated lazily.
+
+    Args:
+        path: path where the config file is stored.
+        jobs: the number of workers used to generate the images and the pages.
+        png_profile: if defined, it replaces the png_profile key of the config file.
+        minify: if True, it replaces the minify key of the config file.
+        precompress: if True, it replaces the precompress key of the config file.
+        fingerprint: if True, it replaces the fingerprint key of the config file.
+        images: the PNG images that are already decoded, by their resolved paths.
+        cache: the cache of the generated images and the compiled templates.
+        skip_path: if defined, the files whose path makes it return True are never generated.
+        report: if defined, the statistics of the build are collected on it.
+        dependencies: if defined, the config keys read to generate each file are recorded on it.
+
+    Returns:
+        The files to generate based on the config file.
+    """
+    parsed_config = load_config_file(path=path, png_profile=png_profile, minify=minify, precompress=precompress, fingerprint=fingerprint, images=images)
+    return files.generate_files(config=parsed_config, jobs=jobs, cache=cache, skip_path=skip_path, report=report, dependencies=dependencies)
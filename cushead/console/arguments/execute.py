@@ -2,18 +2,28 @@
 Interpret the arguments and execute the actions related to each one.
 """
 import argparse
+import itertools
 import pathlib
 import sys
+from typing import Iterable
+from typing import Iterator
 from typing import List
+from typing import Optional
 from typing import Tuple
 
 from cushead import exceptions
 from cushead.console import logs
+from cushead.console.arguments import batch
 from cushead.console.arguments import config
 from cushead.console.arguments import files_creator
+from cushead.console.arguments import serve
 from cushead.console.arguments import setup
+from cushead.console.arguments import watch
 from cushead.console.assets import assets
+from cushead.generator import cache
+from cushead.generator import dependencies as generator_dependencies
 from cushead.generator import files
+from cushead.generator import report
 
 
 def generate_images(*, path: pathlib.Path) -> Tuple[files.File, ...]:
@@ -35,25 +45,88 @@ def generate_images(*, path: pathlib.Path) -> Tuple[files.File, ...]:
     )
 
 
-def handle_args(*, parser_namespace: argparse.Namespace) -> List[files.File]:
+def get_cache(*, parser_namespace: argparse.Namespace) -> Optional[cache.DiskCache]:
+    """
+    Get the cache of the generated images and the compiled templates.
+
+    Args:
+        parser_namespace: the parser.
+
+    Returns:
+        The cache, or None if it's disabled.
+    """
+    if parser_namespace.no_cache:
+        return None
+    return cache.DiskCache(
+        path=pathlib.Path(parser_namespace.cache_dir) if parser_namespace.cache_dir else cache.get_default_path(),
+        max_size=parser_namespace.cache_size * 1024 ** 2 if parser_namespace.cache_size else cache.DEFAULT_MAX_SIZE,
+    )
+
+
+def handle_args(
+    *,
+    parser_namespace: argparse.Namespace,
+    files_writer: files_creator.FilesWriter,
+    build_report: Optional[report.BuildReport] = None,
+    dependencies: Optional[generator_dependencies.Dependencies] = None,
+) -> Iterator[files.File]:
     """
     Handle parser arguments.
 
     Args:
         parser_namespace: the parser.
+        files_writer: the writer that will create the files.
+        build_report: if defined, the statistics of the build are collected on it.
+        dependencies: if defined, the config keys read to generate each file are recorded on it.
 
     Returns:
-        The files to create.
+        The files to create, generated lazily.
     """
-    files_to_create = []
+    files_to_create: List[Iterable[files.File]] = []
     path = pathlib.Path(parser_namespace.FILE)
     if parser_namespace.default:
-        files_to_create.append(config.generate_default_config_file(path=path))
+        files_to_create.append((config.generate_default_config_file(path=path),))
     if parser_namespace.images:
-        files_to_create.extend(generate_images(path=path.parent))
+        files_to_create.append(generate_images(path=path.parent))
     if parser_namespace.config:
-        files_to_create.extend(config.parse_config_file(path=path))
-    return files_to_create
+        files_to_create.append(
+            config.parse_config_file(
+                path=path,
+                jobs=parser_namespace.jobs or 1,
+                png_profile=parser_namespace.png_profile,
+                minify=parser_namespace.minify,
+                precompress=parser_namespace.precompress,
+                fingerprint=parser_namespace.fingerprint,
+                cache=get_cache(parser_namespace=parser_namespace),
+                skip_path=files_writer.skip_path,
+                report=build_report,
+                dependencies=dependencies,
+            )
+        )
+    return itertools.chain.from_iterable(files_to_create)
+
+
+def build_batch(*, parser_namespace: argparse.Namespace) -> None:
+    """
+    Build or check the config files of a batch, and print a summary of all of them.
+
+    Args:
+        parser_namespace: the parser.
+
+    Raises:
+        BuildFailed: when some sites can't be built.
+    """
+    if parser_namespace.validate_only:
+        for path in batch.get_config_paths(path=parser_namespace.FILE):
+            config.check_config_file(path=path)
+            logs.show_valid_config(path=path)
+        return
+
+    site_results = list(batch.build_sites(path=parser_namespace.FILE, parser_namespace=parser_namespace, cache=get_cache(parser_namespace=parser_namespace)))
+    logs.show_batch_summary(site_results=site_results)
+    failed_sites = sum(1 for site_result in site_results if site_result.exception is not None)
+    if failed_sites:
+        raise exceptions.BuildFailed(f"Can't build {failed_sites} of {len(site_results)} sites.")
 
 
 def parse_args(*, args: List[str]) -> None:
@@ -67,7 +140,26 @@ def parse_args(*, args: List[str]) -> None:
     try:
         parser_namespace = parser.parse_args(args=args)
         setup.validate_args(parser_namespace=parser_namespace, args=args)
-        files_to_create = handle_args(parser_namespace=parser_namespace)
-        files_creator.create_files(files_to_create=files_to_create)
+        if parser_namespace.batch:
+            build_batch(parser_namespace=parser_namespace)
+            return
+        if parser_namespace.validate_only:
+            config.check_config_file(path=pathlib.Path(parser_namespace.FILE))
+            logs.show_valid_config(path=pathlib.Path(parser_namespace.FILE))
+            return
+        if parser_namespace.serve:
+            serve.serve_config(path=pathlib.Path(parser_namespace.FILE), parser_namespace=parser_namespace, cache=get_cache(parser_namespace=parser_namespace))
+            return
+        if parser_namespace.watch:
+            watch.watch_config(path=pathlib.Path(parser_namespace.FILE), parser_namespace=parser_namespace, cache=get_cache(parser_namespace=parser_namespace))
+            return
+        dependencies = generator_dependencies.Dependencies(cache=get_cache(parser_namespace=parser_namespace)) if parser_namespace.incremental else None
+        files_writer = files_creator.FilesWriter(dependencies=dependencies)
+        build_report = report.BuildReport()
+        files_to_create = handle_args(parser_namespace=parser_namespace, files_writer=files_writer, build_report=build_report, dependencies=dependencies)
+        files_creator.create_files(files_to_create=files_to_create, files_writer=files_writer)
+        if dependencies:
+            dependencies.save()
+        logs.show_build_report(build_report=build_report)
     except (KeyboardInterrupt, exceptions.MainException) as exception:
         sys.exit(logs.get_exception_message(parser=parser, message=str(exception)))
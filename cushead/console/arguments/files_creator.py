@@ -4,13 +4,14 @@ Handle the files creation.
 from __future__ import annotations
 
 import pathlib
-from typing import Dict
+from typing import Iterable
 from typing import List
 from typing import NamedTuple
 from typing import Optional
-from typing import Tuple
+from typing import Set
 
 from cushead.console import logs
+from cushead.generator import dependencies as generator_dependencies
 from cushead.generator import files
 
 
@@ -23,113 +24,104 @@ class Error(NamedTuple):
     path: pathlib.Path
 
 
-class Node:
+class FilesWriter:
     """
-    Represent a node.
+    Write files as soon as they are generated.
 
-    Can have child nodes and own data.
+    It keeps track of the created paths and the folders that can't be created, so the generator can skip the files that
+    would be written again or can't be written at all, before generating them. With the dependencies of a previous
+    build, it also skips the files whose inputs didn't change.
+
+    When a path is generated more than once, the first file is kept. An empty file is created as an empty file. The
+    pages of the pages file are only counted, so the memory used doesn't grow with the number of pages: their paths are
+    validated to be different than the other files, that are generated before them.
     """
 
-    def __init__(self, *, name: str, data: Optional[bytes] = None) -> None:
+    def __init__(self, *, dependencies: Optional[generator_dependencies.Dependencies] = None) -> None:
         """
-        Create a node.
+        Initialize a files writer.
 
         Args:
-            name: the name.
-            data: the data.
+            dependencies: if defined, the files that it finds unchanged are skipped.
         """
-        self.name = name
-        self.data = data
-        self.childrens: Dict[str, Node] = {}
+        self.dependencies = dependencies
+        self.created_paths: Set[pathlib.Path] = set()
+        self.created_pages = 0
+        self.failed_folders: Set[pathlib.Path] = set()
+        self.errors: List[Error] = []
 
-    def add_child(self, *, parts: Tuple[str, ...], data: bytes) -> None:
+    def skip_path(self, path: pathlib.Path) -> bool:
         """
-        Add children node.
-
-        To add a child node, you must define its path within the current node. Each part of the path represents a node.
-        The path is interpreted as follows: the first part represents a child node of the current node, the second part
-        represents a child node of the first node.
-        The last part is the node to be added, it is to which the defined data will be added. If any of the nodes in
-        the path does not exist, it will be created.
+        Check if a file doesn't need to be generated.
 
         Args:
-            parts: path of the child in the node.
-            data: child data.
-        """
-        if len(parts) > 1:
-            if parts[0] not in self.childrens:
-                self.childrens[parts[0]] = Node(name=parts[0])
-            self.childrens[parts[0]].add_child(parts=parts[1:], data=data)
-        else:
-            self.childrens[parts[0]] = Node(name=parts[0], data=data)
-
-
-def create_node(*, node_items: List[files.File]) -> Node:
-    """
-    Create a node structure based on a list of files to create.
+            path: the file path.
 
-    Args:
-        node_items: a list that have info about the files to create.
-
-    Returns:
-        A node tree.
-    """
-    base_path = Node(name="")
-    for file in node_items:
-        base_path.add_child(parts=pathlib.Path(file.path).parts, data=file.data)
-    return base_path
-
-
-def parse_node(*, node: Node, base_path: pathlib.Path) -> Tuple[bool, List[Error]]:
-    """
-    Create a representation of a node in the system directory.
+        Returns:
+            True if the file has been already created, its folder can't be created, or it's unchanged since the previous
+            build.
+        """
+        if path in self.created_paths or any(folder in self.failed_folders for folder in path.parents):
+            return True
+        return bool(self.dependencies and self.dependencies.is_unchanged(path))
 
-    Args:
-        node: the node.
-        base_path: the base path where the files will be created.
+    def write_file(self, *, file: files.File) -> None:
+        """
+        Write a file, creating its parent folders if needed.
 
-    Returns:
-        If at least one file has been created.
-        Files with errors.
-    """
-    errors = []
-    file_has_been_created = False
-
-    for name, subnode in sorted(node.childrens.items()):
-        destination_path = base_path / name
-
-        # Create children node.
-        if subnode.data:
-            try:
-                destination_path.write_bytes(subnode.data or bytes())
-            except OSError as exception:
-                errors.append(Error(error=str(exception.__class__.__name__), path=destination_path))
+        Args:
+            file: the file.
+        """
+        path = pathlib.Path(file.path)
+        if self.skip_path(path):
+            return
+
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+        except OSError as exception:
+            self.failed_folders.add(path.parent)
+            self.errors.append(Error(error=str(exception.__class__.__name__), path=path.parent))
+            return
+
+        try:
+            path.write_bytes(file.data)
+        except OSError as exception:
+            self.errors.append(Error(error=str(exception.__class__.__name__), path=path))
+        else:
+            if isinstance(file, files.PageFile):
+                self.created_pages += 1
             else:
-                file_has_been_created = True
-                logs.show_created_file(path=destination_path)
+                self.created_paths.add(path)
 
-        # Create parent node.
-        else:
-            if not destination_path.exists():
-                destination_path.mkdir()
-            sub_node_created_files, sub_node_errors = parse_node(node=subnode, base_path=destination_path)
-            file_has_been_created = file_has_been_created or sub_node_created_files
-            errors.extend(sub_node_errors)
+    @property
+    def created_files(self) -> int:
+        """
+        Get the number of created files.
 
-    return file_has_been_created, errors
+        Returns:
+            The number of created files, including the pages.
+        """
+        return len(self.created_paths) + self.created_pages
 
 
-def create_files(*, files_to_create: List[files.File]) -> None:
+def create_files(*, files_to_create: Iterable[files.File], files_writer: FilesWriter) -> None:
     """
-    Create files based on a list.
+    Create files based on an iterable.
+
+    Each file is written as soon as the iterable produces it, and the created files are printed sorted at the end,
+    followed by the number of created pages.
 
     Args:
-        files_to_create: a list that have info about the elements to create inside the node.
+        files_to_create: an iterable that have info about the files to create.
+        files_writer: the writer used to create the files.
     """
-    node = create_node(node_items=files_to_create)
-
+    for file in files_to_create:
+        files_writer.write_file(file=file)
     print("Created files:")
-    created_files, errors = parse_node(node=node, base_path=pathlib.Path(""))
-    if not created_files:
+    for path in sorted(files_writer.created_paths):
+        logs.show_created_file(path=path)
+    if files_writer.created_pages:
+        logs.show_created_pages(count=files_writer.created_pages)
+    if not files_writer.created_files:
         print(" * No one file has been created.")
-    logs.show_created_file_errors(errors=errors)
+    logs.show_created_file_errors(errors=files_writer.errors)
@@ -0,0 +1,341 @@
+"""
+Handle the local server of the files generated from a config file.
+
+The files are kept in memory, so nothing is written to the output folder. Each response has a strong ETag computed from
+its content, the conditional requests are answered without a body when the ETag matches, and the text files are
+compressed with gzip when the client accepts it.
+"""
+from __future__ import annotations
+
+import argparse
+import hashlib
+import http.server
+import mimetypes
+import pathlib
+import urllib.parse
+from typing import Dict
+from typing import Iterable
+from typing import NamedTuple
+from typing import Optional
+from typing import Tuple
+
+from cushead import exceptions
+from cushead import info
+from cushead.console import logs
+from cushead.console.arguments import config
+from cushead.generator import cache as generator_cache
+from cushead.generator import compression
+from cushead.generator import files
+from cushead.generator import report as generator_report
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8000
+# The content types of the generated files, which the mimetypes module doesn't always agree on between platforms.
+CONTENT_TYPES = {
+    ".html": "text/html; charset=utf-8",
+    ".xml": "application/xml; charset=utf-8",
+    ".json": "application/json",
+    ".js": "text/javascript; charset=utf-8",
+    ".css": "text/css; charset=utf-8",
+    ".txt": "text/plain; charset=utf-8",
+    ".svg": "image/svg+xml",
+    ".png": "image/png",
+    ".ico": "image/x-icon",
+    ".gz": "application/gzip",
+    ".br": "application/octet-stream",
+}
+DEFAULT_CONTENT_TYPE = "application/octet-stream"
+# The files are revalidated on each request, so the changes are always seen, but the unchanged ones aren't downloaded.
+CACHE_CONTROL = "no-cache"
+
+
+class Representation(NamedTuple):
+    """
+    Store a representation of a served file.
+    """
+
+    data: bytes
+    etag: str
+
+
+class Resource(NamedTuple):
+    """
+    Store data about a served file.
+    """
+
+    content_type: str
+    identity: Representation
+    gzip: Optional[Representation] = None
+
+
+def get_etag(*, data: bytes) -> str:
+    """
+    Get a strong ETag of some data.
+
+    Args:
+        data: the data.
+
+    Returns:
+        The ETag, quoted.
+    """
+    return f'"{hashlib.sha256(data).hexdigest()[0:32]}"'
+
+
+def get_content_type(*, path: pathlib.Path) -> str:
+    """
+    Get the content type of a file.
+
+    Args:
+        path: the file path.
+
+    Returns:
+        The content type.
+    """
+    if path.suffix in CONTENT_TYPES:
+        return CONTENT_TYPES[path.suffix]
+    content_type, _ = mimetypes.guess_type(path.name)
+    return content_type or DEFAULT_CONTENT_TYPE
+
+
+def get_resource(*, file: files.File) -> Resource:
+    """
+    Get a file ready to serve.
+
+    The gzip representation is only stored for the text files that get smaller enough.
+
+    Args:
+        file: the file.
+
+    Returns:
+        The resource.
+    """
+    path = pathlib.Path(file.path)
+    gzip_representation = None
+    if path.suffix in compression.COMPRESSIBLE_SUFFIXES:
+        gzip_data = compression.compress_gzip(file.data)
+        if len(gzip_data) < len(file.data) * compression.MAX_COMPRESSION_RATIO:
+            gzip_representation = Representation(data=gzip_data, etag=get_etag(data=gzip_data))
+    return Resource(content_type=get_content_type(path=path), identity=Representation(data=file.data, etag=get_etag(data=file.data)), gzip=gzip_representation)
+
+
+def get_resources(*, files_to_serve: Iterable[files.File], output_folder_path: pathlib.Path) -> Dict[str, Resource]:
+    """
+    Get the files ready to serve.
+
+    Args:
+        files_to_serve: the files.
+        output_folder_path: the folder where the files would be created, that is served as the root.
+
+    Returns:
+        The resources, by their URL paths.
+    """
+    return {"/" + pathlib.Path(file.path).relative_to(output_folder_path).as_posix(): get_resource(file=file) for file in files_to_serve}
+
+
+def get_url_path(*, request_path: str) -> str:
+    """
+    Get the path of the resource of a request.
+
+    Args:
+        request_path: the path of the request, that can include a query.
+
+    Returns:
+        The URL path. The paths of the folders point to their index page.
+    """
+    url_path = urllib.parse.unquote(urllib.parse.urlsplit(request_path).path) or "/"
+    if url_path.endswith("/"):
+        url_path += "index.html"
+    return url_path
+
+
+def accepts_gzip(*, accept_encoding: str) -> bool:
+    """
+    Check if a client accepts the gzip encoding.
+
+    Args:
+        accept_encoding: the value of the Accept-Encoding header.
+
+    Returns:
+        True if gzip, or any encoding, is accepted with a weight greater than zero.
+    """
+    weights: Dict[str, float] = {}
+    for coding in accept_encoding.split(","):
+        name, *parameters = (part.strip() for part in coding.split(";"))
+        weight = 1.0
+        for parameter in parameters:
+            key, _, value = parameter.partition("=")
+            if key.strip().lower() == "q":
+                try:
+                    weight = float(value)
+                except ValueError:
+                    weight = 0.0
+        if name:
+            weights[name.lower()] = weight
+    return weights.get("gzip", weights.get("x-gzip", weights.get("*", 0.0))) > 0
+
+
+def matches_etag(*, if_none_match: str, etag: str) -> bool:
+    """
+    Check if a conditional request matches an ETag.
+
+    The comparison is weak, as required for the If-None-Match header.
+
+    Args:
+        if_none_match: the value of the If-None-Match header.
+        etag: the ETag of the current representation.
+
+    Returns:
+        True if the client already has the representation.
+    """
+    candidates = [candidate.strip() for candidate in if_none_match.split(",")]
+    return "*" in candidates or etag in (candidate[2:] if candidate.startswith("W/") else candidate for candidate in candidates)
+
+
+class Server(http.server.ThreadingHTTPServer):
+    """
+    Serve the files from memory.
+    """
+
+    def __init__(self, *, address: Tuple[str, int], resources: Dict[str, Resource]) -> None:
+        """
+        Initialize a server.
+
+        Args:
+            address: the host and the port. The port 0 uses any free port.
+            resources: the files to serve, by their URL paths.
+        """
+        super().__init__(address, RequestHandler)
+        self.resources = resources
+
+
+class RequestHandler(http.server.BaseHTTPRequestHandler):
+    """
+    Answer the requests of the served files.
+    """
+
+    server: Server
+    server_version = f"{info.PACKAGE_NAME}/{info.PACKAGE_VERSION}"
+    protocol_version = "HTTP/1.1"
+
+    def send_resource(self, *, send_body: bool) -> None:
+        """
+        Send the resource of the request.
+
+        Args:
+            send_body: if False, only the headers are sent, as required for the HEAD requests.
+        """
+        resource = self.server.resources.get(get_url_path(request_path=self.path))
+        if resource is None:
+            self.send_error(http.HTTPStatus.NOT_FOUND)
+            return
+
+        representation = resource.identity
+        if resource.gzip and accepts_gzip(accept_encoding=self.headers.get("Accept-Encoding", "")):
+            representation = resource.gzip
+
+        if matches_etag(if_none_match=self.headers.get("If-None-Match", ""), etag=representation.etag):
+            self.send_response(http.HTTPStatus.NOT_MODIFIED)
+            self.send_common_headers(resource=resource, representation=representation)
+            self.end_headers()
+            return
+
+        self.send_response(http.HTTPStatus.OK)
+        self.send_common_headers(resource=resource, representation=representation)
+        self.send_header("Content-Type", resource.content_type)
+        self.send_header("Content-Length", str(len(representation.data)))
+        if representation is resource.gzip:
+            self.send_header("Content-Encoding", "gzip")
+        self.end_headers()
+        if send_body:
+            self.wfile.write(representation.data)
+
+    def send_common_headers(self, *, resource: Resource, representation: Representation) -> None:
+        """
+        Send the headers shared by the full and the not modified responses.
+
+        Args:
+            resource: the served file.
+            representation: the representation chosen for the request.
+        """
+        self.send_header("ETag", representation.etag)
+        self.send_header("Cache-Control", CACHE_CONTROL)
+        if resource.gzip:
+            self.send_header("Vary", "Accept-Encoding")
+
+    def do_GET(self) -> None:
+        """
+        Answer a GET request.
+        """
+        self.send_resource(send_body=True)
+
+    def do_HEAD(self) -> None:
+        """
+        Answer a HEAD request.
+        """
+        self.send_resource(send_body=False)
+
+    def log_request(self, code: object = "-", size: object = "-") -> None:
+        """
+        Print the request and the status of its response.
+        """
+        logs.show_served_request(request_line=self.requestline, status=str(int(code)) if isinstance(code, int) else str(code))
+
+    def log_message(self, format: str, *args: object) -> None:
+        """
+        Don't print the messages of the base class, like the errors, on stderr.
+        """
+
+
+def build_resources(*, path: pathlib.Path, parser_namespace: argparse.Namespace, cache: Optional[generator_cache.DiskCache] = None) -> Dict[str, Resource]:
+    """
+    Build a config file in memory.
+
+    Args:
+        path: the config file path.
+        parser_namespace: the parser.
+        cache: the cache of the generated images and the compiled templates.
+
+    Returns:
+        The files ready to serve, by their URL paths.
+    """
+    parsed_config = config.load_config_file(
+        path=path,
+        png_profile=parser_namespace.png_profile,
+        minify=parser_namespace.minify,
+        precompress=parser_namespace.precompress,
+        fingerprint=parser_namespace.fingerprint,
+    )
+    build_report = generator_report.BuildReport()
+    files_to_serve = files.generate_files(config=parsed_config, jobs=parser_namespace.jobs or 1, cache=cache, report=build_report)
+    resources = get_resources(files_to_serve=files_to_serve, output_folder_path=parsed_config["output_folder_path"])
+    logs.show_build_report(build_report=build_report)
+    return resources
+
+
+def serve_config(*, path: pathlib.Path, parser_namespace: argparse.Namespace, cache: Optional[generator_cache.DiskCache] = None) -> None:
+    """
+    Build a config file in memory, and serve the files on a local port.
+
+    It runs until it's interrupted.
+
+    Args:
+        path: the config file path.
+        parser_namespace: the parser.
+        cache: the cache of the generated images and the compiled templates.
+
+    Raises:
+        InvalidValue: when the server can't listen on the port.
+    """
+    resources = build_resources(path=path, parser_namespace=parser_namespace, cache=cache)
+    port = DEFAULT_PORT if parser_namespace.port is None else parser_namespace.port
+    try:
+        http_server = Server(address=(DEFAULT_HOST, port), resources=resources)
+    except OSError as exception:
+        raise exceptions.InvalidValue(f"Can't serve on {DEFAULT_HOST}:{port}: {exception.strerror or exception}.") from exception
+    with http_server:
+        # The port is the one assigned by the system when it's 0.
+        logs.show_serving(url=f"http://{DEFAULT_HOST}:{http_server.server_port}/", served_files=len(resources))
+        try:
+            http_server.serve_forever()
+        except KeyboardInterrupt:
+            return
@@ -8,6 +8,8 @@ from typing import List
 from cushead import exceptions
 from cushead import info
 from cushead.console.assets import assets
+from cushead.generator import cache
+from cushead.generator import config
 
 
 def get_parser() -> argparse.ArgumentParser:
@@ -20,7 +22,7 @@ def get_parser() -> argparse.ArgumentParser:
     parser = argparse.ArgumentParser(
         prog=info.PACKAGE_NAME,
         formatter_class=argparse.RawDescriptionHelpFormatter,
-        usage=f"{info.PACKAGE_NAME} {{ --help | {{ --config | --default [ --images ] }} FILE }}",
+        usage=f"{info.PACKAGE_NAME} {{ --help | {{ {{ --config | --batch }} [ CONFIG ARGUMENTS ] | --default [ --images ] }} FILE }}",
         allow_abbrev=False,
         add_help=False,
         epilog="\n".join(
@@ -30,12 +32,19 @@ def get_parser() -> argparse.ArgumentParser:
                 f"  {info.PACKAGE_NAME} --default --images config.json",
                 "2) Run that config:",
                 f"  {info.PACKAGE_NAME} --config config.json",
+                "3) Run that config, and rebuild it each time it changes:",
+                f"  {info.PACKAGE_NAME} --config --watch config.json",
+                "4) Run that config in memory, and serve it on http://127.0.0.1:8000/:",
+                f"  {info.PACKAGE_NAME} --config --serve config.json",
+                "5) Run the config.json files of all the subfolders of a folder, 4 at a time:",
+                f"  {info.PACKAGE_NAME} --batch --jobs 4 sites",
             ),
         ),
     )
 
     excluding_arguments = parser.add_argument_group("excluding arguments")
     optional_arguments = parser.add_argument_group("optional arguments")
+    config_arguments = parser.add_argument_group("config arguments")
     positional_arguments = parser.add_argument_group("positional arguments")
 
     excluding_arguments.add_argument(
@@ -52,6 +61,14 @@ def get_parser() -> argparse.ArgumentParser:
         default=False,
         help="Read a config file and create the website template based on it.",
     )
+    excluding_arguments.add_argument(
+        "-b",
+        "--batch",
+        dest="batch",
+        action="store_true",
+        default=False,
+        help="Read many config files and create the website template of each one, in a pool of processes.",
+    )
     excluding_arguments.add_argument(
         "-d",
         "--default",
@@ -73,13 +90,134 @@ def get_parser() -> argparse.ArgumentParser:
             f"This include: {images.favicon_ico.name}, {images.favicon_png.name}, {images.favicon_svg.name} and {images.preview_png.name}"
         ),
     )
+    config_arguments.add_argument(
+        "--validate-only",
+        dest="validate_only",
+        action="store_true",
+        default=False,
+        help="Use with --config or --batch. Check the config file and all its references without decoding the images or creating any file.",
+    )
+    config_arguments.add_argument(
+        "-w",
+        "--watch",
+        dest="watch",
+        action="store_true",
+        default=False,
+        help=(
+            "Use with --config. After the build, watch the config file and its referenced files, "
+            "and rebuild only the files affected by each change until it's interrupted."
+        ),
+    )
+    config_arguments.add_argument(
+        "--serve",
+        dest="serve",
+        action="store_true",
+        default=False,
+        help=(
+            "Use with --config. Build the files in memory, without creating them, and serve them on a local port until it's interrupted. "
+            "The responses have ETags, and the text files are compressed with gzip when the client accepts it."
+        ),
+    )
+    config_arguments.add_argument(
+        "--port",
+        dest="port",
+        type=int,
+        default=None,
+        metavar="PORT",
+        help="Use with --serve. Port of the local server, 0 uses any free port. Default: 8000.",
+    )
+    config_arguments.add_argument(
+        "--incremental",
+        dest="incremental",
+        action="store_true",
+        default=False,
+        help=(
+            "Use with --config. Record the config keys and referenced files used to create each file in the cache, "
+            "and skip the files whose keys didn't change since the previous build."
+        ),
+    )
+    config_arguments.add_argument(
+        "-j",
+        "--jobs",
+        dest="jobs",
+        type=int,
+        default=None,
+        metavar="N",
+        help=(
+            "Use with --config or --batch. Number of workers used to resize and encode the images and render the pages. "
+            "With --batch, number of sites built at the same time. Default: 1."
+        ),
+    )
+    config_arguments.add_argument(
+        "--png-profile",
+        dest="png_profile",
+        default=None,
+        metavar="PROFILE",
+        help=(
+            f"Use with --config or --batch. Trade build speed against image size, one of: {', '.join(config.PNG_PROFILES)}. "
+            f"It replaces the png_profile key of the config file. Default: {config.DEFAULT_PNG_PROFILE}."
+        ),
+    )
+    config_arguments.add_argument(
+        "--minify",
+        dest="minify",
+        action="store_true",
+        default=False,
+        help="Use with --config or --batch. Minify the HTML, CSS, JavaScript and JSON files. It replaces the minify key of the config file.",
+    )
+    config_arguments.add_argument(
+        "--precompress",
+        dest="precompress",
+        action="store_true",
+        default=False,
+        help=(
+            "Use with --config or --batch. Create a .gz copy of each text file, and a .br copy if brotli is installed, when it makes the file smaller. "
+            "It replaces the precompress key of the config file."
+        ),
+    )
+    config_arguments.add_argument(
+        "--fingerprint",
+        dest="fingerprint",
+        action="store_true",
+        default=False,
+        help=(
+            "Use with --config or --batch. Add a hash of the content to the name of each file of the static folder, so they can be cached forever. "
+            "It replaces the fingerprint key of the config file."
+        ),
+    )
+    config_arguments.add_argument(
+        "--cache-dir",
+        dest="cache_dir",
+        default=None,
+        metavar="DIR",
+        help=(
+            "Use with --config or --batch. Folder where the generated images and compiled templates are cached between runs. "
+            "The cache is used unless --no-cache is set. Default: $XDG_CACHE_HOME/cushead or ~/.cache/cushead."
+        ),
+    )
+    config_arguments.add_argument(
+        "--cache-size",
+        dest="cache_size",
+        type=int,
+        default=None,
+        metavar="MB",
+        help=f"Use with --config or --batch. Maximum size of the cache folder, the least recently used entries are removed first. Default: {cache.DEFAULT_MAX_SIZE // 1024 ** 2}.",
+    )
+    config_arguments.add_argument(
+        "--no-cache",
+        dest="no_cache",
+        action="store_true",
+        default=False,
+        help="Use with --config or --batch. Don't read or write the cache of generated images and compiled templates, so only the output folder is written.",
+    )
 
     positional_arguments.add_argument(
         "FILE",
         nargs="?",
         help=(
-            "Input or output file used by the --config or --default arguments. "
+            "Input or output file used by the --config, --batch or --default arguments. "
             "For --config it must be a path to a config file in JSON format. "
+            "For --batch it must be a folder whose subfolders have a config.json file, or a glob pattern of the config files. "
             "For --default it must be the destination path where to want to create the default config. "
             "If the --images argument is set, the images would be created in the directory of that file."
         ),
@@ -99,23 +237,98 @@ def validate_args(*, parser_namespace: argparse.Namespace, args: List[str]) -> N
     Raises:
         MissRequired: when missing a required argument.
         InvalidCombination: when the combinations of arguments are invalid.
+        InvalidValue: when an argument has a value out of range.
         BadReference: when the arguments reference an invalid file.
     """
-    if not (parser_namespace.config or parser_namespace.default):
-        raise exceptions.MissRequired("Missing a required argument. Use --config, --default or --help.")
+    if not (parser_namespace.config or parser_namespace.batch or parser_namespace.default):
+        raise exceptions.MissRequired("Missing a required argument. Use --config, --batch, --default or --help.")
 
-    if parser_namespace.config and parser_namespace.default:
-        config_arg = "-c" if "-c" in args else "--config"
-        default_arg = "-d" if "-d" in args else "--default"
-        raise exceptions.InvalidCombination(f"Can't use {config_arg} and {default_arg} arguments together.")
+    excluding_args = [
+        short_arg if short_arg in args else long_arg
+        for short_arg, long_arg, value in (("-c", "--config", parser_namespace.config), ("-b", "--batch", parser_namespace.batch), ("-d", "--default", parser_namespace.default))
+        if value
+    ]
+    if len(excluding_args) > 1:
+        raise exceptions.InvalidCombination(f"Can't use {excluding_args[0]} and {excluding_args[1]} arguments together.")
 
     if parser_namespace.images and not parser_namespace.default:
         images_arg = "-i" if "-i" in args else "--images"
         raise exceptions.InvalidCombination(f"Can't use {images_arg} argument without --default.")
 
+    if parser_namespace.validate_only and not (parser_namespace.config or parser_namespace.batch):
+        raise exceptions.InvalidCombination("Can't use --validate-only argument without --config or --batch.")
+
+    if parser_namespace.watch and not parser_namespace.config:
+        watch_arg = "-w" if "-w" in args else "--watch"
+        raise exceptions.InvalidCombination(f"Can't use {watch_arg} argument without --config.")
+
+    if parser_namespace.watch and parser_namespace.validate_only:
+        watch_arg = "-w" if "-w" in args else "--watch"
+        raise exceptions.InvalidCombination(f"Can't use --validate-only and {watch_arg} arguments together.")
+
+    if parser_namespace.serve and not parser_namespace.config:
+        raise exceptions.InvalidCombination("Can't use --serve argument without --config.")
+
+    if parser_namespace.serve and parser_namespace.validate_only:
+        raise exceptions.InvalidCombination("Can't use --validate-only and --serve arguments together.")
+
+    if parser_namespace.serve and (parser_namespace.watch or parser_namespace.incremental):
+        serve_arg = ("-w" if "-w" in args else "--watch") if parser_namespace.watch else "--incremental"
+        raise exceptions.InvalidCombination(f"Can't use {serve_arg} and --serve arguments together.")
+
+    if parser_namespace.port is not None and not parser_namespace.serve:
+        raise exceptions.InvalidCombination("Can't use --port argument without --serve.")
+
+    if parser_namespace.incremental and not parser_namespace.config:
+        raise exceptions.InvalidCombination("Can't use --incremental argument without --config.")
+
+    if parser_namespace.incremental and parser_namespace.validate_only:
+        raise exceptions.InvalidCombination("Can't use --validate-only and --incremental arguments together.")
+
+    if parser_namespace.jobs is not None and not (parser_namespace.config or parser_namespace.batch):
+        jobs_arg = "-j" if "-j" in args else "--jobs"
+        raise exceptions.InvalidCombination(f"Can't use {jobs_arg} argument without --config or --batch.")
+
+    if parser_namespace.png_profile is not None and not (parser_namespace.config or parser_namespace.batch):
+        raise exceptions.InvalidCombination("Can't use --png-profile argument without --config or --batch.")
+
+    if parser_namespace.minify and not (parser_namespace.config or parser_namespace.batch):
+        raise exceptions.InvalidCombination("Can't use --minify argument without --config or --batch.")
+
+    if parser_namespace.precompress and not (parser_namespace.config or parser_namespace.batch):
+        raise exceptions.InvalidCombination("Can't use --precompress argument without --config or --batch.")
+
+    if parser_namespace.fingerprint and not (parser_namespace.config or parser_namespace.batch):
+        raise exceptions.InvalidCombination("Can't use --fingerprint argument without --config or --batch.")
+
+    for cache_arg, cache_value in (("--cache-dir", parser_namespace.cache_dir), ("--cache-size", parser_namespace.cache_size), ("--no-cache", parser_namespace.no_cache)):
+        if cache_value not in (None, False) and not (parser_namespace.config or parser_namespace.batch):
+            raise exceptions.InvalidCombination(f"Can't use {cache_arg} argument without --config or --batch.")
+
+    if parser_namespace.no_cache and (parser_namespace.cache_dir is not None or parser_namespace.cache_size is not None):
+        cache_arg = "--cache-dir" if parser_namespace.cache_dir is not None else "--cache-size"
+        raise exceptions.InvalidCombination(f"Can't use --no-cache and {cache_arg} arguments together.")
+
+    if parser_namespace.no_cache and parser_namespace.incremental:
+        raise exceptions.InvalidCombination("Can't use --no-cache and --incremental arguments together.")
+
+    if parser_namespace.jobs is not None and parser_namespace.jobs < 1:
+        raise exceptions.InvalidValue("The number of jobs must be greater than zero.")
+
+    if parser_namespace.port is not None and not 0 <= parser_namespace.port <= 65535:
+        raise exceptions.InvalidValue("The port must be between 0 and 65535.")
+
+    if parser_namespace.cache_size is not None and parser_namespace.cache_size < 1:
+        raise exceptions.InvalidValue("The cache size must be greater than zero.")
+
+    if parser_namespace.png_profile is not None and parser_namespace.png_profile not in config.PNG_PROFILES:
+        raise exceptions.InvalidValue(f"The PNG profile must be one of: {', '.join(config.PNG_PROFILES)}.")
+
     if not parser_namespace.FILE:
         if parser_namespace.config:
             raise exceptions.MissRequired("The path to the config file is missing.")
+        if parser_namespace.batch:
+            raise exceptions.MissRequired("The folder or the glob pattern of the config files is missing.")
         raise exceptions.MissRequired("The destination path for the default config file is missing.")
 
     if parser_namespace.config:
@@ -0,0 +1,188 @@
+"""
+Handle the rebuilds of a config file when it, or the files it references, change.
+
+The files are polled, so there isn't any dependency on the notifications of the operating system. The config keys read
+to generate each output are recorded, so each rebuild only generates again the outputs whose keys changed.
+"""
+from __future__ import annotations
+
+import argparse
+import pathlib
+import time
+from typing import Any
+from typing import Dict
+from typing import Optional
+from typing import Set
+from typing import Tuple
+
+from cushead import exceptions
+from cushead.console import logs
+from cushead.console.arguments import config
+from cushead.console.arguments import files_creator
+from cushead.generator import cache as generator_cache
+from cushead.generator import dependencies as generator_dependencies
+from cushead.generator import report as generator_report
+
+# The seconds between two checks of the watched files.
+DEFAULT_INTERVAL = 0.5
+# A snapshot of a watched file, with its modification time and size, or None when it doesn't exist.
+FileState = Optional[Tuple[int, int]]
+
+
+class Watcher:
+    """
+    Watch a config file and the files it references, and rebuild the outputs affected by each change.
+    """
+
+    def __init__(
+        self,
+        *,
+        path: pathlib.Path,
+        parser_namespace: argparse.Namespace,
+        cache: Optional[generator_cache.DiskCache] = None,
+    ) -> None:
+        """
+        Initialize a watcher.
+
+        Args:
+            path: the config file path.
+            parser_namespace: the parser.
+            cache: the cache of the generated images and the compiled templates, shared by all the rebuilds. The
+                dependencies of the outputs are also stored on it, so a new watcher doesn't generate the unchanged ones.
+        """
+        self.path = path
+        self.parser_namespace = parser_namespace
+        self.cache = cache
+        self.config_file: Dict[str, Any] = {}
+        self.states: Dict[pathlib.Path, FileState] = {}
+        self.dependencies = generator_dependencies.Dependencies(cache=cache)
+
+    def get_references(self) -> Dict[pathlib.Path, str]:
+        """
+        Get the files referenced by the config file.
+
+        Returns:
+            The config keys, by the paths of the referenced files.
+        """
+        return {self.path.parent / self.config_file[key]: key for key in generator_dependencies.SOURCE_KEYS if isinstance(self.config_file.get(key), str)}
+
+    def get_states(self) -> Dict[pathlib.Path, FileState]:
+        """
+        Get a snapshot of the config file and the files it references.
+
+        Returns:
+            The state of each file, by its path.
+        """
+        states: Dict[pathlib.Path, FileState] = {}
+        for path in (self.path, *self.get_references()):
+            try:
+                stat = path.stat()
+            except OSError:
+                states[path] = None
+            else:
+                states[path] = (stat.st_mtime_ns, stat.st_size)
+        return states
+
+    def read_config_file(self) -> Dict[str, Any]:
+        """
+        Read the config file, without validating it.
+
+        Returns:
+            The config, or an empty one if it can't be read.
+        """
+        try:
+            config_file = config.read_config_file(path=self.path)
+        except (OSError, exceptions.MainException):
+            return {}
+        return config_file if isinstance(config_file, dict) else {}
+
+    def poll(self) -> Optional[Set[str]]:
+        """
+        Check if the watched files changed since the last check.
+
+        Returns:
+            None if nothing changed, else the config keys whose values or referenced files changed.
+        """
+        states = self.get_states()
+        if states == self.states:
+            return None
+        changed_paths = {path for path in set(states) | set(self.states) if states.get(path) != self.states.get(path)}
+        config_file = self.read_config_file()
+        changed_keys = {key for key in set(config_file) | set(self.config_file) if config_file.get(key) != self.config_file.get(key)}
+        self.config_file = config_file
+        changed_keys.update(key for path, key in self.get_references().items() if path in changed_paths)
+        self.states = self.get_states()
+        return changed_keys
+
+    def build(self) -> files_creator.FilesWriter:
+        """
+        Build the outputs whose config keys changed since the previous build.
+
+        Returns:
+            The writer that created the files.
+        """
+        files_writer = files_creator.FilesWriter(dependencies=self.dependencies)
+        build_report = generator_report.BuildReport()
+        files_to_create = config.parse_config_file(
+            path=self.path,
+            jobs=self.parser_namespace.jobs or 1,
+            png_profile=self.parser_namespace.png_profile,
+            minify=self.parser_namespace.minify,
+            precompress=self.parser_namespace.precompress,
+            fingerprint=self.parser_namespace.fingerprint,
+            cache=self.cache,
+            skip_path=files_writer.skip_path,
+            report=build_report,
+            dependencies=self.dependencies,
+        )
+        files_creator.create_files(files_to_create=files_to_create, files_writer=files_writer)
+        self.dependencies.save()
+        logs.show_build_report(build_report=build_report)
+        return files_writer
+
+    def rebuild(self) -> bool:
+        """
+        Rebuild the outputs affected by the changes since the last check.
+
+        The errors of the config are shown, so they can be fixed without restarting the watcher.
+
+        Returns:
+            True if something changed.
+        """
+        changed_keys = self.poll()
+        if changed_keys is None:
+            return False
+        logs.show_watched_changes(changed_keys=changed_keys)
+        start = time.perf_counter()
+        try:
+            files_writer = self.build()
+        except exceptions.MainException as exception:
+            logs.show_rebuild_error(message=str(exception))
+        else:
+            logs.show_rebuild_time(created_files=files_writer.created_files, seconds=time.perf_counter() - start)
+        return True
+
+
+def watch_config(*, path: pathlib.Path, parser_namespace: argparse.Namespace, cache: Optional[generator_cache.DiskCache] = None, interval: float = DEFAULT_INTERVAL) -> None:
+    """
+    Build a config file, and rebuild it each time it, or the files it references, change.
+
+    It runs until it's interrupted.
+
+    Args:
+        path: the config file path.
+        parser_namespace: the parser.
+        cache: the cache of the generated images and the compiled templates, shared by all the rebuilds.
+        interval: the seconds between two checks of the watched files.
+    """
+    watcher = Watcher(path=path, parser_namespace=parser_namespace, cache=cache)
+    watcher.poll()
+    watcher.build()
+    logs.show_watching(path=path)
+    try:
+        while True:
+            time.sleep(interval)
+            if watcher.rebuild():
+                logs.show_watching(path=path)
+    except KeyboardInterrupt:
+        return
@@ -1,15 +1,20 @@
 """
 Execute custom print messages.
 """
+from __future__ import annotations
+
 import argparse
 import pathlib
 import textwrap
+from typing import Iterable
 from typing import List
 
 import colorama
 
 from cushead import info
+from cushead.console.arguments import batch
 from cushead.console.arguments import files_creator
+from cushead.generator import report
 
 
 def show_presentation() -> None:
@@ -63,6 +68,13 @@ def get_exception_message(*, parser: argparse.ArgumentParser, message: str) -> s
     )
 
 
+def show_valid_config(path: pathlib.Path) -> None:
+    """
+    Print a valid config file message.
+    """
+    print(f"The config file {colorama.Fore.YELLOW}{path}{colorama.Fore.RESET} is valid.")
+
+
 def show_created_file(path: pathlib.Path) -> None:
     """
     Print a created file message.
@@ -70,6 +82,13 @@ def show_created_file(path: pathlib.Path) -> None:
     print(f" - {path.parent}/{colorama.Fore.YELLOW}{path}{colorama.Fore.RESET}")
 
 
+def show_created_pages(count: int) -> None:
+    """
+    Print the number of created pages of the pages file.
+    """
+    print(f" - {colorama.Fore.YELLOW}{count}{colorama.Fore.RESET} pages")
+
+
 def show_created_file_errors(errors: List[files_creator.Error]) -> None:
     """
     Print error messages for the files with errors at creation time.
@@ -80,3 +99,85 @@ def show_created_file_errors(errors: List[files_creator.Error]) -> None:
     print("\nErrors:")
     for error in errors:
         print(f" - {colorama.Fore.RED}{error.error}{colorama.Fore.RESET}: {error.path.parent}/{colorama.Fore.YELLOW}{error.path}{colorama.Fore.RESET}")
+
+
+def show_build_report(build_report: report.BuildReport) -> None:
+    """
+    Print the statistics of a build.
+    """
+    if build_report.encoded_images or build_report.cached_images:
+        print("\nEncoded images:")
+        for png_profile, stats in build_report.encoded_images.items():
+            print(f" - {colorama.Fore.YELLOW}{png_profile}{colorama.Fore.RESET} profile: {stats.images} images, {stats.size / 1024:.1f} KiB in {stats.seconds:.2f}s")
+        if build_report.cached_images:
+            print(f" - {build_report.cached_images} images read from the cache")
+
+    if build_report.minified_files:
+        print("\nMinified files:")
+        for path, minify_stats in build_report.minified_files.items():
+            print(f" - {path.parent}/{colorama.Fore.YELLOW}{path}{colorama.Fore.RESET}: {minify_stats.original_size} -> {minify_stats.size} bytes")
+
+
+def show_batch_summary(site_results: List[batch.SiteResult]) -> None:
+    """
+    Print the result of the builds of a batch, and the statistics of all of them.
+    """
+    print("Built sites:")
+    build_report = report.BuildReport()
+    errors: List[files_creator.Error] = []
+    for site_result in site_results:
+        if site_result.exception is not None:
+            print(f" - {colorama.Fore.YELLOW}{site_result.path}{colorama.Fore.RESET}: {colorama.Fore.RED}{site_result.exception}{colorama.Fore.RESET}")
+            continue
+        print(f" - {colorama.Fore.YELLOW}{site_result.path}{colorama.Fore.RESET}: {site_result.created_files} files created")
+        errors.extend(site_result.errors)
+        if site_result.build_report:
+            build_report.merge(build_report=site_result.build_report)
+
+    failed_sites = sum(1 for site_result in site_results if site_result.exception is not None)
+    created_files = sum(site_result.created_files for site_result in site_results)
+    print(f" * {len(site_results) - failed_sites} of {len(site_results)} sites built, {created_files} files created")
+    show_created_file_errors(errors=errors)
+    show_build_report(build_report=build_report)
+
+
+def show_watching(path: pathlib.Path) -> None:
+    """
+    Print a message while the config file is watched.
+    """
+    print(f"\nWatching {colorama.Fore.YELLOW}{path}{colorama.Fore.RESET} and its referenced files. Press Ctrl+C to stop.")
+
+
+def show_watched_changes(changed_keys: Iterable[str]) -> None:
+    """
+    Print the config keys changed in the watched files.
+    """
+    print(f"\nChanged keys: {', '.join(sorted(changed_keys)) or 'none'}")
+
+
+def show_rebuild_time(created_files: int, seconds: float) -> None:
+    """
+    Print the latency of a rebuild.
+    """
+    print(f" * Rebuilt {created_files} files in {seconds * 1000:.0f} ms")
+
+
+def show_serving(url: str, served_files: int) -> None:
+    """
+    Print the address of the local server.
+    """
+    print(f"\nServing {served_files} files from memory on {colorama.Fore.YELLOW}{url}{colorama.Fore.RESET}. Press Ctrl+C to stop.")
+
+
+def show_served_request(request_line: str, status: str) -> None:
+    """
+    Print a request answered by the local server.
+    """
+    print(f" * {request_line} {status}")
+
+
+def show_rebuild_error(message: str) -> None:
+    """
+    Print the error that stopped a rebuild.
+    """
+    print(f" * {colorama.Fore.RED}Can't rebuild{colorama.Fore.RESET}: {message}")
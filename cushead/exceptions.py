@@ -37,3 +37,15 @@ class WrongFileFormat(MainException):
     """
     When a file is in an unexpected format.
     """
+
+
+class InvalidValue(MainException):
+    """
+    When a value is out of the expected range.
+    """
+
+
+class BuildFailed(MainException):
+    """
+    When some builds of a batch fail.
+    """
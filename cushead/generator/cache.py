@@ -0,0 +1,217 @@
+"""
+Handle the persistent cache of generated files.
+"""
+import collections
+import hashlib
+import os
+import pathlib
+import tempfile
+import threading
+import zlib
+from typing import Optional
+
+import PIL
+
+from cushead import info
+
+DEFAULT_MAX_SIZE = 256 * 1024 * 1024
+DEFAULT_MAX_MEMORY_SIZE = 64 * 1024 * 1024
+
+
+def get_default_path() -> pathlib.Path:
+    """
+    Get the default cache folder.
+
+    Returns:
+        The folder path, following the XDG Base Directory specification.
+    """
+    return pathlib.Path(os.environ.get("XDG_CACHE_HOME") or pathlib.Path.home() / ".cache") / info.PACKAGE_NAME
+
+
+def get_key(*parts: object) -> str:
+    """
+    Get a cache key.
+
+    The versions of the package, Pillow and zlib are part of the key, so the entries created by other versions, that
+    can be encoded differently, are never used.
+
+    Args:
+        parts: the values that identify the entry.
+
+    Returns:
+        The key.
+    """
+    return hashlib.sha256(repr((info.PACKAGE_VERSION, PIL.__version__, zlib.ZLIB_RUNTIME_VERSION, *parts)).encode()).hexdigest()
+
+
+class DiskCache:
+    """
+    Store data in a folder, with a maximum size.
+
+    When the folder exceeds the maximum size, the least recently used entries are removed. The cache never breaks a
+    build: if an entry can't be read or written, it's treated as missing. Without a folder, nothing is stored.
+    """
+
+    def __init__(self, *, path: Optional[pathlib.Path], max_size: int = DEFAULT_MAX_SIZE) -> None:
+        """
+        Initialize a disk cache.
+
+        Args:
+            path: the folder where the entries are stored, if any.
+            max_size: the maximum size of the folder, in bytes.
+        """
+        self.path = path
+        self.max_size = max_size
+
+    def get_entry_path(self, *, key: str) -> Optional[pathlib.Path]:
+        """
+        Get the path of an entry.
+
+        Args:
+            key: the entry key.
+
+        Returns:
+            The path, or None if there is no folder.
+        """
+        if self.path is None:
+            return None
+        return self.path / key[:2] / key
+
+    def get(self, *, key: str) -> Optional[bytes]:
+        """
+        Get the data of an entry.
+
+        Args:
+            key: the entry key.
+
+        Returns:
+            The data, or None if the entry doesn't exist.
+        """
+        entry_path = self.get_entry_path(key=key)
+        if entry_path is None:
+            return None
+        try:
+            data = entry_path.read_bytes()
+            # Mark the entry as recently used.
+            os.utime(entry_path)
+        except OSError:
+            return None
+        return data
+
+    def set(self, *, key: str, data: bytes) -> None:
+        """
+        Store the data of an entry.
+
+        The entry is written in a temporary file and then moved, so other processes never read it partially written.
+
+        Args:
+            key: the entry key.
+            data: the data.
+        """
+        entry_path = self.get_entry_path(key=key)
+        if entry_path is None:
+            return
+        try:
+            entry_path.parent.mkdir(parents=True, exist_ok=True)
+            with tempfile.NamedTemporaryFile(dir=entry_path.parent, delete=False) as file:
+                file.write(data)
+            os.replace(file.name, entry_path)
+        except OSError:
+            return
+
+    def evict(self) -> None:
+        """
+        Remove the least recently used entries until the folder size is below the maximum size.
+        """
+        if self.path is None:
+            return
+        entries = []
+        for entry_path in self.path.glob("*/*"):
+            try:
+                entries.append((entry_path.stat(), entry_path))
+            except OSError:
+                continue
+
+        size = sum(stat.st_size for stat, _ in entries)
+        for stat, entry_path in sorted(entries, key=lambda entry: entry[0].st_mtime_ns):
+            if size <= self.max_size:
+                break
+            try:
+                entry_path.unlink()
+            except OSError:
+                continue
+            size -= stat.st_size
+
+
+class MemoryCache(DiskCache):
+    """
+    Store the recently used entries in memory, in front of an optional folder.
+
+    It's shared by the builds of a long-running process, so they don't read the folder, or generate the entries again,
+    for the data that is already in memory. The entries can be read and written from many threads.
+    """
+
+    def __init__(self, *, path: Optional[pathlib.Path] = None, max_size: int = DEFAULT_MAX_SIZE, max_memory_size: int = DEFAULT_MAX_MEMORY_SIZE) -> None:
+        """
+        Initialize a memory cache.
+
+        Args:
+            path: if defined, the folder where the entries are also stored, so they are kept between processes.
+            max_size: the maximum size of the folder, in bytes.
+            max_memory_size: the maximum size of the entries kept in memory, in bytes.
+        """
+        super().__init__(path=path, max_size=max_size)
+        self.max_memory_size = max_memory_size
+        self.entries: collections.OrderedDict[str, bytes] = collections.OrderedDict()
+        self.memory_size = 0
+        self.lock = threading.Lock()
+
+    def remember(self, *, key: str, data: bytes) -> None:
+        """
+        Keep the data of an entry in memory, removing the least recently used entries if it exceeds the maximum size.
+
+        Args:
+            key: the entry key.
+            data: the data.
+        """
+        with self.lock:
+            if key in self.entries:
+                self.memory_size -= len(self.entries.pop(key))
+            if len(data) > self.max_memory_size:
+                return
+            self.entries[key] = data
+            self.memory_size += len(data)
+            while self.memory_size > self.max_memory_size:
+                _, removed_data = self.entries.popitem(last=False)
+                self.memory_size -= len(removed_data)
+
+    def get(self, *, key: str) -> Optional[bytes]:
+        """
+        Get the data of an entry, from memory or else from the folder.
+
+        Args:
+            key: the entry key.
+
+        Returns:
+            The data, or None if the entry doesn't exist.
+        """
+        with self.lock:
+            data = self.entries.get(key)
+            if data is not None:
+                self.entries.move_to_end(key)
+                return data
+        data = super().get(key=key)
+        if data is not None:
+            self.remember(key=key, data=data)
+        return data
+
+    def set(self, *, key: str, data: bytes) -> None:
+        """
+        Store the data of an entry, in memory and in the folder.
+
+        Args:
+            key: the entry key.
+            data: the data.
+        """
+        self.remember(key=key, data=data)
+        super().set(key=key, data=data)
@@ -0,0 +1,83 @@
+"""
+Handle the precompressed copies of the text files.
+
+The copies are stored next to each file, so a web server like nginx with gzip_static can serve them without compressing
+the files on each request.
+"""
+from __future__ import annotations
+
+import gzip
+import pathlib
+from typing import Callable
+from typing import Iterator
+from typing import Optional
+
+from cushead.generator import files
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE_SUFFIXES = (".html", ".xml", ".json", ".js", ".css", ".txt", ".svg")
+# The compressed copy is only created if it's smaller than this part of the original size.
+MAX_COMPRESSION_RATIO = 0.9
+
+
+def compress_gzip(data: bytes) -> bytes:
+    """
+    Compress data in gzip format, with the maximum compression.
+
+    The modification time isn't stored, so the same data is always compressed to the same bytes.
+
+    Args:
+        data: the data to compress.
+
+    Returns:
+        The compressed data.
+    """
+    return gzip.compress(data, compresslevel=9, mtime=0)
+
+
+def compress_brotli(data: bytes) -> bytes:
+    """
+    Compress data in brotli format, with the maximum compression.
+
+    Args:
+        data: the data to compress.
+
+    Returns:
+        The compressed data.
+    """
+    return brotli.compress(data, mode=brotli.MODE_TEXT, quality=11)
+
+
+def generate_compressed_files(*, file: files.File, skip_path: Optional[Callable[[pathlib.Path], bool]] = None) -> Iterator[files.File]:
+    """
+    Get the compressed copies of a file.
+
+    The brotli copy is only created if the brotli package is installed.
+
+    Args:
+        file: the file to compress.
+        skip_path: if defined, the copies whose path makes it return True are never compressed.
+
+    Yields:
+        The .gz copy and the .br copy, if they are small enough compared to the file.
+    """
+    path = pathlib.Path(file.path)
+    if path.suffix not in COMPRESSIBLE_SUFFIXES:
+        return
+
+    compressors = [(".gz", compress_gzip)]
+    if brotli is not None:
+        compressors.append((".br", compress_brotli))
+
+    for suffix, compress in compressors:
+        compressed_path = path.with_name(path.name + suffix)
+        if skip_path and skip_path(compressed_path):
+            continue
+        compressed_data = compress(file.data)
+        if len(compressed_data) < len(file.data) * MAX_COMPRESSION_RATIO:
+            # The copies have the type of the file, so the copies of the pages are handled as pages.
+            yield type(file)(path=compressed_path, data=compressed_data)
@@ -4,7 +4,9 @@ Handle the config.
 import pathlib
 import re
 from typing import Any
+from typing import List
 from typing import Literal
+from typing import Mapping
 from typing import Optional
 from typing import TypedDict
 from typing import Union
@@ -17,6 +19,29 @@ from PIL import PngImagePlugin
 
 from cushead import exceptions
 
+PNG_PROFILES = ("fast", "balanced", "smallest")
+DEFAULT_PNG_PROFILE = "balanced"
+DEFAULT_PRECACHE_BUDGET = 2 * 1024 ** 2
+# The files precached by the service worker, relative to the output folder.
+DEFAULT_PRECACHE_INCLUDE = ("manifest.json", "static/*.css", "static/*.js", "static/favicon-*", "static/manifest-*", "static/mask-icon.*")
+
+
+# The keys of a locale, that replace the same keys of the config.
+LOCALE_KEYS = ("language", "territory", "text_dir", "title", "description", "subject")
+
+
+class Locale(TypedDict):
+    """
+    The parsed locale structure.
+    """
+
+    language: str
+    territory: Optional[str]
+    text_dir: Optional[str]
+    title: Optional[str]
+    description: Optional[str]
+    subject: Optional[str]
+
 
 class Config(TypedDict):
     """
@@ -47,6 +72,19 @@ class Config(TypedDict):
     twitter_user_id: Optional[str]
     itunes_app_id: Optional[str]
     itunes_affiliate_data: Optional[str]
+    downscale_ratio: Optional[float]
+    png_profile: str
+    reduce_colors: bool
+    minify: bool
+    precompress: bool
+    fingerprint: bool
+    precache: bool
+    precache_budget: int
+    precache_include: List[str]
+    precache_exclude: List[str]
+    sitemap_urls: Optional[pathlib.Path]
+    pages: Optional[pathlib.Path]
+    locales: List[Locale]
 
 
 def validate_config(*, config: Any) -> None:
@@ -83,6 +121,22 @@ def validate_config(*, config: Any) -> None:
             schema.Optional("twitter_user_id"): schema.Or(None, str),
             schema.Optional("itunes_app_id"): schema.Or(None, str),
             schema.Optional("itunes_affiliate_data"): schema.Or(None, str),
+            schema.Optional("downscale_ratio"): schema.Or(None, int, float),
+            schema.Optional("png_profile"): schema.Or(None, str),
+            schema.Optional("reduce_colors"): schema.Or(None, bool),
+            schema.Optional("minify"): schema.Or(None, bool),
+            schema.Optional("precompress"): schema.Or(None, bool),
+            schema.Optional("fingerprint"): schema.Or(None, bool),
+            schema.Optional("precache"): schema.Or(None, bool),
+            schema.Optional("precache_budget"): schema.Or(None, int),
+            schema.Optional("precache_include"): schema.Or(None, [str]),
+            schema.Optional("precache_exclude"): schema.Or(None, [str]),
+            schema.Optional("sitemap_urls"): schema.Or(None, str),
+            schema.Optional("pages"): schema.Or(None, str),
+            schema.Optional("locales"): schema.Or(
+                None,
+                [{"language": str, **{schema.Optional(key): schema.Or(None, str) for key in LOCALE_KEYS if key != "language"}}],
+            ),
         }
     )
     try:
@@ -104,6 +158,72 @@ def validate_config(*, config: Any) -> None:
         if config.get(color_key) and not hex_color.match(config[color_key]):
             raise exceptions.InvalidConfig(f"The key {color_key} must be a hex color code. If you don't want any value on this key, set the value to null.")
 
+    if config.get("downscale_ratio") is not None and config["downscale_ratio"] < 1:
+        raise exceptions.InvalidConfig("The key downscale_ratio must be a number greater than or equal to 1. To resize every image from the source, set the value to null.")
+
+    if config.get("png_profile") and config["png_profile"] not in PNG_PROFILES:
+        raise exceptions.InvalidConfig(f"The key png_profile must be one of: {', '.join(PNG_PROFILES)}. To use the {DEFAULT_PNG_PROFILE} profile, set the value to null.")
+
+    if config.get("sitemap_urls") and not config.get("domain"):
+        raise exceptions.InvalidConfig("The key sitemap_urls requires the key domain, that is used in the sitemap index.")
+
+    if config.get("locales"):
+        if not config.get("domain"):
+            raise exceptions.InvalidConfig("The key locales requires the key domain, that is used in the alternate links.")
+        locale_codes = [get_locale_code(language=locale["language"], territory=locale.get("territory")) for locale in config["locales"]]
+        if config.get("language"):
+            locale_codes.append(get_locale_code(language=config["language"], territory=config.get("territory")))
+        if not all(re.match("^[A-Za-z0-9]+(-[A-Za-z0-9]+)?$", locale_code) for locale_code in locale_codes) or len({locale_code.lower() for locale_code in locale_codes}) != len(locale_codes):
+            raise exceptions.InvalidConfig("The language and territory of each locale must be letters and digits, and be different than the ones of the config and the other locales.")
+
+    if config.get("precache_budget") is not None and config["precache_budget"] < 0:
+        raise exceptions.InvalidConfig(f"The key precache_budget must be a number of bytes greater than or equal to 0. To use {DEFAULT_PRECACHE_BUDGET} bytes, set the value to null.")
+
+
+def get_locale_code(*, language: str, territory: Optional[str] = None) -> str:
+    """
+    Get the code of a locale, used in the hreflang attributes and the locale folders.
+
+    Args:
+        language: the language.
+        territory: the territory.
+
+    Returns:
+        The code, like en-US.
+    """
+    return f"{language}-{territory}" if territory else language
+
+
+def check_file_reference(*, key: str, path: pathlib.Path) -> None:
+    """
+    Check that a reference is an existing file.
+
+    Args:
+        key: the config key that has the reference.
+        path: the file path.
+
+    Raises:
+        BadReference: when the reference doesn't exist or isn't a file.
+    """
+    if not path.exists():
+        raise exceptions.BadReference(
+            "\n".join(
+                (
+                    f"{key} reference ({path}) doesn't exists.",
+                    f"ABSOLUTE PATH: {path.absolute()}",
+                ),
+            ),
+        )
+    if not path.is_file():
+        raise exceptions.BadReference(
+            "\n".join(
+                (
+                    f"{key} reference ({path}) must be a file, not a directory.",
+                    f"ABSOLUTE PATH: {path.absolute()}",
+                ),
+            ),
+        )
+
 
 @overload
 def load_binary_image(*, key: Literal["favicon_ico"], path: pathlib.Path, expected_format: Literal["ICO"]) -> IcoImagePlugin.IcoImageFile:
@@ -119,12 +239,16 @@ def load_binary_image(*, key, path, expected_format):
     """
     Load a binary type image.
 
+    The file is opened once and only its header is read, to check the format. The pixel data is decoded later, from the
+    same file, when the image is used.
+
     Args:
+        key: the config key that has the reference.
         path: the image path.
         expected_format: the expected format of the image.
 
     Returns:
-        The image instance.
+        The image instance. It must be closed if it's never used.
 
     Raises:
         BadReference: when the reference to the image doesn't exist or isn't a file.
@@ -172,20 +296,65 @@ def load_binary_image(*, key, path, expected_format):
             ),
         )
 
-    # Verify the image. After this, need to close it.
-    image.verify()
-    image.close()
+    return image
 
-    return Image.open(path)
 
+def decode_image(*, key: str, image: Image.Image, verify_only: bool = False) -> None:
+    """
+    Decode the pixel data of an image opened by load_binary_image.
 
-def parse_config(*, path: pathlib.Path, config: Any) -> Config:
+    Args:
+        key: the config key that has the reference.
+        image: the image instance.
+        verify_only: if True, the data is only checked, without decoding the pixels. The image can't be used after it.
+
+    Raises:
+        WrongFileFormat: when the image data is truncated or corrupt.
+    """
+    try:
+        if verify_only:
+            image.verify()
+        else:
+            image.load()
+    except (OSError, SyntaxError) as exception:
+        path = pathlib.Path(getattr(image, "filename", "") or key)
+        raise exceptions.WrongFileFormat(
+            "\n".join(
+                (
+                    f"Can't decode the {key} reference ({path}).",
+                    f"ABSOLUTE PATH: {path.absolute()}",
+                    f"Exception: {exception}",
+                ),
+            ),
+        )
+
+
+def get_png_image(*, key: Union[Literal["favicon_png"], Literal["preview_png"]], path: pathlib.Path, images: Optional[Mapping[pathlib.Path, Image.Image]] = None) -> PngImagePlugin.PngImageFile:
+    """
+    Get a PNG image, using an image that is already decoded if there is one for the path.
+
+    Args:
+        key: the config key that has the reference.
+        path: the image path.
+        images: the images that are already decoded, by their resolved paths.
+
+    Returns:
+        The image instance.
+    """
+    if images and path.resolve() in images:
+        return images[path.resolve()]
+    return load_binary_image(key=key, path=path, expected_format="PNG")
+
+
+def parse_config(*, path: pathlib.Path, config: Any, images: Optional[Mapping[pathlib.Path, Image.Image]] = None) -> Config:
     """
     Parse a config.
 
     Args:
         path: the config file source path.
         config: the config.
+        images: the PNG images that are already decoded, by their resolved paths. They are used instead of opening the
+            files.
 
     Returns:
         A new dict with the parsed config.
@@ -196,20 +365,33 @@ def parse_config(*, path: pathlib.Path, config: Any) -> Config:
         favicon_ico = None
 
     if config.get("favicon_png"):
-        favicon_png = load_binary_image(key="favicon_png", path=path / config["favicon_png"], expected_format="PNG")
+        favicon_png = get_png_image(key="favicon_png", path=path / config["favicon_png"], images=images)
     else:
         favicon_png = None
 
     if config.get("favicon_svg"):
         favicon_svg = path / config["favicon_svg"]
+        check_file_reference(key="favicon_svg", path=favicon_svg)
     else:
         favicon_svg = None
 
     if config.get("preview_png"):
-        preview_png = load_binary_image(key="preview_png", path=path / config["preview_png"], expected_format="PNG")
+        preview_png = get_png_image(key="preview_png", path=path / config["preview_png"], images=images)
     else:
         preview_png = None
 
+    if config.get("sitemap_urls"):
+        sitemap_urls = path / config["sitemap_urls"]
+        check_file_reference(key="sitemap_urls", path=sitemap_urls)
+    else:
+        sitemap_urls = None
+
+    if config.get("pages"):
+        pages = path / config["pages"]
+        check_file_reference(key="pages", path=pages)
+    else:
+        pages = None
+
     return {
         "main_folder_path": path,
         "output_folder_path": path / "output",
@@ -235,4 +417,27 @@ def parse_config(*, path: pathlib.Path, config: Any) -> Config:
         "twitter_user_id": config.get("twitter_user_id"),
         "itunes_app_id": config.get("itunes_app_id"),
         "itunes_affiliate_data": config.get("itunes_affiliate_data"),
+        "downscale_ratio": config.get("downscale_ratio"),
+        "png_profile": config.get("png_profile") or DEFAULT_PNG_PROFILE,
+        "reduce_colors": bool(config.get("reduce_colors")),
+        "minify": bool(config.get("minify")),
+        "precompress": bool(config.get("precompress")),
+        "fingerprint": bool(config.get("fingerprint")),
+        "precache": bool(config.get("precache")),
+        "precache_budget": DEFAULT_PRECACHE_BUDGET if config.get("precache_budget") is None else config["precache_budget"],
+        "precache_include": list(DEFAULT_PRECACHE_INCLUDE) if config.get("precache_include") is None else config["precache_include"],
+        "precache_exclude": config.get("precache_exclude") or [],
+        "sitemap_urls": sitemap_urls,
+        "pages": pages,
+        "locales": [
+            Locale(
+                language=locale["language"],
+                territory=locale.get("territory"),
+                text_dir=locale.get("text_dir"),
+                title=locale.get("title"),
+                description=locale.get("description"),
+                subject=locale.get("subject"),
+            )
+            for locale in config.get("locales") or []
+        ],
     }
@@ -0,0 +1,390 @@
+"""
+Handle the dependencies between the config keys and the generated files.
+
+While a build runs, the config keys read to generate each file are recorded. The graph is stored with a fingerprint of
+the value of each key, so the next build can skip the files whose keys didn't change. The keys that reference a file
+include its content in their fingerprints.
+
+The pages of a pages file are recorded as a single group, so the graph doesn't grow with the number of pages.
+"""
+from __future__ import annotations
+
+import contextlib
+import hashlib
+import json
+import pathlib
+import time
+from typing import Any
+from typing import ContextManager
+from typing import Dict
+from typing import FrozenSet
+from typing import Iterable
+from typing import Iterator
+from typing import List
+from typing import Mapping
+from typing import NamedTuple
+from typing import Optional
+from typing import Set
+from typing import Tuple
+from typing import cast
+
+from PIL import Image
+
+from cushead.generator import cache as generator_cache
+from cushead.generator import config as generator_config
+
+# The version of the stored graph, so the graphs of other versions are never used.
+GRAPH_VERSION = 2
+# The config keys that reference a file. The templates only check if they are defined.
+SOURCE_KEYS = ("favicon_ico", "favicon_png", "favicon_svg", "preview_png", "sitemap_urls", "pages")
+# The suffix of the recorded keys whose values are only checked to be defined.
+DEFINED_SUFFIX = ":defined"
+
+
+class OutputRecord(NamedTuple):
+    """
+    Store the inputs of a generated file.
+    """
+
+    # The fingerprints of the recorded keys, when the file was generated.
+    inputs: Dict[str, str]
+    # The modification time and size of the file after it was created, to detect the changes made outside the builds. For
+    # a group, it's the time when the build was stored and a size of 0.
+    state: Tuple[int, int]
+
+
+class TrackedConfig(dict):
+    """
+    A config that records the keys read from it.
+
+    The keys are recorded in the scopes of the dependencies that are open while they are read.
+    """
+
+    __slots__ = ("dependencies", "defined_keys")
+
+    def __init__(self, config: Mapping[str, Any], *, dependencies: Dependencies, defined_keys: Iterable[str] = ()) -> None:
+        """
+        Initialize a tracked config.
+
+        Args:
+            config: the config.
+            dependencies: where the read keys are recorded.
+            defined_keys: the keys whose values are only checked to be defined by the readers.
+        """
+        super().__init__(config)
+        self.dependencies = dependencies
+        self.defined_keys = frozenset(defined_keys)
+
+    def record_key(self, key: str) -> None:
+        """
+        Record a read key.
+
+        Args:
+            key: the key.
+        """
+        self.dependencies.add_keys(keys=(f"{key}{DEFINED_SUFFIX}" if key in self.defined_keys else key,))
+
+    def __getitem__(self, key: str) -> Any:
+        """
+        Get the value of a key, and record it.
+        """
+        self.record_key(key)
+        return super().__getitem__(key)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        """
+        Get the value of a key, and record it.
+        """
+        self.record_key(key)
+        return super().get(key, default)
+
+
+def get_fingerprint(*, value: Any) -> str:
+    """
+    Get a fingerprint of a config value.
+
+    Args:
+        value: the value.
+
+    Returns:
+        A hash of the value, that includes the content of the referenced file if it's an image or a path.
+    """
+    if isinstance(value, Image.Image) and getattr(value, "filename", None):
+        value = pathlib.Path(value.filename)
+    if isinstance(value, pathlib.Path):
+        try:
+            return hashlib.sha256(value.read_bytes()).hexdigest()
+        except OSError:
+            pass
+    return hashlib.sha256(json.dumps(value, sort_keys=True, default=str).encode()).hexdigest()
+
+
+class Dependencies:
+    """
+    Record the config keys read to generate each file, and check the files that don't need to be generated again.
+
+    The scopes of the records can be nested, so the keys read to generate a file that is used by another one are
+    recorded for both. The graph of the previous build is read from the cache, if it's defined, when the config is
+    tracked.
+    """
+
+    def __init__(self, *, cache: Optional[generator_cache.DiskCache] = None) -> None:
+        """
+        Initialize the dependencies.
+
+        Args:
+            cache: where the graph is stored between the builds.
+        """
+        self.cache = cache
+        self.scopes: List[Set[str]] = []
+        self.config: Mapping[str, Any] = {}
+        self.fingerprints: Dict[str, str] = {}
+        self.outputs: Dict[str, OutputRecord] = {}
+        self.recorded_outputs: Dict[pathlib.Path, FrozenSet[str]] = {}
+        self.groups: Dict[str, OutputRecord] = {}
+        self.recorded_groups: Dict[str, Set[str]] = {}
+        self.cache_key: Optional[str] = None
+
+    def track_config(self, *, config: generator_config.Config) -> generator_config.Config:
+        """
+        Start a build of a config.
+
+        Args:
+            config: the config.
+
+        Returns:
+            The config, that records the keys read from it.
+        """
+        self.config = config
+        self.fingerprints = {}
+        cache_key = generator_cache.get_key("dependencies", GRAPH_VERSION, str(pathlib.Path(config["output_folder_path"]).absolute()))
+        if self.cache and cache_key != self.cache_key:
+            self.outputs, self.groups = self.load(data=self.cache.get(key=cache_key))
+        self.cache_key = cache_key
+        # The tracked config has the same keys and values, so it's used as the config itself.
+        return cast(generator_config.Config, TrackedConfig(config, dependencies=self))
+
+    @contextlib.contextmanager
+    def record(self) -> Iterator[Set[str]]:
+        """
+        Record the keys read inside a scope.
+
+        The scope must not include a yield, so the keys read by the consumer aren't recorded.
+
+        Yields:
+            The keys, that are complete at the exit of the scope.
+        """
+        keys: Set[str] = set()
+        self.scopes.append(keys)
+        try:
+            yield keys
+        finally:
+            self.scopes.pop()
+
+    def add_keys(self, *, keys: Iterable[str]) -> None:
+        """
+        Record keys in the open scopes.
+
+        It's used to record the keys of the files that are generated once and used many times.
+
+        Args:
+            keys: the keys.
+        """
+        for scope in self.scopes:
+            scope.update(keys)
+
+    def add_output(self, *, path: pathlib.Path, keys: Iterable[str]) -> None:
+        """
+        Record the keys read to generate a file.
+
+        Args:
+            path: the file path.
+            keys: the keys.
+        """
+        self.recorded_outputs[pathlib.Path(path)] = frozenset(keys)
+
+    def add_group_output(self, *, group: str, keys: Iterable[str]) -> None:
+        """
+        Record the keys read to generate a file of a group.
+
+        The files of a group share a single record, with the keys read to generate all of them.
+
+        Args:
+            group: the group name.
+            keys: the keys.
+        """
+        self.recorded_groups.setdefault(group, set()).update(keys)
+
+    def get_output_keys(self, *, path: pathlib.Path) -> Optional[FrozenSet[str]]:
+        """
+        Get the keys read to generate a file in the current build.
+
+        Args:
+            path: the file path.
+
+        Returns:
+            The keys, or None if they aren't recorded.
+        """
+        return self.recorded_outputs.get(pathlib.Path(path))
+
+    def get_key_fingerprint(self, *, key: str) -> str:
+        """
+        Get the fingerprint of a recorded key in the current config.
+
+        Args:
+            key: the recorded key.
+
+        Returns:
+            The fingerprint.
+        """
+        if key not in self.fingerprints:
+            if key.endswith(DEFINED_SUFFIX):
+                self.fingerprints[key] = get_fingerprint(value=self.config.get(key[: -len(DEFINED_SUFFIX)]) is not None)
+            else:
+                self.fingerprints[key] = get_fingerprint(value=self.config.get(key))
+        return self.fingerprints[key]
+
+    def is_unchanged(self, path: pathlib.Path) -> bool:
+        """
+        Check if a file doesn't need to be generated again.
+
+        When the names of the static files include their content hash, or the service worker precaches them, the
+        templates depend on the images, so every file is generated.
+
+        Args:
+            path: the file path.
+
+        Returns:
+            True if the file exists as it was created, and none of its keys changed since then.
+        """
+        if self.config.get("fingerprint") or self.config.get("precache"):
+            return False
+        output = self.outputs.get(str(path))
+        if output is None:
+            return False
+        try:
+            stat = pathlib.Path(path).stat()
+        except OSError:
+            return False
+        if (stat.st_mtime_ns, stat.st_size) != tuple(output.state):
+            return False
+        return all(self.get_key_fingerprint(key=key) == fingerprint for key, fingerprint in output.inputs.items())
+
+    def is_group_file_unchanged(self, *, group: str, path: pathlib.Path) -> bool:
+        """
+        Check if a file of a group doesn't need to be generated again.
+
+        Args:
+            group: the group name.
+            path: the file path.
+
+        Returns:
+            True if the file exists and wasn't modified since the previous build was stored, and none of the keys of the
+            group changed since then.
+        """
+        if self.config.get("fingerprint") or self.config.get("precache"):
+            return False
+        group_output = self.groups.get(group)
+        if group_output is None:
+            return False
+        try:
+            stat = pathlib.Path(path).stat()
+        except OSError:
+            return False
+        if stat.st_mtime_ns > group_output.state[0]:
+            return False
+        return all(self.get_key_fingerprint(key=key) == fingerprint for key, fingerprint in group_output.inputs.items())
+
+    def save(self) -> None:
+        """
+        Add the files created in the current build to the graph, and store it.
+
+        It must be called after the files are created. The files that can't be found aren't added.
+        """
+        for path, keys in self.recorded_outputs.items():
+            try:
+                stat = path.stat()
+            except OSError:
+                self.outputs.pop(str(path), None)
+                continue
+            self.outputs[str(path)] = OutputRecord(inputs={key: self.get_key_fingerprint(key=key) for key in sorted(keys)}, state=(stat.st_mtime_ns, stat.st_size))
+        self.recorded_outputs = {}
+        for group, group_keys in self.recorded_groups.items():
+            # The files skipped in this build were generated with the keys of the previous one.
+            previous_keys = self.groups[group].inputs if group in self.groups else {}
+            self.groups[group] = OutputRecord(inputs={key: self.get_key_fingerprint(key=key) for key in sorted(group_keys.union(previous_keys))}, state=(time.time_ns(), 0))
+        self.recorded_groups = {}
+        if self.cache and self.cache_key:
+            self.cache.set(key=self.cache_key, data=self.dump())
+
+    def dump(self) -> bytes:
+        """
+        Get the graph in JSON format.
+
+        Returns:
+            The graph, in UTF-8 format.
+        """
+        return json.dumps(
+            {
+                "version": GRAPH_VERSION,
+                "outputs": {path: output._asdict() for path, output in self.outputs.items()},
+                "groups": {group: output._asdict() for group, output in self.groups.items()},
+            },
+            sort_keys=True,
+        ).encode()
+
+    @staticmethod
+    def load(*, data: Optional[bytes]) -> Tuple[Dict[str, OutputRecord], Dict[str, OutputRecord]]:
+        """
+        Read a graph in JSON format.
+
+        Args:
+            data: the graph, in UTF-8 format.
+
+        Returns:
+            The inputs of each file by its path, and the inputs of each group by its name. They are empty if the graph
+            can't be read.
+        """
+        try:
+            graph = json.loads(data or b"{}")
+            if graph.get("version") != GRAPH_VERSION:
+                return {}, {}
+            outputs = {path: OutputRecord(inputs=dict(output["inputs"]), state=tuple(output["state"])) for path, output in graph["outputs"].items()}
+            groups = {group: OutputRecord(inputs=dict(output["inputs"]), state=tuple(output["state"])) for group, output in graph["groups"].items()}
+            return outputs, groups
+        except (ValueError, TypeError, KeyError, AttributeError):
+            return {}, {}
+
+
+def record(*, dependencies: Optional[Dependencies]) -> ContextManager[Set[str]]:
+    """
+    Record the keys read inside a scope, if the dependencies are defined.
+
+    Args:
+        dependencies: the dependencies.
+
+    Returns:
+        The context manager of the scope.
+    """
+    if dependencies is None:
+        return contextlib.nullcontext(set())
+    return dependencies.record()
+
+
+def get_template_config(*, config: Mapping[str, Any], dependencies: Optional[Dependencies]) -> Mapping[str, Any]:
+    """
+    Get the config used in the templates context.
+
+    The templates only check if the keys that reference a file are defined, so the content of those files isn't one of
+    their inputs.
+
+    Args:
+        config: the config.
+        dependencies: if defined, the keys read by the templates are recorded on it.
+
+    Returns:
+        The config.
+    """
+    if dependencies is None:
+        return config
+    return TrackedConfig(config, dependencies=dependencies, defined_keys=SOURCE_KEYS)
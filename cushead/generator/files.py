@@ -1,12 +1,27 @@
 """
 Handle files generation.
 """
+import hashlib
+import itertools
 import pathlib
+from typing import Callable
+from typing import Dict
+from typing import Iterable
+from typing import Iterator
+from typing import List
+from typing import Mapping
 from typing import NamedTuple
-from typing import Tuple
+from typing import Optional
 
+from cushead.generator import cache as generator_cache
+from cushead.generator import compression
 from cushead.generator import config as generator_config
+from cushead.generator import dependencies as generator_dependencies
 from cushead.generator import images
+from cushead.generator import locales
+from cushead.generator import pages
+from cushead.generator import precache
+from cushead.generator import report as generator_report
 from cushead.generator.templates import templates
 
 
@@ -19,17 +34,143 @@ class File(NamedTuple):
     data: bytes
 
 
-def generate_files(*, config: generator_config.Config) -> Tuple[File, ...]:
+class PageFile(File):
     """
-    Get the images and templates to create.
+    Store data about a page of the pages file to create.
+
+    The writers don't keep track of their paths, so the memory they use doesn't grow with the number of pages.
+    """
+
+    __slots__ = ()
+
+
+def get_fingerprinted_name(*, name: str, data: bytes) -> str:
+    """
+    Get a file name that includes a hash of the file content.
 
     Args:
-        config: the config.
+        name: the file name.
+        data: the file content.
 
     Returns:
-        The images and templates.
+        The file name, with the hash before the suffix.
+    """
+    path = pathlib.Path(name)
+    return f"{path.stem}.{hashlib.sha256(data).hexdigest()[0:8]}{path.suffix}"
+
+
+def fingerprint_files(*, files_to_fingerprint: Iterable[File], folder: pathlib.Path, static_names: Dict[str, str]) -> Iterator[File]:
+    """
+    Add a hash of the content to the name of the files of a folder.
+
+    Args:
+        files_to_fingerprint: the files.
+        folder: the folder whose files are renamed.
+        static_names: where the new names are stored, by the original names.
+
+    Yields:
+        The files, renamed if they are inside the folder.
+    """
+    for file in files_to_fingerprint:
+        path = pathlib.Path(file.path)
+        if path.parent == folder:
+            static_names[path.name] = get_fingerprinted_name(name=path.name, data=file.data)
+            file = File(path=path.with_name(static_names[path.name]), data=file.data)
+        yield file
+
+
+def record_outputs(*, files_to_record: Iterable[File], keys: Mapping[pathlib.Path, Iterable[str]], dependencies: Optional[generator_dependencies.Dependencies]) -> Iterator[File]:
+    """
+    Record the config keys read to generate some files, as they are generated.
+
+    Args:
+        files_to_record: the files.
+        keys: the keys read to generate each file, by its path.
+        dependencies: the dependencies. If it's None, nothing is recorded.
+
+    Yields:
+        The files.
+    """
+    for file in files_to_record:
+        if dependencies and file.path in keys:
+            dependencies.add_output(path=file.path, keys=keys[file.path])
+        yield file
+
+
+def generate_files(
+    *,
+    config: generator_config.Config,
+    jobs: int = 1,
+    cache: Optional[generator_cache.DiskCache] = None,
+    skip_path: Optional[Callable[[pathlib.Path], bool]] = None,
+    report: Optional[generator_report.BuildReport] = None,
+    dependencies: Optional[generator_dependencies.Dependencies] = None,
+) -> Iterator[File]:
+    """
+    Get the images, templates, localized pages and pages to create.
+
+    The files are generated lazily, so each one can be created as soon as it's ready, without keeping the others in
+    memory.
+
+    Args:
+        config: the config.
+        jobs: the number of workers used to generate the images and the pages.
+        cache: the cache of the generated images and the compiled templates.
+        skip_path: if defined, the files whose path makes it return True are never generated.
+        report: if defined, the statistics of the build are collected on it.
+        dependencies: if defined, the config keys read to generate each file are recorded on it.
+
+    Yields:
+        The images, templates, localized pages and pages.
     """
-    return (
-        *images.generate_images(config=config),
-        *templates.generate_templates(config=config),
+    if dependencies:
+        config = dependencies.track_config(config=config)
+    # The images are generated first, so their names and revisions are known when the templates that reference them are
+    # rendered.
+    static_names: Dict[str, str] = {}
+    assets: List[precache.Asset] = []
+    generated_images = images.generate_images(config=config, jobs=jobs, cache=cache, skip_path=skip_path, report=report, dependencies=dependencies)
+    if config.get("fingerprint"):
+        generated_images = fingerprint_files(files_to_fingerprint=generated_images, folder=config["output_folder_path"] / "static", static_names=static_names)
+    if config.get("precache"):
+        generated_images = precache.record_assets(files_to_record=generated_images, assets=assets)
+    generated_files = itertools.chain(
+        generated_images,
+        templates.generate_templates(config=config, skip_path=skip_path, cache=cache, report=report, static_names=static_names, assets=assets, dependencies=dependencies),
     )
+    if config.get("locales"):
+        # The pages are generated after the templates, so the names of all the static files are known.
+        generated_files = itertools.chain(
+            generated_files,
+            locales.generate_locales(
+                config=config,
+                jobs=jobs,
+                static_names=static_names,
+                cache_path=cache.path if cache else None,
+                skip_path=skip_path,
+                dependencies=dependencies,
+            ),
+        )
+    if config.get("pages"):
+        generated_files = itertools.chain(
+            generated_files,
+            pages.generate_pages(
+                config=config,
+                jobs=jobs,
+                static_names=static_names,
+                cache_path=cache.path if cache else None,
+                skip_path=skip_path,
+                dependencies=dependencies,
+            ),
+        )
+    with generator_dependencies.record(dependencies=dependencies) as precompress_keys:
+        precompress = config.get("precompress")
+    for file in generated_files:
+        yield file
+        if precompress:
+            keys = dependencies.get_output_keys(path=file.path) if dependencies else None
+            for compressed_file in compression.generate_compressed_files(file=file, skip_path=skip_path):
+                # The compressed copies are generated with the file, so they have its keys.
+                if dependencies and keys is not None:
+                    dependencies.add_output(path=compressed_file.path, keys=keys | precompress_keys)
+                yield compressed_file
@@ -3,8 +3,23 @@ Handle images generation.
 """
 from __future__ import annotations
 
+import collections
+import functools
+import hashlib
 import io
+import math
 import pathlib
+import sys
+import threading
+import time
+import zlib
+from concurrent import futures
+from typing import Callable
+from typing import Counter
+from typing import Deque
+from typing import Dict
+from typing import Iterable
+from typing import Iterator
 from typing import List
 from typing import NamedTuple
 from typing import Optional
@@ -14,12 +29,33 @@ from typing import overload
 
 from PIL import IcoImagePlugin
 from PIL import Image
+from PIL import ImageChops
 from PIL import ImageColor
 from PIL import PngImagePlugin
 from resizeimage import resizeimage
 
+from cushead.generator import cache as generator_cache
 from cushead.generator import config as generator_config
+from cushead.generator import dependencies as generator_dependencies
 from cushead.generator import files
+from cushead.generator import report as generator_report
+
+# The encoder options tried for each PNG profile. When a profile has many options, the smallest output is kept.
+PNG_PROFILES: Dict[str, Tuple[Dict[str, int], ...]] = {
+    # Low zlib level, for development builds.
+    "fast": ({"compress_level": 1},),
+    # Pillow defaults.
+    "balanced": ({},),
+    # Best zlib level, trying the compression strategies that usually win for icons and flat backgrounds.
+    "smallest": (
+        {"optimize": True},
+        {"optimize": True, "compress_type": zlib.Z_FILTERED},
+        {"optimize": True, "compress_type": zlib.Z_RLE},
+    ),
+}
+
+# The maximum number of hashes of source files kept in memory.
+MAX_FILE_DIGESTS = 256
 
 
 class ImageData(NamedTuple):
@@ -30,6 +66,42 @@ class ImageData(NamedTuple):
     path: pathlib.Path
     width: int
     height: int
+    background_color: Optional[str] = None
+
+
+class RenderKey(NamedTuple):
+    """
+    Identify the bytes of an image generated from a source.
+
+    Two images with the same key and source have the same bytes, so they are rendered once.
+    """
+
+    width: int
+    height: int
+    background_color: Optional[str]
+    png_profile: str
+    reduce_colors: bool
+
+
+def get_render_key(*, image_data: ImageData, png_profile: str, reduce_colors: bool) -> RenderKey:
+    """
+    Get the render key of an image.
+
+    Args:
+        image_data: the data about the image to create.
+        png_profile: the PNG profile used to encode the image.
+        reduce_colors: if the image is stored with the smallest color type able to represent it.
+
+    Returns:
+        The render key.
+    """
+    return RenderKey(
+        width=image_data.width,
+        height=image_data.height,
+        background_color=image_data.background_color or None,
+        png_profile=png_profile,
+        reduce_colors=reduce_colors,
+    )
 
 
 @overload
@@ -68,22 +140,24 @@ def get_resized_image(*, image, width, height):
 
 
 @overload
-def get_opaque_image(*, image: None, background_color: str) -> None:
+def get_opaque_image(*, image: None, background_color: str, composite_alpha: bool = False) -> None:
     ...
 
 
 @overload
-def get_opaque_image(*, image: PngImagePlugin.PngImageFile, background_color: str) -> PngImagePlugin.PngImageFile:
+def get_opaque_image(*, image: PngImagePlugin.PngImageFile, background_color: str, composite_alpha: bool = False) -> PngImagePlugin.PngImageFile:
     ...
 
 
-def get_opaque_image(*, image, background_color):
+def get_opaque_image(*, image, background_color, composite_alpha=False):
     """
     Get an opaque version of an image.
 
     Args:
         image: a PIL image instance.
         background_color: the background color used to replace the transparency.
+        composite_alpha: if the image is composited over the background, so every pixel is opaque. Otherwise, it's
+            pasted with its alpha as mask, that keeps the translucent pixels partially translucent.
 
     Returns:
         A new image instance.
@@ -91,20 +165,232 @@ def get_opaque_image(*, image, background_color):
     if image is None:
         return None
 
-    alpha = image.convert("RGBA").getchannel("A")
     color = ImageColor.getrgb(background_color) + (255,)
     new_image = Image.new("RGBA", image.size, color)
-    new_image.paste(image, mask=alpha)
+    if composite_alpha:
+        new_image.alpha_composite(image.convert("RGBA"))
+    else:
+        new_image.paste(image, mask=image.convert("RGBA").getchannel("A"))
     new_image.format = image.format
     return new_image
 
 
-def get_image_bytes(*, image: Optional[Union[IcoImagePlugin.IcoImageFile, PngImagePlugin.PngImageFile]]) -> bytes:
+def get_contained_size(*, size: Tuple[int, int], width: int, height: int) -> Tuple[int, int]:
+    """
+    Get the size that an image must have to fit inside a box without losing its aspect ratio.
+
+    It follows the same rules as Image.thumbnail, so it never enlarges the image.
+
+    Args:
+        size: the image size.
+        width: the box width.
+        height: the box height.
+
+    Returns:
+        The size.
+    """
+    if width >= size[0] and height >= size[1]:
+        return size
+
+    def round_aspect(number: float, key: Callable[[int], float]) -> int:
+        return max(min(math.floor(number), math.ceil(number), key=key), 1)
+
+    aspect = size[0] / size[1]
+    if width / height >= aspect:
+        return round_aspect(height * aspect, key=lambda number: abs(aspect - number / height)), height
+    return width, round_aspect(width / aspect, key=lambda number: 0 if number == 0 else abs(aspect - width / number))
+
+
+def get_contained_image(*, image: Image.Image, width: int, height: int, background_color: Optional[str] = None, composite_alpha: bool = False) -> Image.Image:
+    """
+    Center an image inside a canvas.
+
+    It gives the same result as resizeimage.resize_contain when the image already has the contained size, followed by
+    get_opaque_image when the background color is defined.
+
+    Args:
+        image: a PIL image instance, with a size that fits inside the canvas.
+        width: the canvas width.
+        height: the canvas height.
+        background_color: if defined, the canvas is filled with this color instead of being transparent.
+        composite_alpha: if the image is composited over the background color, as in get_opaque_image.
+
+    Returns:
+        A new image instance.
+    """
+    position = (math.ceil((width - image.width) / 2), math.ceil((height - image.height) / 2))
+    if not background_color:
+        canvas = Image.new("RGBA", (width, height), (255, 255, 255, 0))
+        canvas.paste(image, position)
+    else:
+        canvas = Image.new("RGBA", (width, height), ImageColor.getrgb(background_color) + (255,))
+        if composite_alpha:
+            canvas.alpha_composite(image.convert("RGBA"), dest=position)
+        else:
+            canvas.paste(image, position, mask=image.convert("RGBA").getchannel("A"))
+    return canvas.convert("RGBA")
+
+
+class DownscalePyramid:
+    """
+    Resize an image to many sizes, scaling it once per contained size.
+
+    The boxes with the same contained size, like the portrait and landscape versions of a startup image, share the
+    resized image and only differ in the canvas where it's pasted. If a ratio is defined, each size is derived from the
+    nearest larger one.
+
+    The plan is made once, from the biggest size to the smallest, and doesn't depend on the order in which the sizes are
+    requested. Then the output is the same for serial and parallel runs.
+    """
+
+    def __init__(self, *, image: PngImagePlugin.PngImageFile, sizes: Iterable[Tuple[int, int]], ratio: Optional[float] = None) -> None:
+        """
+        Plan the resizes.
+
+        Args:
+            image: the source image.
+            sizes: the sizes of the boxes where the image must fit, once for each time a box will be requested.
+            ratio: the minimum ratio between an intermediate image and the image derived from it. A bigger value means
+                more quality and less speed. If not defined, every size is resized from the source.
+        """
+        self.image = image
+        self.parents: Dict[Tuple[int, int], Optional[Tuple[int, int]]] = {}
+        self.thumbnails: Dict[Tuple[int, int], futures.Future[Image.Image]] = {}
+        self.uses: Counter[Tuple[int, int]] = collections.Counter(get_contained_size(size=image.size, width=width, height=height) for width, height in sizes)
+        self.lock = threading.Lock()
+
+        planned_sizes: List[Tuple[int, int]] = []
+        for size in sorted(self.uses, key=lambda size: size[0] * size[1], reverse=True):
+            candidates = [] if ratio is None else [parent for parent in planned_sizes if parent[0] >= size[0] * ratio and parent[1] >= size[1] * ratio]
+            self.parents[size] = min(candidates, key=lambda parent: parent[0] * parent[1], default=None)
+            planned_sizes.append(size)
+        for parent in self.parents.values():
+            if parent is not None:
+                self.uses[parent] += 1
+
+    def get_thumbnail(self, *, size: Tuple[int, int]) -> Image.Image:
+        """
+        Get the source image resized to a planned size.
+
+        Each thumbnail is computed once, by the first worker that needs it, and shared with the others.
+
+        Args:
+            size: the size.
+
+        Returns:
+            The resized image. It must not be modified.
+        """
+        with self.lock:
+            thumbnail = self.thumbnails.get(size)
+            is_owner = thumbnail is None
+            if thumbnail is None:
+                thumbnail = self.thumbnails[size] = futures.Future()
+
+        if is_owner:
+            parent = self.parents.get(size)
+            try:
+                source = self.image if parent is None else self.get_thumbnail(size=parent)
+                thumbnail.set_result(source.resize(size, Image.LANCZOS, reducing_gap=2.0) if source.size != size else source)
+            except Exception as exception:
+                thumbnail.set_exception(exception)
+            if parent is not None:
+                self.release_thumbnail(size=parent)
+        return thumbnail.result()
+
+    def release_thumbnail(self, *, size: Tuple[int, int]) -> None:
+        """
+        Mark a use of a thumbnail as done, and forget the thumbnail after the last planned use.
+
+        Args:
+            size: the thumbnail size.
+        """
+        with self.lock:
+            self.uses[size] -= 1
+            if self.uses[size] <= 0:
+                self.thumbnails.pop(size, None)
+
+    def get_resized_image(self, *, width: int, height: int, background_color: Optional[str] = None, composite_alpha: bool = False) -> PngImagePlugin.PngImageFile:
+        """
+        Get a resized version of the source image.
+
+        Args:
+            width: the width.
+            height: the height.
+            background_color: if defined, the color used to replace the transparency.
+            composite_alpha: if the image is composited over the background color, as in get_opaque_image.
+
+        Returns:
+            A new image instance.
+        """
+        size = get_contained_size(size=self.image.size, width=width, height=height)
+        try:
+            resized_image = get_contained_image(
+                image=self.get_thumbnail(size=size),
+                width=width,
+                height=height,
+                background_color=background_color,
+                composite_alpha=composite_alpha,
+            )
+        finally:
+            self.release_thumbnail(size=size)
+        resized_image.format = self.image.format
+        return resized_image
+
+
+def get_reduced_image(*, image: PngImagePlugin.PngImageFile) -> PngImagePlugin.PngImageFile:
+    """
+    Get a version of an image that uses the smallest color type able to represent it without losses.
+
+    The alpha channel is dropped when all the pixels are opaque, the grayscale types are used when all the pixels are
+    gray, and a palette is used when there are 256 colors or less.
+
+    Args:
+        image: a PIL image instance in RGBA mode.
+
+    Returns:
+        A new image instance, or the same one if it can't be reduced.
+    """
+    if image.mode != "RGBA":
+        return image
+
+    is_opaque = image.getchannel("A").getextrema()[0] == 255
+    red, green, blue, _ = image.split()
+    is_gray = ImageChops.difference(red, green).getbbox() is None and ImageChops.difference(green, blue).getbbox() is None
+    colors = None if is_gray and is_opaque else image.getcolors(256)
+
+    if is_gray and is_opaque:
+        reduced_image = image.convert("L")
+    elif colors is not None:
+        # Sort the palette by alpha, so the transparency chunk only needs the entries before the opaque ones.
+        palette = sorted((color for _, color in colors), key=lambda color: color[3])
+        indexes = {int.from_bytes(bytes(color), sys.byteorder): index for index, color in enumerate(palette)}
+        reduced_image = Image.frombytes("P", image.size, bytes(map(indexes.__getitem__, memoryview(image.tobytes()).cast("I"))))
+        reduced_image.putpalette([channel for color in palette for channel in color[:3]])
+        transparency = bytes(color[3] for color in palette if color[3] != 255)
+        if transparency:
+            reduced_image.info["transparency"] = transparency
+    elif is_gray:
+        reduced_image = image.convert("LA")
+    elif is_opaque:
+        reduced_image = image.convert("RGB")
+    else:
+        return image
+
+    reduced_image.format = image.format
+    return reduced_image
+
+
+def get_image_bytes(
+    *,
+    image: Optional[Union[IcoImagePlugin.IcoImageFile, PngImagePlugin.PngImageFile]],
+    png_profile: str = generator_config.DEFAULT_PNG_PROFILE,
+) -> bytes:
     """
     Get the bytes of an image.
 
     Args:
         image: a PIL image instance.
+        png_profile: the PNG profile used to encode the image. It's ignored for other formats.
 
     Returns:
         The bytes.
@@ -112,32 +398,251 @@ def get_image_bytes(*, image: Optional[Union[IcoImagePlugin.IcoImageFile, PngIma
     if image is None:
         return bytes()
 
-    io_file = io.BytesIO()
-    image.save(io_file, format=image.format)
-    return io_file.getvalue()
+    encoder_options: Tuple[Dict[str, int], ...] = PNG_PROFILES[png_profile] if image.format == "PNG" else ({},)
+    images_bytes = []
+    for options in encoder_options:
+        io_file = io.BytesIO()
+        image.save(io_file, format=image.format, **options)
+        images_bytes.append(io_file.getvalue())
+    return min(images_bytes, key=len)
 
 
-def generate_images(*, config: generator_config.Config) -> List[files.File]:
+@functools.lru_cache(maxsize=MAX_FILE_DIGESTS)
+def get_file_state_digest(*, path: pathlib.Path, modification_time: int, size: int) -> str:
     """
-    Get the images ready to create.
+    Get a hash of the content of a file, in a given state.
+
+    The state is only used to identify the memoized hashes, so a changed file is read again.
 
     Args:
-        config: the config.
+        path: the resolved file path.
+        modification_time: the modification time of the file, in nanoseconds.
+        size: the size of the file, in bytes.
+
+    Returns:
+        The hash.
+    """
+    return hashlib.sha256(path.read_bytes()).hexdigest()
+
+
+def get_file_digest(*, path: pathlib.Path) -> str:
+    """
+    Get a hash of the content of a file.
+
+    The hashes are kept by the resolved path, modification time and size of the files, so an unchanged file is read
+    once per process.
+
+    Args:
+        path: the file path.
+
+    Returns:
+        The hash.
+
+    Raises:
+        OSError: when the file can't be read.
+    """
+    resolved_path = path.resolve()
+    stat = resolved_path.stat()
+    return get_file_state_digest(path=resolved_path, modification_time=stat.st_mtime_ns, size=stat.st_size)
+
+
+def get_image_digest(*, image: Optional[Union[IcoImagePlugin.IcoImageFile, PngImagePlugin.PngImageFile]]) -> Optional[str]:
+    """
+    Get a hash of the file of an image, without decoding it.
+
+    Args:
+        image: a PIL image instance.
+
+    Returns:
+        The hash, or None if the image doesn't come from a file.
+    """
+    filename = getattr(image, "filename", None)
+    if not filename:
+        return None
+    return get_file_digest(path=pathlib.Path(filename))
+
+
+def render_image(
+    *,
+    image: Optional[PngImagePlugin.PngImageFile],
+    render_key: RenderKey,
+    pyramid: Optional[DownscalePyramid] = None,
+    report: Optional[generator_report.BuildReport] = None,
+) -> bytes:
+    """
+    Resize and encode an image.
+
+    Args:
+        image: the source image.
+        render_key: the render key of the image to create.
+        pyramid: if defined, it's used to share the resized images between the render keys, and to resize them from
+            intermediate ones when it has a ratio.
+        report: if defined, the encoded image is counted on it.
 
     Returns:
+        The bytes.
+    """
+    # The reduced images are composited over the background color, so they can drop the alpha channel.
+    if pyramid is None:
+        resized_image = get_resized_image(image=image, width=render_key.width, height=render_key.height)
+        if render_key.background_color:
+            resized_image = get_opaque_image(image=resized_image, background_color=render_key.background_color, composite_alpha=render_key.reduce_colors)
+    else:
+        resized_image = pyramid.get_resized_image(
+            width=render_key.width,
+            height=render_key.height,
+            background_color=render_key.background_color,
+            composite_alpha=render_key.reduce_colors,
+        )
+    start = time.perf_counter()
+    candidates = [resized_image]
+    if render_key.reduce_colors and resized_image is not None:
+        reduced_image = get_reduced_image(image=resized_image)
+        # A palette adds some bytes, so it can be bigger than the original for the smallest images.
+        candidates = [reduced_image, resized_image] if reduced_image.mode == "P" else [reduced_image]
+    data = min((get_image_bytes(image=candidate, png_profile=render_key.png_profile) for candidate in candidates), key=len)
+    if report and resized_image is not None:
+        report.add_encoded_image(png_profile=render_key.png_profile, size=len(data), seconds=time.perf_counter() - start)
+    return data
+
+
+def generate_images_in_parallel(
+    *,
+    image: Optional[PngImagePlugin.PngImageFile],
+    images_data: Tuple[ImageData, ...],
+    jobs: int,
+    image_key: str = "favicon_png",
+    downscale_ratio: Optional[float] = None,
+    png_profile: str = generator_config.DEFAULT_PNG_PROFILE,
+    reduce_colors: bool = False,
+    cache: Optional[generator_cache.DiskCache] = None,
+    skip_path: Optional[Callable[[pathlib.Path], bool]] = None,
+    report: Optional[generator_report.BuildReport] = None,
+) -> Iterator[files.File]:
+    """
+    Resize and encode a group of images using a pool of workers.
+
+    Pillow releases the GIL while it resamples and compresses, so threads are enough to use many cores. The images are
+    yielded in the order of images_data, then the output is the same as a serial run.
+    Only a few images are rendered ahead of the one being consumed, so the memory usage doesn't grow with the number of
+    images. Each unique render key is rendered once, and its bytes are kept until the last image that has it is yielded.
+    Each contained size is resized once, and pasted into the canvas of every render key that needs it.
+    If all the images are in the cache, the source is never decoded.
+
+    Args:
+        image: the source image.
+        images_data: the data about the images to create.
+        jobs: the number of workers.
+        image_key: the config key of the source image, used to report it if it can't be decoded.
+        downscale_ratio: if defined, derive each image from the nearest larger one that is at least this ratio bigger.
+        png_profile: the PNG profile used to encode the images.
+        reduce_colors: if the images are stored with the smallest color type able to represent them.
+        cache: if defined, the images are read from it when available, and stored on it after being rendered.
+        skip_path: if defined, the images whose path makes it return True are never rendered.
+        report: if defined, the encoded and cached images are counted on it.
+
+    Yields:
+        The images ready to create.
+    """
+    render_keys = tuple(get_render_key(image_data=image_data, png_profile=png_profile, reduce_colors=reduce_colors) for image_data in images_data)
+    last_uses = {render_key: index for index, render_key in enumerate(render_keys)}
+    image_digest = get_image_digest(image=image) if cache else None
+    rendered_images: Dict[RenderKey, futures.Future[bytes]] = {}
+    pending_images: Deque[int] = collections.deque()
+    pyramid: Optional[DownscalePyramid] = None
+    has_rendered = False
+
+    def get_cache_key(render_key: RenderKey) -> Optional[str]:
+        if image is None or image_digest is None:
+            return None
+        return generator_cache.get_key(image_digest, image.format, *render_key, downscale_ratio)
+
+    def render(render_key: RenderKey) -> bytes:
+        data = render_image(image=image, render_key=render_key, pyramid=pyramid, report=report)
+        cache_key = get_cache_key(render_key)
+        if cache and cache_key:
+            cache.set(key=cache_key, data=data)
+        return data
+
+    def submit(render_key: RenderKey) -> futures.Future[bytes]:
+        nonlocal pyramid, has_rendered
+        cache_key = get_cache_key(render_key)
+        data = cache.get(key=cache_key) if cache and cache_key else None
+        if data is not None:
+            if report:
+                report.add_cached_image()
+            future: futures.Future[bytes] = futures.Future()
+            future.set_result(data)
+            return future
+
+        if image is not None and not has_rendered:
+            # Decode the source before sharing it between the workers.
+            generator_config.decode_image(key=image_key, image=image)
+            # Plan with all the sizes, so the output doesn't depend on the cached or skipped images.
+            sizes = ((render_key.width, render_key.height) for render_key in dict.fromkeys(render_keys))
+            pyramid = DownscalePyramid(image=image, sizes=sizes, ratio=downscale_ratio)
+        has_rendered = True
+        return executor.submit(render, render_key)
+
+    def pop() -> files.File:
+        index = pending_images.popleft()
+        render_key = render_keys[index]
+        data = rendered_images[render_key].result()
+        if last_uses[render_key] == index:
+            del rendered_images[render_key]
+        return files.File(path=images_data[index].path, data=data)
+
+    with futures.ThreadPoolExecutor(max_workers=jobs) as executor:
+        for index, image_data in enumerate(images_data):
+            if skip_path and skip_path(image_data.path):
+                continue
+            if render_keys[index] not in rendered_images:
+                rendered_images[render_keys[index]] = submit(render_keys[index])
+            pending_images.append(index)
+            while len(pending_images) > jobs:
+                yield pop()
+        while pending_images:
+            yield pop()
+
+    if cache and has_rendered:
+        cache.evict()
+
+
+def generate_images(
+    *,
+    config: generator_config.Config,
+    jobs: int = 1,
+    cache: Optional[generator_cache.DiskCache] = None,
+    skip_path: Optional[Callable[[pathlib.Path], bool]] = None,
+    report: Optional[generator_report.BuildReport] = None,
+    dependencies: Optional[generator_dependencies.Dependencies] = None,
+) -> Iterator[files.File]:
+    """
+    Get the images ready to create.
+
+    The images are generated lazily, when they are consumed.
+
+    Args:
+        config: the config.
+        jobs: the number of workers used to resize and encode the images.
+        cache: the cache of the generated images.
+        skip_path: if defined, the images whose path makes it return True are never generated.
+        report: if defined, the encoded and cached images are counted on it.
+        dependencies: if defined, the config keys read to generate each image are recorded on it. The keys that only
+            decide if an image is generated aren't recorded.
+
+    Yields:
         The images.
     """
-    images = []
     images_data: Tuple[ImageData, ...]
 
-    if config.get("favicon_ico"):
-        images.append(
-            # favicon ICO version, used by most browsers and OpenSearch.
-            files.File(
-                path=config["output_folder_path"] / "favicon.ico",
-                data=get_image_bytes(image=config["favicon_ico"]),
-            )
-        )
+    # favicon ICO version, used by most browsers and OpenSearch.
+    path = config["output_folder_path"] / "favicon.ico"
+    if config.get("favicon_ico") and not (skip_path and skip_path(path)):
+        with generator_dependencies.record(dependencies=dependencies) as keys:
+            generator_config.decode_image(key="favicon_ico", image=config["favicon_ico"])
+            data = get_image_bytes(image=config["favicon_ico"])
+        yield from files.record_outputs(files_to_record=(files.File(path=path, data=data),), keys={path: keys}, dependencies=dependencies)
 
     if config.get("favicon_png"):
         images_data = (
@@ -175,63 +680,87 @@ def generate_images(*, config: generator_config.Config) -> List[files.File]:
             # manifest.
             ImageData(path=config["output_folder_path"] / "static" / "manifest-192x192.png", width=192, height=192),
             ImageData(path=config["output_folder_path"] / "static" / "manifest-512x512.png", width=512, height=512),
-            # Apple startup image.
-            # Source: https://github.com/onderceylan/pwa-asset-generator
-            ImageData(path=config["output_folder_path"] / "static" / "apple-touch-startup-image-1024x1024.png", width=1024, height=1024),
-            ImageData(path=config["output_folder_path"] / "static" / "apple-touch-startup-image-2048x2732.png", width=2048, height=2732),
-            ImageData(path=config["output_folder_path"] / "static" / "apple-touch-startup-image-2732x2048.png", width=2732, height=2048),
-            ImageData(path=config["output_folder_path"] / "static" / "apple-touch-startup-image-1668x2388.png", width=1668, height=2388),
-            ImageData(path=config["output_folder_path"] / "static" / "apple-touch-startup-image-2388x1668.png", width=2388, height=1668),
-            ImageData(path=config["output_folder_path"] / "static" / "apple-touch-startup-image-1668x2224.png", width=1668, height=2224),
-            ImageData(path=config["output_folder_path"] / "static" / "apple-touch-startup-image-2224x1668.png", width=2224, height=1668),
-            ImageData(path=config["output_folder_path"] / "static" / "apple-touch-startup-image-1536x2048.png", width=1536, height=2048),
-            ImageData(path=config["output_folder_path"] / "static" / "apple-touch-startup-image-2048x1536.png", width=2048, height=1536),
-            ImageData(path=config["output_folder_path"] / "static" / "apple-touch-startup-image-1242x2688.png", width=1242, height=2688),
-            ImageData(path=config["output_folder_path"] / "static" / "apple-touch-startup-image-2688x1242.png", width=2688, height=1242),
-            ImageData(path=config["output_folder_path"] / "static" / "apple-touch-startup-image-1125x2436.png", width=1125, height=2436),
-            ImageData(path=config["output_folder_path"] / "static" / "apple-touch-startup-image-2436x1125.png", width=2436, height=1125),
-            ImageData(path=config["output_folder_path"] / "static" / "apple-touch-startup-image-828x1792.png", width=828, height=1792),
-            ImageData(path=config["output_folder_path"] / "static" / "apple-touch-startup-image-1792x828.png", width=1792, height=828),
-            ImageData(path=config["output_folder_path"] / "static" / "apple-touch-startup-image-1242x2208.png", width=1242, height=2208),
-            ImageData(path=config["output_folder_path"] / "static" / "apple-touch-startup-image-2208x1242.png", width=2208, height=1242),
-            ImageData(path=config["output_folder_path"] / "static" / "apple-touch-startup-image-750x1334.png", width=750, height=1334),
-            ImageData(path=config["output_folder_path"] / "static" / "apple-touch-startup-image-1334x750.png", width=1334, height=750),
-            ImageData(path=config["output_folder_path"] / "static" / "apple-touch-startup-image-640x1136.png", width=640, height=1136),
-            ImageData(path=config["output_folder_path"] / "static" / "apple-touch-startup-image-1136x640.png", width=1136, height=640),
         )
         if config.get("domain") and config.get("title"):
             # OpenSearch.
-            images.append(
-                files.File(
-                    path=config["output_folder_path"] / "static" / "opensearch-16x16.png",
-                    data=get_image_bytes(image=get_resized_image(image=config["favicon_png"], width=16, height=16)),
-                ),
+            images_data = (
+                ImageData(path=config["output_folder_path"] / "static" / "opensearch-16x16.png", width=16, height=16),
+                *images_data,
             )
-
-        images.extend(
-            files.File(
-                path=image.path,
-                data=get_image_bytes(image=get_resized_image(image=config["favicon_png"], width=image.width, height=image.height)),
+        with generator_dependencies.record(dependencies=dependencies) as background_keys:
+            background_images_data = (
+                # Apple startup image, the icon over the background color.
+                # Source: https://github.com/onderceylan/pwa-asset-generator
+                *(
+                    ImageData(
+                        path=config["output_folder_path"] / "static" / f"apple-touch-startup-image-{width}x{height}.png",
+                        width=width,
+                        height=height,
+                        background_color=config.get("background_color"),
+                    )
+                    for width, height in (
+                        (1024, 1024),
+                        (2048, 2732),
+                        (2732, 2048),
+                        (1668, 2388),
+                        (2388, 1668),
+                        (1668, 2224),
+                        (2224, 1668),
+                        (1536, 2048),
+                        (2048, 1536),
+                        (1242, 2688),
+                        (2688, 1242),
+                        (1125, 2436),
+                        (2436, 1125),
+                        (828, 1792),
+                        (1792, 828),
+                        (1242, 2208),
+                        (2208, 1242),
+                        (750, 1334),
+                        (1334, 750),
+                        (640, 1136),
+                        (1136, 640),
+                    )
+                ),
+                # Yandex.
+                ImageData(
+                    path=config["output_folder_path"] / "static" / "yandex.png",
+                    width=120,
+                    height=120,
+                    background_color=config.get("background_color"),
+                ),
             )
-            for image in images_data
+        with generator_dependencies.record(dependencies=dependencies) as keys:
+            image = config["favicon_png"]
+            downscale_ratio = config.get("downscale_ratio")
+            png_profile = config["png_profile"]
+            reduce_colors = config["reduce_colors"]
+        # Only the images with a background depend on its color.
+        images_keys = {
+            **{image_data.path: keys for image_data in images_data},
+            **{image_data.path: keys | background_keys for image_data in background_images_data},
+        }
+        yield from files.record_outputs(
+            files_to_record=generate_images_in_parallel(
+                images_data=(*images_data, *background_images_data),
+                jobs=jobs,
+                cache=cache,
+                skip_path=skip_path,
+                report=report,
+                image=image,
+                downscale_ratio=downscale_ratio,
+                png_profile=png_profile,
+                reduce_colors=reduce_colors,
+            ),
+            keys=images_keys,
+            dependencies=dependencies,
         )
 
-        # Yandex.
-        image = ImageData(path=config["output_folder_path"] / "static" / "yandex.png", width=120, height=120)
-        resized_image = get_resized_image(image=config["favicon_png"], width=image.width, height=image.height)
-        if config.get("background_color"):
-            parsed_image = get_opaque_image(image=resized_image, background_color=str(config["background_color"]))
-        else:
-            parsed_image = resized_image
-        images.append(files.File(data=get_image_bytes(image=parsed_image), path=image.path))
-
-    if config["favicon_svg"]:
-        images.append(
-            files.File(
-                path=config["output_folder_path"] / "static" / "mask-icon.svg",
-                data=getattr(config["favicon_svg"], "read_bytes", bytes)(),
-            )
-        )
+    path = config["output_folder_path"] / "static" / "mask-icon.svg"
+    if config["favicon_svg"] and not (skip_path and skip_path(path)):
+        with generator_dependencies.record(dependencies=dependencies) as keys:
+            data = getattr(config["favicon_svg"], "read_bytes", bytes)()
+        yield from files.record_outputs(files_to_record=(files.File(path=path, data=data),), keys={path: keys}, dependencies=dependencies)
 
     if config.get("preview_png"):
         images_data = (
@@ -243,12 +772,23 @@ def generate_images(*, config: generator_config.Config) -> List[files.File]:
             # JSON-LD.
             ImageData(path=config["output_folder_path"] / "static" / "preview-600x600.png", width=600, height=600),
         )
-        images.extend(
-            files.File(
-                path=image.path,
-                data=get_image_bytes(image=get_resized_image(image=config["favicon_png"], width=image.width, height=image.height)),
-            )
-            for image in images_data
+        with generator_dependencies.record(dependencies=dependencies) as keys:
+            image = config["favicon_png"]
+            downscale_ratio = config.get("downscale_ratio")
+            png_profile = config["png_profile"]
+            reduce_colors = config["reduce_colors"]
+        yield from files.record_outputs(
+            files_to_record=generate_images_in_parallel(
+                image=image,
+                images_data=images_data,
+                jobs=jobs,
+                downscale_ratio=downscale_ratio,
+                png_profile=png_profile,
+                reduce_colors=reduce_colors,
+                cache=cache,
+                skip_path=skip_path,
+                report=report,
+            ),
+            keys={image_data.path: keys for image_data in images_data},
+            dependencies=dependencies,
         )
-
-    return images
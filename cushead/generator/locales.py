@@ -0,0 +1,123 @@
+"""
+Handle the localized index pages.
+
+The main index page is the page of the language of the config, and each locale has its own index page in a folder
+named after its code. All of them share the images and the static files, and link to each other.
+"""
+from __future__ import annotations
+
+import pathlib
+from typing import Callable
+from typing import Dict
+from typing import Iterator
+from typing import List
+from typing import NamedTuple
+from typing import Optional
+
+from cushead.generator import config as generator_config
+from cushead.generator import dependencies as generator_dependencies
+from cushead.generator import files
+from cushead.generator import pages as generator_pages
+
+
+class Alternate(NamedTuple):
+    """
+    Store data about an alternate link of a localized page.
+    """
+
+    hreflang: str
+    url: str
+
+
+def get_locale_pages(*, config: generator_config.Config) -> List[generator_pages.Page]:
+    """
+    Get the index pages of the locales.
+
+    The title, description and subject of the config are used when a locale doesn't define them, but the territory and
+    the text direction are always the ones of the locale.
+
+    Args:
+        config: the config.
+
+    Returns:
+        The pages.
+    """
+    locale_pages = []
+    for locale in config["locales"]:
+        locale_code = generator_config.get_locale_code(language=locale["language"], territory=locale["territory"])
+        locale_pages.append(
+            generator_pages.Page(
+                path=f"{locale_code}/index.html",
+                url=f"https://{config['domain']}/{locale_code}/",
+                language=locale["language"],
+                territory=locale["territory"] or "",
+                text_dir=locale["text_dir"] or "",
+                title=locale["title"],
+                description=locale["description"],
+                subject=locale["subject"],
+            )
+        )
+    return locale_pages
+
+
+def get_alternates(*, config: generator_config.Config) -> List[Alternate]:
+    """
+    Get the alternate links shared by the main index page and the index pages of the locales.
+
+    The main index page is also the default page, for the users whose language doesn't match any page.
+
+    Args:
+        config: the config.
+
+    Returns:
+        The alternate links.
+    """
+    alternates = []
+    if config["language"]:
+        alternates.append(Alternate(hreflang=generator_config.get_locale_code(language=config["language"], territory=config["territory"]), url=f"https://{config['domain']}/"))
+    for locale in config["locales"]:
+        locale_code = generator_config.get_locale_code(language=locale["language"], territory=locale["territory"])
+        alternates.append(Alternate(hreflang=locale_code, url=f"https://{config['domain']}/{locale_code}/"))
+    alternates.append(Alternate(hreflang="x-default", url=f"https://{config['domain']}/"))
+    return alternates
+
+
+def generate_locales(
+    *,
+    config: generator_config.Config,
+    jobs: int = 1,
+    static_names: Optional[Dict[str, str]] = None,
+    cache_path: Optional[pathlib.Path] = None,
+    skip_path: Optional[Callable[[pathlib.Path], bool]] = None,
+    dependencies: Optional[generator_dependencies.Dependencies] = None,
+) -> Iterator[files.File]:
+    """
+    Get the index pages of the locales, ready to create.
+
+    The pages are rendered in parallel, one per worker at a time.
+
+    Args:
+        config: the config.
+        jobs: the number of workers.
+        static_names: the names of the static files that are already created, by their names without the content hash.
+        cache_path: the folder of the disk cache, where the compiled templates are stored.
+        skip_path: if defined, the pages whose path makes it return True are never rendered.
+        dependencies: if defined, the config keys read to render each page are recorded on it.
+
+    Yields:
+        The pages.
+    """
+    with generator_dependencies.record(dependencies=dependencies) as keys:
+        locale_pages = [page for page in get_locale_pages(config=config) if not (skip_path and skip_path(config["output_folder_path"] / page.path))]
+        alternates = get_alternates(config=config)
+    yield from generator_pages.render_pages(
+        config=config,
+        pages=locale_pages,
+        jobs=min(jobs, len(locale_pages)) or 1,
+        static_names=static_names,
+        cache_path=cache_path,
+        context={"alternates": alternates},
+        pages_per_batch=1,
+        dependencies=dependencies,
+        keys=keys,
+    )
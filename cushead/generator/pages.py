@@ -0,0 +1,418 @@
+"""
+Handle the pages generated from a file of records.
+
+The records are read from a JSONL file and rendered one batch at a time, so the memory used doesn't depend on the
+number of records.
+"""
+from __future__ import annotations
+
+import collections
+import itertools
+import json
+import pathlib
+from concurrent import futures
+from typing import Any
+from typing import Callable
+from typing import Deque
+from typing import Dict
+from typing import FrozenSet
+from typing import Iterable
+from typing import Iterator
+from typing import List
+from typing import Mapping
+from typing import NamedTuple
+from typing import Optional
+from typing import Tuple
+
+from cushead import exceptions
+from cushead.generator import config as generator_config
+from cushead.generator import dependencies as generator_dependencies
+from cushead.generator import files
+from cushead.generator.templates import minifiers
+from cushead.generator.templates import templates
+
+# The number of pages sent to a worker at once, so the cost of passing them between processes is shared.
+PAGES_PER_BATCH = 64
+# The config keys that a record can override.
+PAGE_CONFIG_KEYS = ("language", "territory", "text_dir", "title", "description", "subject")
+# The group of the dependencies where the pages of the pages file are recorded.
+PAGES_GROUP = "pages"
+
+
+class Page(NamedTuple):
+    """
+    Store data about a page to create.
+    """
+
+    path: str
+    language: Optional[str] = None
+    territory: Optional[str] = None
+    text_dir: Optional[str] = None
+    title: Optional[str] = None
+    description: Optional[str] = None
+    subject: Optional[str] = None
+    url: Optional[str] = None
+
+
+class RenderedPage(NamedTuple):
+    """
+    Store a rendered page, with the config keys read to render it.
+    """
+
+    file: files.File
+    keys: FrozenSet[str] = frozenset()
+
+
+def parse_page(*, line: str) -> Page:
+    """
+    Parse a line of a pages file.
+
+    Args:
+        line: the line, that is an object in JSON format with the path and url keys, and the config keys that a page
+            can override.
+
+    Returns:
+        The page.
+
+    Raises:
+        ValueError: when the line isn't valid.
+    """
+    data = json.loads(line)
+    if not isinstance(data, dict) or set(data) - set(Page._fields):
+        raise ValueError("Unknown keys.")
+    page = Page(**data)
+
+    for key, value in page._asdict().items():
+        if value is not None and not isinstance(value, str):
+            raise ValueError(f"Invalid {key}.")
+    path = pathlib.PurePosixPath(page.path)
+    if path.is_absolute() or ".." in path.parts or path.suffix != ".html" or path == pathlib.PurePosixPath("index.html"):
+        raise ValueError("Invalid path, it must be a relative .html path inside the output folder, different than index.html.")
+    return page
+
+
+def read_pages(*, path: pathlib.Path) -> Iterator[Page]:
+    """
+    Read the pages of a file, one per line.
+
+    The empty lines are skipped.
+
+    Args:
+        path: the file path.
+
+    Yields:
+        The pages.
+
+    Raises:
+        WrongFileFormat: when a line isn't valid.
+    """
+    with open(path, encoding="utf-8") as file:
+        for line_number, line in enumerate(file, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield parse_page(line=line)
+            except (ValueError, TypeError) as exception:
+                raise exceptions.WrongFileFormat(
+                    "\n".join(
+                        (
+                            f"Invalid page in the line {line_number} of the pages file ({path})",
+                            f"ABSOLUTE PATH: {pathlib.Path(path).absolute()}",
+                            f"Exception: {exception}",
+                        ),
+                    ),
+                )
+
+
+def get_page_url(*, config: Dict[str, Any], page: Page) -> Optional[str]:
+    """
+    Get the canonical URL of a page.
+
+    Args:
+        config: the config.
+        page: the page.
+
+    Returns:
+        The url of the page if it's defined, else the URL of its path in the domain, if the domain is defined.
+    """
+    if page.url or not config.get("domain"):
+        return page.url
+    path = page.path[: -len("index.html")] if page.path.endswith("/index.html") else page.path
+    return f"https://{config['domain']}/{path}"
+
+
+class PageRenderer:
+    """
+    Render the pages with the index template.
+
+    The static files are shared with the index page, so the pages reference the same names and Subresource
+    Integrities.
+    """
+
+    def __init__(
+        self,
+        *,
+        config: Dict[str, Any],
+        static_names: Dict[str, str],
+        cache_path: Optional[pathlib.Path] = None,
+        context: Optional[Mapping[str, Any]] = None,
+        track: bool = False,
+    ) -> None:
+        """
+        Initialize a page renderer.
+
+        Args:
+            config: the config used in the templates context.
+            static_names: the names of the static files that are already created, by their names without the content hash.
+            cache_path: the folder of the disk cache, where the compiled templates are stored.
+            context: other variables used in the templates, shared by all the pages.
+            track: if True, the config keys read to render each page are recorded.
+        """
+        self.config = config
+        self.dependencies = generator_dependencies.Dependencies() if track else None
+        template_config = generator_dependencies.get_template_config(config=config, dependencies=self.dependencies)
+        with generator_dependencies.record(dependencies=self.dependencies) as minify_keys:
+            minify = template_config.get("minify", False)
+        with generator_dependencies.record(dependencies=self.dependencies) as fingerprint_keys:
+            fingerprint = template_config.get("fingerprint", False)
+        self.rendered_templates = templates.RenderedTemplates(
+            template_loader=templates.get_template_loader(cache_path=cache_path),
+            context={**(context or {}), "config": config},
+            minify=minify,
+            fingerprint=fingerprint,
+            static_names=static_names,
+            dependencies=self.dependencies,
+            minify_keys=minify_keys,
+            fingerprint_keys=fingerprint_keys,
+        )
+
+    def render_page(self, *, page: Page) -> RenderedPage:
+        """
+        Render a page.
+
+        Args:
+            page: the page.
+
+        Returns:
+            The page ready to create, with the config keys read to render it if they are recorded.
+        """
+        page_config = {**self.config, **{key: getattr(page, key) for key in PAGE_CONFIG_KEYS if getattr(page, key) is not None}}
+        context = {
+            **self.rendered_templates.context,
+            "config": generator_dependencies.get_template_config(config=page_config, dependencies=self.dependencies),
+            "page": page._replace(url=get_page_url(config=self.config, page=page)),
+        }
+        with generator_dependencies.record(dependencies=self.dependencies) as keys:
+            data = self.rendered_templates.template_loader.render_template(path="index.jinja2", context=context)
+        if self.rendered_templates.minify:
+            data = minifiers.minify(data=data, suffix=".html")
+        return RenderedPage(file=files.File(path=self.config["output_folder_path"] / page.path, data=data), keys=frozenset(keys | self.rendered_templates.minify_keys))
+
+
+# The renderer of each worker process.
+worker_renderer: Optional[PageRenderer] = None
+
+
+def initialize_worker(config: Dict[str, Any], static_names: Dict[str, str], cache_path: Optional[pathlib.Path], context: Mapping[str, Any], track: bool) -> None:
+    """
+    Initialize the renderer of a worker process.
+
+    Args:
+        config: the config used in the templates context.
+        static_names: the names of the static files that are already created, by their names without the content hash.
+        cache_path: the folder of the disk cache, where the compiled templates are stored.
+        context: other variables used in the templates, shared by all the pages.
+        track: if True, the config keys read to render each page are recorded.
+    """
+    global worker_renderer
+    worker_renderer = PageRenderer(config=config, static_names=static_names, cache_path=cache_path, context=context, track=track)
+
+
+def render_batch(pages: List[Page]) -> List[RenderedPage]:
+    """
+    Render a batch of pages in a worker process.
+
+    Args:
+        pages: the pages.
+
+    Returns:
+        The pages ready to create.
+
+    Raises:
+        RuntimeError: when the worker wasn't initialized.
+    """
+    if worker_renderer is None:
+        raise RuntimeError("The worker wasn't initialized.")
+    return [worker_renderer.render_page(page=page) for page in pages]
+
+
+def get_worker_config(*, config: generator_config.Config) -> Dict[str, Any]:
+    """
+    Get a config that can be sent to the worker processes.
+
+    The images are replaced by a flag, they are only checked to know if their tags are rendered.
+
+    Args:
+        config: the config.
+
+    Returns:
+        The config.
+    """
+    return {
+        **config,
+        "favicon_ico": config["favicon_ico"] is not None,
+        "favicon_png": config["favicon_png"] is not None,
+        "preview_png": config["preview_png"] is not None,
+    }
+
+
+def render_pages(
+    *,
+    config: generator_config.Config,
+    pages: Iterable[Page],
+    jobs: int = 1,
+    static_names: Optional[Dict[str, str]] = None,
+    cache_path: Optional[pathlib.Path] = None,
+    context: Optional[Mapping[str, Any]] = None,
+    pages_per_batch: int = PAGES_PER_BATCH,
+    dependencies: Optional[generator_dependencies.Dependencies] = None,
+    keys: Iterable[str] = (),
+    group: Optional[str] = None,
+) -> Iterator[files.File]:
+    """
+    Render pages with the index template.
+
+    Jinja holds the GIL while it renders, so many jobs use a pool of processes. The pages are yielded in their order,
+    and only a few batches are rendered ahead of the one being consumed, so the memory usage doesn't grow with the
+    number of pages.
+
+    Args:
+        config: the config.
+        pages: the pages.
+        jobs: the number of workers.
+        static_names: the names of the static files that are already created, by their names without the content hash.
+        cache_path: the folder of the disk cache, where the compiled templates are stored.
+        context: other variables used in the templates, shared by all the pages.
+        pages_per_batch: the number of pages rendered by a worker at once.
+        dependencies: if defined, the config keys read to render each page are recorded on it.
+        keys: the config keys read to define the pages and the context, that all the pages depend on.
+        group: if defined, the pages are recorded in this group of the dependencies instead of one by one, and they are
+            yielded as page files.
+
+    Yields:
+        The pages ready to create.
+    """
+    worker_config = get_worker_config(config=config)
+    rendered_pages: Iterator[RenderedPage]
+    if jobs == 1:
+        page_renderer = PageRenderer(config=worker_config, static_names=dict(static_names or {}), cache_path=cache_path, context=context, track=dependencies is not None)
+        rendered_pages = (page_renderer.render_page(page=page) for page in pages)
+    else:
+        rendered_pages = render_pages_in_parallel(
+            pages=pages,
+            jobs=jobs,
+            initargs=(worker_config, dict(static_names or {}), cache_path, dict(context or {}), dependencies is not None),
+            pages_per_batch=pages_per_batch,
+        )
+    for rendered_page in rendered_pages:
+        if group is None:
+            if dependencies:
+                dependencies.add_output(path=rendered_page.file.path, keys=rendered_page.keys.union(keys))
+            yield rendered_page.file
+        else:
+            if dependencies:
+                dependencies.add_group_output(group=group, keys=rendered_page.keys.union(keys))
+            yield files.PageFile(*rendered_page.file)
+
+
+def render_pages_in_parallel(*, pages: Iterable[Page], jobs: int, initargs: Tuple[Any, ...], pages_per_batch: int) -> Iterator[RenderedPage]:
+    """
+    Render pages in a pool of processes.
+
+    Args:
+        pages: the pages.
+        jobs: the number of workers.
+        initargs: the arguments used to initialize the renderer of each worker.
+        pages_per_batch: the number of pages rendered by a worker at once.
+
+    Yields:
+        The rendered pages, in their order.
+    """
+    pages_iterator = iter(pages)
+    batches = iter(lambda: list(itertools.islice(pages_iterator, pages_per_batch)), [])
+    with futures.ProcessPoolExecutor(max_workers=jobs, initializer=initialize_worker, initargs=initargs) as executor:
+        pending_batches: Deque[futures.Future[List[RenderedPage]]] = collections.deque()
+        for batch in batches:
+            pending_batches.append(executor.submit(render_batch, batch))
+            # Keep a batch queued for each worker, so they don't wait for the consumer.
+            if len(pending_batches) > jobs * 2:
+                yield from pending_batches.popleft().result()
+        while pending_batches:
+            yield from pending_batches.popleft().result()
+
+
+def is_page_skipped(
+    *,
+    path: pathlib.Path,
+    skip_path: Optional[Callable[[pathlib.Path], bool]],
+    dependencies: Optional[generator_dependencies.Dependencies],
+) -> bool:
+    """
+    Check if a page of the pages file doesn't need to be rendered.
+
+    Args:
+        path: the page path.
+        skip_path: if defined, the pages whose path makes it return True are skipped.
+        dependencies: if defined, the pages that are unchanged since the previous build are skipped.
+
+    Returns:
+        True if the page is skipped.
+    """
+    if skip_path and skip_path(path):
+        return True
+    return bool(dependencies and dependencies.is_group_file_unchanged(group=PAGES_GROUP, path=path))
+
+
+def generate_pages(
+    *,
+    config: generator_config.Config,
+    jobs: int = 1,
+    static_names: Optional[Dict[str, str]] = None,
+    cache_path: Optional[pathlib.Path] = None,
+    skip_path: Optional[Callable[[pathlib.Path], bool]] = None,
+    dependencies: Optional[generator_dependencies.Dependencies] = None,
+) -> Iterator[files.File]:
+    """
+    Get the pages of the records of the pages file, ready to create.
+
+    The pages are yielded in the order of the file. Without a pages file, there are no pages.
+
+    Args:
+        config: the config.
+        jobs: the number of workers.
+        static_names: the names of the static files that are already created, by their names without the content hash.
+        cache_path: the folder of the disk cache, where the compiled templates are stored.
+        skip_path: if defined, the pages whose path makes it return True are never rendered.
+        dependencies: if defined, the config keys read to render the pages are recorded on it, as a single group. Every
+            page depends on the content of the pages file, and the pages that are unchanged since the previous build
+            aren't rendered.
+
+    Yields:
+        The pages.
+    """
+    with generator_dependencies.record(dependencies=dependencies) as keys:
+        pages_path = config["pages"]
+    if not pages_path:
+        return
+    pages = (page for page in read_pages(path=pages_path) if not is_page_skipped(path=config["output_folder_path"] / page.path, skip_path=skip_path, dependencies=dependencies))
+    yield from render_pages(
+        config=config,
+        pages=pages,
+        jobs=jobs,
+        static_names=static_names,
+        cache_path=cache_path,
+        dependencies=dependencies,
+        keys=keys,
+        group=PAGES_GROUP,
+    )
@@ -0,0 +1,101 @@
+"""
+Handle the list of files precached by the service worker.
+"""
+from __future__ import annotations
+
+import fnmatch
+import hashlib
+import pathlib
+from typing import Iterable
+from typing import Iterator
+from typing import List
+from typing import NamedTuple
+
+from cushead.generator import config as generator_config
+from cushead.generator import files
+
+
+class Asset(NamedTuple):
+    """
+    Store data about a generated file that can be precached.
+    """
+
+    path: pathlib.Path
+    size: int
+    revision: str
+
+
+class PrecacheEntry(NamedTuple):
+    """
+    Store data about a precached file.
+    """
+
+    url: str
+    revision: str
+
+
+def get_asset(*, file: files.File) -> Asset:
+    """
+    Get the data of a file that is needed to precache it.
+
+    Args:
+        file: the file.
+
+    Returns:
+        The asset.
+    """
+    return Asset(path=pathlib.Path(file.path), size=len(file.data), revision=hashlib.sha256(file.data).hexdigest()[0:6])
+
+
+def record_assets(*, files_to_record: Iterable[files.File], assets: List[Asset]) -> Iterator[files.File]:
+    """
+    Keep the data of the files needed to precache them, without keeping their content.
+
+    Args:
+        files_to_record: the files.
+        assets: where the data of the files is stored.
+
+    Yields:
+        The same files.
+    """
+    for file in files_to_record:
+        assets.append(get_asset(file=file))
+        yield file
+
+
+def get_precache_entries(*, config: generator_config.Config, assets: Iterable[Asset]) -> List[PrecacheEntry]:
+    """
+    Get the files precached by the service worker.
+
+    The files are taken in the order of the precache_include patterns, skipping the ones that match a precache_exclude
+    pattern. A file that doesn't fit in the remaining precache_budget is skipped, but the smaller ones after it can
+    still be precached. The index page is always precached by the service worker, so it isn't part of the budget.
+
+    Args:
+        config: the config.
+        assets: the generated files that can be precached.
+
+    Returns:
+        The precached files.
+    """
+    output_folder = config["output_folder_path"]
+    relative_paths = {asset.path.relative_to(output_folder).as_posix(): asset for asset in assets}
+    budget = config["precache_budget"]
+    entries: List[PrecacheEntry] = []
+    precached_paths = set()
+    for pattern in config["precache_include"]:
+        for relative_path, asset in relative_paths.items():
+            if relative_path in precached_paths or not fnmatch.fnmatchcase(relative_path, pattern):
+                continue
+            if any(fnmatch.fnmatchcase(relative_path, exclude_pattern) for exclude_pattern in config["precache_exclude"]):
+                continue
+            if asset.size > budget:
+                continue
+            budget -= asset.size
+            precached_paths.add(relative_path)
+            if asset.path.parent == output_folder / "static":
+                url = f"{config['static_url']}/{asset.path.name}"
+            else:
+                url = f"/{relative_path}"
+            entries.append(PrecacheEntry(url=url, revision=asset.revision))
+    return entries
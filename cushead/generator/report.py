@@ -0,0 +1,113 @@
+"""
+Handle the statistics of a build.
+"""
+import pathlib
+import threading
+from typing import Any
+from typing import Dict
+from typing import NamedTuple
+
+
+class EncodeStats(NamedTuple):
+    """
+    Store the statistics of the images encoded with a PNG profile.
+    """
+
+    images: int
+    size: int
+    seconds: float
+
+
+class MinifyStats(NamedTuple):
+    """
+    Store the sizes of a minified file.
+    """
+
+    original_size: int
+    size: int
+
+
+class BuildReport:
+    """
+    Collect statistics about a build.
+
+    It can be updated from many workers at the same time, and sent to other processes.
+    """
+
+    def __init__(self) -> None:
+        """
+        Initialize a build report.
+        """
+        self.encoded_images: Dict[str, EncodeStats] = {}
+        self.cached_images = 0
+        self.minified_files: Dict[pathlib.Path, MinifyStats] = {}
+        self.lock = threading.Lock()
+
+    def add_encoded_image(self, *, png_profile: str, size: int, seconds: float) -> None:
+        """
+        Count an encoded image.
+
+        Args:
+            png_profile: the PNG profile used to encode the image.
+            size: the size of the encoded image, in bytes.
+            seconds: the time spent encoding the image.
+        """
+        with self.lock:
+            stats = self.encoded_images.get(png_profile, EncodeStats(images=0, size=0, seconds=0.0))
+            self.encoded_images[png_profile] = EncodeStats(images=stats.images + 1, size=stats.size + size, seconds=stats.seconds + seconds)
+
+    def add_cached_image(self) -> None:
+        """
+        Count an image read from the cache.
+        """
+        with self.lock:
+            self.cached_images += 1
+
+    def add_minified_file(self, *, path: pathlib.Path, original_size: int, size: int) -> None:
+        """
+        Record the sizes of a minified file.
+
+        Args:
+            path: the file path.
+            original_size: the size of the file before the minification, in bytes.
+            size: the size of the minified file, in bytes.
+        """
+        with self.lock:
+            self.minified_files[path] = MinifyStats(original_size=original_size, size=size)
+
+    def merge(self, *, build_report: "BuildReport") -> None:
+        """
+        Add the statistics of another build.
+
+        Args:
+            build_report: the report of the other build.
+        """
+        with self.lock:
+            for png_profile, other_stats in build_report.encoded_images.items():
+                stats = self.encoded_images.get(png_profile, EncodeStats(images=0, size=0, seconds=0.0))
+                self.encoded_images[png_profile] = EncodeStats(
+                    images=stats.images + other_stats.images,
+                    size=stats.size + other_stats.size,
+                    seconds=stats.seconds + other_stats.seconds,
+                )
+            self.cached_images += build_report.cached_images
+            self.minified_files.update(build_report.minified_files)
+
+    def __getstate__(self) -> Dict[str, Any]:
+        """
+        Get the statistics to send the report to another process, without the lock.
+
+        Returns:
+            The statistics.
+        """
+        return {key: value for key, value in self.__dict__.items() if key != "lock"}
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        """
+        Restore a report sent from another process.
+
+        Args:
+            state: the statistics.
+        """
+        self.__dict__.update(state)
+        self.lock = threading.Lock()
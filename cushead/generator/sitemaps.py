@@ -0,0 +1,210 @@
+"""
+Handle the sitemaps of large URL sets.
+
+The URLs are read from a file and written to gzipped sitemaps one at a time, so the memory used doesn't depend on the
+number of URLs. The sitemaps left by a previous build with more URLs aren't removed, and the sitemap index doesn't
+reference them.
+"""
+from __future__ import annotations
+
+import itertools
+import json
+import operator
+import pathlib
+import re
+import zlib
+from typing import Callable
+from typing import Iterable
+from typing import Iterator
+from typing import List
+from typing import NamedTuple
+from typing import Optional
+from typing import Tuple
+from xml.sax import saxutils
+
+from cushead import exceptions
+from cushead.generator import config as generator_config
+from cushead.generator import files
+
+# The limits of the sitemaps protocol, for each sitemap.
+MAX_URLS = 50000
+MAX_SIZE = 50 * 1024 ** 2
+MAX_URL_LENGTH = 2048
+CHANGE_FREQUENCIES = ("always", "hourly", "daily", "weekly", "monthly", "yearly", "never")
+SITEMAP_HEADER = b'<?xml version="1.0" encoding="utf-8"?>\n<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n'
+SITEMAP_FOOTER = b"</urlset>\n"
+
+
+class SitemapUrl(NamedTuple):
+    """
+    Store data about a URL of a sitemap.
+    """
+
+    loc: str
+    lastmod: Optional[str] = None
+    changefreq: Optional[str] = None
+    priority: Optional[float] = None
+
+
+def parse_url(*, line: str) -> SitemapUrl:
+    """
+    Parse a line of a URLs file.
+
+    Args:
+        line: the line, that is a URL or an object in JSON format with the loc, lastmod, changefreq and priority keys.
+
+    Returns:
+        The URL.
+
+    Raises:
+        ValueError: when the line isn't valid.
+    """
+    if not line.startswith("{"):
+        url = SitemapUrl(loc=line)
+    else:
+        data = json.loads(line)
+        if not isinstance(data, dict) or set(data) - set(SitemapUrl._fields):
+            raise ValueError("Unknown keys.")
+        url = SitemapUrl(**data)
+
+    if not isinstance(url.loc, str) or not re.match("^https?://", url.loc) or len(url.loc) >= MAX_URL_LENGTH:
+        raise ValueError("Invalid loc.")
+    if url.lastmod is not None and not isinstance(url.lastmod, str):
+        raise ValueError("Invalid lastmod.")
+    if url.changefreq is not None and url.changefreq not in CHANGE_FREQUENCIES:
+        raise ValueError("Invalid changefreq.")
+    if url.priority is not None and (isinstance(url.priority, bool) or not isinstance(url.priority, (int, float)) or not 0 <= url.priority <= 1):
+        raise ValueError("Invalid priority.")
+    return url
+
+
+def read_urls(*, path: pathlib.Path) -> Iterator[SitemapUrl]:
+    """
+    Read the URLs of a file, one per line.
+
+    The empty lines are skipped.
+
+    Args:
+        path: the file path.
+
+    Yields:
+        The URLs.
+
+    Raises:
+        WrongFileFormat: when a line isn't valid.
+    """
+    with open(path, encoding="utf-8") as file:
+        for line_number, line in enumerate(file, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield parse_url(line=line)
+            except (ValueError, TypeError) as exception:
+                raise exceptions.WrongFileFormat(
+                    "\n".join(
+                        (
+                            f"Invalid URL in the line {line_number} of the sitemap_urls file ({path})",
+                            f"ABSOLUTE PATH: {pathlib.Path(path).absolute()}",
+                            f"Exception: {exception}",
+                        ),
+                    ),
+                )
+
+
+def get_url_element(*, url: SitemapUrl) -> bytes:
+    """
+    Get the XML element of a URL.
+
+    Args:
+        url: the URL.
+
+    Returns:
+        The element, in UTF-8 format.
+    """
+    element = ["  <url>\n", f"    <loc>{saxutils.escape(url.loc)}</loc>\n"]
+    if url.lastmod is not None:
+        element.append(f"    <lastmod>{saxutils.escape(url.lastmod)}</lastmod>\n")
+    if url.changefreq is not None:
+        element.append(f"    <changefreq>{url.changefreq}</changefreq>\n")
+    if url.priority is not None:
+        element.append(f"    <priority>{url.priority:g}</priority>\n")
+    element.append("  </url>\n")
+    return "".join(element).encode()
+
+
+def split_elements(*, urls: Iterable[SitemapUrl]) -> Iterator[Tuple[int, bytes]]:
+    """
+    Get the XML elements of URLs, split in sitemaps with the maximum number of URLs and size.
+
+    Args:
+        urls: the URLs.
+
+    Yields:
+        The number of the sitemap of each element, starting at 1, and the element.
+    """
+    index = 0
+    size = 0
+    urls_count = 0
+    for url in urls:
+        element = get_url_element(url=url)
+        if index == 0 or urls_count == MAX_URLS or size + len(element) + len(SITEMAP_FOOTER) > MAX_SIZE:
+            index += 1
+            size = len(SITEMAP_HEADER)
+            urls_count = 0
+        size += len(element)
+        urls_count += 1
+        yield index, element
+
+
+def compress_sitemap(*, elements: Iterable[bytes]) -> bytes:
+    """
+    Get a sitemap of some XML elements.
+
+    The sitemap is compressed while it's written, so only the compressed data is kept in memory.
+
+    Args:
+        elements: the elements of the URLs.
+
+    Returns:
+        The sitemap, in gzip format.
+    """
+    compressor = zlib.compressobj(level=9, wbits=16 + zlib.MAX_WBITS)
+    compressed_data = bytearray(compressor.compress(SITEMAP_HEADER))
+    for element in elements:
+        compressed_data += compressor.compress(element)
+    compressed_data += compressor.compress(SITEMAP_FOOTER) + compressor.flush()
+    return bytes(compressed_data)
+
+
+def generate_sitemaps(
+    *,
+    config: generator_config.Config,
+    sitemap_names: List[str],
+    skip_path: Optional[Callable[[pathlib.Path], bool]] = None,
+) -> Iterator[files.File]:
+    """
+    Get the sitemaps of the URLs of the sitemap_urls file, ready to create.
+
+    Without a sitemap_urls file, there are no sitemaps.
+
+    The sitemaps are numbered from 1. When the URLs need fewer sitemaps than in a previous build, the sitemaps with
+    higher numbers are left in the output folder. The sitemap index doesn't reference them, so they can be removed.
+
+    Args:
+        config: the config.
+        sitemap_names: where the names of the sitemaps are stored, to reference them from the sitemap index.
+        skip_path: if defined, the sitemaps whose path makes it return True aren't created.
+
+    Yields:
+        The sitemaps.
+    """
+    if not config["sitemap_urls"]:
+        return
+    urls = read_urls(path=config["sitemap_urls"])
+    for index, elements in itertools.groupby(split_elements(urls=urls), key=operator.itemgetter(0)):
+        path = config["output_folder_path"] / f"sitemap-{index}.xml.gz"
+        sitemap_names.append(path.name)
+        # The elements of a skipped sitemap are read to find where the next one starts, but they aren't compressed.
+        if not (skip_path and skip_path(path)):
+            yield files.File(path=path, data=compress_sitemap(elements=(element for _, element in elements)))
@@ -46,3 +46,53 @@ class OneLineExtension(ext.Extension):
             The parsed template section.
         """
         return "".join(line.strip() for line in caller().split("\n"))
+
+
+class FragmentExtension(ext.Extension):
+    """
+    Render the content inside the extension statement once, and reuse it on the next renders.
+
+    The rendered fragments are stored by name on the rendered templates of the context, so the pages rendered with the
+    same rendered templates share them. The content must only depend on values that are the same for all these pages.
+    """
+
+    tags = {"fragment"}  # Names that trigger the extension.
+
+    def parse(self, parser: jinja2_parser.Parser) -> nodes.CallBlock:
+        """
+        Get a node that implements the extension logic and can be used by the AST.
+
+        Args:
+            parser: the jinja parser.
+
+        Returns:
+            The node.
+        """
+        next(parser.stream)
+        lineno = parser.stream.current.lineno
+
+        name = parser.parse_expression()
+        body = parser.parse_statements(tuple(f"name:end{tagname}" for tagname in self.tags), True)
+
+        method = self.call_method("render_fragment", [nodes.ContextReference(), name])
+        call_block = nodes.CallBlock(method, [], [], body)
+        call_block.set_lineno(lineno)
+        return call_block
+
+    @staticmethod
+    def render_fragment(context: runtime.Context, name: str, caller: runtime.Macro) -> str:
+        """
+        Execute the extension logic on a template section.
+
+        Args:
+            context: the context of the template that has the section.
+            name: the name of the fragment.
+            caller: this is a Macro class instance that can be called to get the template content associated with this extension.
+
+        Returns:
+            The rendered fragment.
+        """
+        rendered_templates = context.get("rendered_templates")
+        if rendered_templates is None:
+            return caller()
+        return rendered_templates.get_fragment(name=name, caller=caller)
@@ -0,0 +1,303 @@
+"""
+Handle the minification of the rendered templates.
+
+The minifiers only remove what is safe to remove for each file type. When a file can't be minified safely, it's
+returned unchanged.
+"""
+import json
+import re
+from typing import Callable
+from typing import Dict
+from typing import List
+
+# Characters that can be part of an identifier, a number or a keyword.
+WORD_PATTERN = re.compile(r"[\w$\\\u0080-\U0010ffff]")
+# A JavaScript word: an identifier, a number or a keyword.
+JS_WORD_PATTERN = re.compile(r"[\w$]+")
+# Keywords after which a slash starts a regular expression instead of a division.
+JS_REGEX_KEYWORDS = {"return", "typeof", "case", "do", "else", "in", "instanceof", "new", "delete", "void", "throw", "yield", "await"}
+# Whitespace sequences between two of these characters can't be removed in JavaScript.
+JS_JOINING_PAIRS = {"++", "--", "//", "/*", "+-", "-+"}
+HTML_TOKEN_PATTERN = re.compile(
+    r"""<!--.*?-->"""
+    r"""|<(?P<raw>script|style|pre|textarea)\b(?P<attributes>[^>"']*(?:(?:"[^"]*"|'[^']*')[^>"']*)*)>(?P<content>.*?)</(?P=raw)\s*>"""
+    r"""|<[^>"']*(?:(?:"[^"]*"|'[^']*')[^>"']*)*>"""
+    r"""|[^<]+"""
+    r"""|<""",
+    re.DOTALL | re.IGNORECASE,
+)
+HTML_TYPE_PATTERN = re.compile(r"""\btype\s*=\s*["']?([^"'\s>]+)""", re.IGNORECASE)
+
+
+def minify_json(text: str) -> str:
+    """
+    Minify a JSON document.
+
+    Args:
+        text: the document.
+
+    Returns:
+        The minified document.
+    """
+    try:
+        return json.dumps(json.loads(text), ensure_ascii=False, separators=(",", ":"))
+    except ValueError:
+        return text
+
+
+def minify_css(text: str) -> str:
+    """
+    Minify a CSS stylesheet.
+
+    The comments are removed, and the whitespace is collapsed and removed around the characters where it's never
+    meaningful.
+
+    Args:
+        text: the stylesheet.
+
+    Returns:
+        The minified stylesheet.
+    """
+    tokens: List[str] = []
+    pending_whitespace = False
+    index = 0
+    while index < len(text):
+        char = text[index]
+        if text.startswith("/*", index):
+            end = text.find("*/", index + 2)
+            index = len(text) if end == -1 else end + 2
+            pending_whitespace = True
+            continue
+        if char.isspace():
+            index += 1
+            pending_whitespace = True
+            continue
+
+        if char in "\"'":
+            token = text[index : get_string_end(text=text, start=index)]
+        else:
+            token = char
+        if pending_whitespace and tokens and tokens[-1][-1] not in "{};,>:" and token not in "{};,>":
+            tokens.append(" ")
+        if token == "}" and tokens and tokens[-1] == ";":
+            tokens.pop()
+        pending_whitespace = False
+        tokens.append(token)
+        index += len(token)
+
+    return "".join(tokens)
+
+
+def get_string_end(*, text: str, start: int) -> int:
+    """
+    Find the end of a quoted string.
+
+    Args:
+        text: the text that has the string.
+        start: the position of the opening quote.
+
+    Returns:
+        The position after the closing quote, or the end of the line if the string isn't closed.
+    """
+    quote = text[start]
+    index = start + 1
+    while index < len(text):
+        char = text[index]
+        if char == "\\":
+            index += 2
+            continue
+        if char == quote:
+            return index + 1
+        if char == "\n" and quote != "`":
+            return index
+        index += 1
+    return len(text)
+
+
+def get_regex_end(*, text: str, start: int) -> int:
+    """
+    Find the end of a JavaScript regular expression literal.
+
+    Args:
+        text: the text that has the regular expression.
+        start: the position of the opening slash.
+
+    Returns:
+        The position after the flags, or -1 if it isn't a regular expression.
+    """
+    index = start + 1
+    in_class = False
+    while index < len(text):
+        char = text[index]
+        if char == "\\":
+            index += 2
+            continue
+        if char == "\n":
+            return -1
+        if char == "[":
+            in_class = True
+        elif char == "]":
+            in_class = False
+        elif char == "/" and not in_class:
+            index += 1
+            while index < len(text) and WORD_PATTERN.match(text[index]):
+                index += 1
+            return index
+        index += 1
+    return -1
+
+
+def join_js_whitespace(*, previous: str, next_: str, has_newline: bool) -> str:
+    """
+    Get the shortest whitespace that keeps the meaning of the code between two characters.
+
+    The newlines are only removed where the automatic semicolon insertion can't be affected.
+
+    Args:
+        previous: the character before the whitespace.
+        next_: the character after the whitespace.
+        has_newline: if the whitespace has a newline.
+
+    Returns:
+        The whitespace.
+    """
+    if has_newline:
+        return "" if previous in "{([,;" or next_ in "})],;." else "\n"
+    if previous + next_ in JS_JOINING_PAIRS or (previous.isdigit() and next_ == "."):
+        return " "
+    return " " if WORD_PATTERN.match(previous) and WORD_PATTERN.match(next_) else ""
+
+
+def minify_js(text: str) -> str:
+    """
+    Minify a JavaScript script.
+
+    The comments and the indentation are removed, and the whitespace is removed where it isn't needed. The strings and
+    regular expressions are kept as they are.
+
+    Args:
+        text: the script.
+
+    Returns:
+        The minified script.
+    """
+    tokens: List[str] = []
+    pending_whitespace = ""
+    last_word = ""
+    index = 0
+
+    def add_token(token: str) -> None:
+        nonlocal pending_whitespace
+        if pending_whitespace and tokens:
+            tokens.append(join_js_whitespace(previous=tokens[-1][-1], next_=token[0], has_newline="\n" in pending_whitespace))
+        pending_whitespace = ""
+        tokens.append(token)
+
+    while index < len(text):
+        char = text[index]
+        if char in "\"'`":
+            end = get_string_end(text=text, start=index)
+            if char == "`" and "${" in text[index:end]:
+                # The expressions inside template literals aren't parsed.
+                return text
+            add_token(text[index:end])
+            index = end
+        elif text.startswith("//", index):
+            end = text.find("\n", index)
+            index = len(text) if end == -1 else end
+        elif text.startswith("/*", index):
+            end = text.find("*/", index + 2)
+            comment_end = len(text) if end == -1 else end + 2
+            pending_whitespace += "\n" if "\n" in text[index:comment_end] else " "
+            index = comment_end
+        elif char.isspace():
+            pending_whitespace += char
+            index += 1
+        else:
+            previous = tokens[-1][-1] if tokens else ""
+            if char == "/" and (not previous or previous in "(,=:[!&|?{};+-*%<>~^" or last_word in JS_REGEX_KEYWORDS):
+                end = get_regex_end(text=text, start=index)
+                if end != -1:
+                    add_token(text[index:end])
+                    last_word = ""
+                    index = end
+                    continue
+            word = JS_WORD_PATTERN.match(text, index)
+            token = word.group() if word else char
+            add_token(token)
+            last_word = token if word else ""
+            index += len(token)
+
+    return "".join(tokens)
+
+
+def minify_html(text: str) -> str:
+    """
+    Minify an HTML document.
+
+    The comments are removed, except the conditional comments. The whitespace between the tags outside the body is
+    removed, and collapsed to a space inside it. The scripts, JSON scripts and styles are minified with their own
+    minifiers, and the content of pre and textarea elements is kept as it is.
+
+    Args:
+        text: the document.
+
+    Returns:
+        The minified document.
+    """
+    tokens: List[str] = []
+    in_body = False
+    for match in HTML_TOKEN_PATTERN.finditer(text):
+        token = match.group()
+        if token.startswith("<!--"):
+            if token.startswith("<!--[if"):
+                tokens.append(token)
+        elif match.group("raw"):
+            tag = match.group("raw").lower()
+            content = match.group("content")
+            if tag == "script":
+                script_type = HTML_TYPE_PATTERN.search(match.group("attributes"))
+                script_type_name = script_type.group(1).lower() if script_type else "text/javascript"
+                if script_type_name in ("text/javascript", "application/javascript", "module"):
+                    content = minify_js(content)
+                elif script_type_name in ("application/json", "application/ld+json"):
+                    content = minify_json(content)
+            elif tag == "style":
+                content = minify_css(content)
+            tokens.append(token[: match.start("content") - match.start()] + content + token[match.end("content") - match.start() :])
+        elif token.startswith("<"):
+            tag_name = re.match(r"</?([a-zA-Z0-9]*)", token)
+            if tag_name and tag_name.group(1).lower() == "body":
+                in_body = not token.startswith("</")
+            tokens.append(token)
+        elif token.isspace():
+            if in_body:
+                tokens.append(" ")
+        else:
+            tokens.append(re.sub(r"\s+", " ", token))
+    return "".join(tokens)
+
+
+MINIFIERS: Dict[str, Callable[[str], str]] = {
+    ".html": minify_html,
+    ".css": minify_css,
+    ".js": minify_js,
+    ".json": minify_json,
+}
+
+
+def minify(*, data: bytes, suffix: str) -> bytes:
+    """
+    Minify a file based on its type.
+
+    Args:
+        data: the file content, in UTF-8 format.
+        suffix: the file suffix, like ".html".
+
+    Returns:
+        The minified content, or the same content if the file type isn't supported.
+    """
+    minifier = MINIFIERS.get(suffix)
+    if minifier is None:
+        return data
+    return minifier(data.decode()).encode()
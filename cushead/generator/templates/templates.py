@@ -3,19 +3,113 @@ Handle templates generation.
 """
 from __future__ import annotations
 
+import functools
 import hashlib
+import io
+import itertools
 import pathlib
 import re
 from typing import Any
+from typing import Callable
+from typing import Dict
+from typing import FrozenSet
+from typing import Iterable
+from typing import Iterator
 from typing import List
-from typing import Union
+from typing import Mapping
+from typing import NamedTuple
+from typing import Optional
 
 import jinja2
+from jinja2 import bccache
+from jinja2 import meta
+from jinja2 import runtime
 
+from cushead.generator import cache as generator_cache
 from cushead.generator import config as generator_config
+from cushead.generator import dependencies as generator_dependencies
 from cushead.generator import files
+from cushead.generator import locales
+from cushead.generator import precache
+from cushead.generator import report as generator_report
+from cushead.generator import sitemaps
+from cushead.generator.templates import minifiers
 from cushead.generator.templates.jinja import filters
 
+# Remove the lines that only have spaces, and the last empty line.
+CLEANUP_PATTERN = re.compile("((\n +)+\n)|(\n\n$)")
+# The same, without the part that only applies at the end of the text.
+BLANK_LINES_PATTERN = re.compile("(\n +)+\n")
+# The file type of the templates that can be minified.
+TEMPLATE_TYPES = {
+    "index.jinja2": ".html",
+    "manifest.jinja2": ".json",
+    "sw.jinja2": ".js",
+    "early_script.jinja2": ".js",
+    "late_script.jinja2": ".js",
+    "styles.jinja2": ".css",
+}
+# The templates created in the static folder, by file name.
+STATIC_TEMPLATES = {
+    "styles.css": "styles.jinja2",
+    "early_script.js": "early_script.jinja2",
+    "late_script.js": "late_script.jinja2",
+    "browserconfig.xml": "browserconfig.jinja2",
+    "opensearch.xml": "opensearch.jinja2",
+}
+
+
+class Fragment(str):
+    """
+    A rendered template fragment that is already cleaned, and starts and ends with a character that isn't a space or a
+    newline.
+    """
+
+
+def clean_chunks(*, chunks: Iterable[str], buffer_size: int = io.DEFAULT_BUFFER_SIZE) -> Iterator[str]:
+    """
+    Clean a text that is produced in chunks.
+
+    It gives the same result as applying CLEANUP_PATTERN to the whole text, but only keeps a small part of it in memory.
+    The matches only have spaces and newlines, so everything before the last character that isn't one of them can be
+    cleaned without knowing the rest of the text. For the same reason, the fragments are yielded as they are.
+
+    Args:
+        chunks: the text chunks.
+        buffer_size: the minimum number of characters cleaned at once.
+
+    Yields:
+        The cleaned text chunks.
+    """
+    pending = ""
+    chunks_iterator = iter(chunks)
+    # Join the chunks in batches, Jinja produces a lot of small ones.
+    for batch in iter(lambda: list(itertools.islice(chunks_iterator, 256)), []):
+        for is_fragment, group in itertools.groupby(batch, key=lambda chunk: isinstance(chunk, Fragment)):
+            if is_fragment:
+                if pending:
+                    yield BLANK_LINES_PATTERN.sub("\n", pending)
+                    pending = ""
+                yield from group
+                continue
+            pending += "".join(group)
+            if len(pending) < buffer_size:
+                continue
+            end = len(pending.rstrip(" \n"))
+            if end:
+                yield BLANK_LINES_PATTERN.sub("\n", pending[:end])
+                pending = pending[end:]
+    yield CLEANUP_PATTERN.sub("\n", pending)
+
+
+class TemplateData(NamedTuple):
+    """
+    Store data about a template to create.
+    """
+
+    path: pathlib.Path
+    template: str
+
 
 class TemplateLoader:
     """
@@ -26,27 +120,289 @@ class TemplateLoader:
         """
         Initialize a jinja template loader.
         """
-        template_loader = jinja2.FileSystemLoader(searchpath=str(pathlib.Path(__file__).parent / "jinja" / "templates"))
+        self.source_loader = jinja2.FileSystemLoader(searchpath=str(pathlib.Path(__file__).parent / "jinja" / "templates"))
         self.template_parser = jinja2.Environment(
-            loader=template_loader,
+            loader=self.source_loader,
             lstrip_blocks=True,
             autoescape=True,
             **kwargs,
         )
+        self.variables: Dict[str, FrozenSet[str]] = {}
+
+    def get_variables(self, *, path: str) -> FrozenSet[str]:
+        """
+        Get the names of the context variables used by a template.
+
+        Args:
+            path: the template path, relative to the templates_folder instance attribute.
+
+        Returns:
+            The names.
+        """
+        if path not in self.variables:
+            source, _, _ = self.source_loader.get_source(self.template_parser, path)
+            self.variables[path] = frozenset(meta.find_undeclared_variables(self.template_parser.parse(source)))
+        return self.variables[path]
+
+    def generate_template(self, *, path: str, context: Optional[Mapping[str, Any]] = None) -> Iterator[bytes]:
+        """
+        Render a template in chunks.
+
+        Args:
+            path: the template path, relative to the templates_folder instance attribute.
+            context: the variables used in the template.
+
+        Yields:
+            The template chunks, rendered in UTF-8 format.
+        """
+        chunks = self.template_parser.get_template(path).generate(context or {})
+        for cleaned_chunk in clean_chunks(chunks=chunks):
+            yield cleaned_chunk.encode()
 
-    def render_template(self, *, path: str) -> bytes:
+    def render_template(self, *, path: str, context: Optional[Mapping[str, Any]] = None) -> bytes:
         """
         Render a template.
 
         Args:
             path: the template path, relative to the templates_folder instance attribute.
+            context: the variables used in the template.
 
         Returns:
             The template rendered in UTF-8 format.
         """
-        rendered_template = self.template_parser.get_template(path).render()
-        cleaned_template = re.sub("((\n +)+\n)|(\n\n$)", "\n", rendered_template)
-        return cleaned_template.encode()
+        return b"".join(self.generate_template(path=path, context=context))
+
+
+class BytecodeCache(jinja2.BytecodeCache):
+    """
+    Store the compiled templates in the disk cache, so each template is compiled once for all the runs.
+
+    Jinja checks that the stored bytecode was compiled from the same source and Python version before using it.
+    """
+
+    def __init__(self, *, cache: generator_cache.DiskCache) -> None:
+        """
+        Initialize a bytecode cache.
+
+        Args:
+            cache: the disk cache where the bytecode is stored.
+        """
+        self.cache = cache
+
+    def load_bytecode(self, bucket: bccache.Bucket) -> None:
+        """
+        Load the bytecode of a template, if it's stored.
+
+        Args:
+            bucket: the bucket of the template.
+        """
+        data = self.cache.get(key=generator_cache.get_key("template", bucket.key))
+        if data is not None:
+            bucket.bytecode_from_string(data)
+
+    def dump_bytecode(self, bucket: bccache.Bucket) -> None:
+        """
+        Store the bytecode of a template.
+
+        Args:
+            bucket: the bucket of the template.
+        """
+        self.cache.set(key=generator_cache.get_key("template", bucket.key), data=bucket.bytecode_to_string())
+
+
+@jinja2.pass_context
+def generate_sri(context: runtime.Context, path: str) -> str:
+    """
+    Get the Subresource Integrity of a template rendered in the same build.
+
+    Args:
+        context: the context of the template that uses the filter.
+        path: the template path, relative to the templates folder.
+
+    Returns:
+        The Subresource Integrity.
+    """
+    rendered_templates: RenderedTemplates = context["rendered_templates"]
+    return rendered_templates.get_integrity(path)
+
+
+@jinja2.pass_context
+def get_static_url(context: runtime.Context, name: str) -> str:
+    """
+    Get the URL of a file of the static folder created in the same build.
+
+    Args:
+        context: the context of the template that uses the filter.
+        name: the file name, without the content hash.
+
+    Returns:
+        The URL.
+    """
+    rendered_templates: RenderedTemplates = context["rendered_templates"]
+    return f"{context['config'].get('static_url')}/{rendered_templates.get_static_name(name)}"
+
+
+@functools.lru_cache(maxsize=None)
+def get_template_loader(*, cache_path: Optional[pathlib.Path] = None) -> TemplateLoader:
+    """
+    Get the template loader shared by all the builds of the process.
+
+    The templates are compiled once per process, and the compiled templates are kept in memory. If a cache path is
+    defined, they are also stored on disk for the next processes.
+
+    Args:
+        cache_path: the folder of the disk cache.
+
+    Returns:
+        The template loader.
+    """
+    template_loader = TemplateLoader(
+        extensions=[
+            "cushead.generator.templates.jinja.extensions.OneLineExtension",
+            "cushead.generator.templates.jinja.extensions.FragmentExtension",
+        ],
+        bytecode_cache=BytecodeCache(cache=generator_cache.DiskCache(path=cache_path)) if cache_path else None,
+    )
+    template_loader.template_parser.filters["generate_sri"] = generate_sri
+    template_loader.template_parser.filters["static_file"] = get_static_url
+    return template_loader
+
+
+class RenderedTemplates:
+    """
+    Render each template of a build once.
+
+    The rendered templates are kept, so the Subresource Integrity and the content hash of a file are computed from the
+    same bytes that are created, and are shared by all the pages rendered with the same rendered templates.
+
+    The templates are rendered when they are first needed, so a template that references the content hash of another
+    one renders it first. The fragments of the templates that don't vary between pages are also kept, and rendered once.
+    The config keys read to render each template and fragment are kept with them, so they are recorded each time they
+    are used.
+    """
+
+    def __init__(
+        self,
+        *,
+        template_loader: TemplateLoader,
+        context: Optional[Mapping[str, Any]] = None,
+        minify: bool = False,
+        fingerprint: bool = False,
+        static_names: Optional[Dict[str, str]] = None,
+        dependencies: Optional[generator_dependencies.Dependencies] = None,
+        minify_keys: Iterable[str] = (),
+        fingerprint_keys: Iterable[str] = (),
+    ) -> None:
+        """
+        Initialize the rendered templates.
+
+        Args:
+            template_loader: the loader used to render the templates.
+            context: the variables used in the templates.
+            minify: if True, the templates are minified after being rendered.
+            fingerprint: if True, the names of the static templates include their content hash.
+            static_names: the names of the static files that are already created, by their names without the content hash.
+            dependencies: if defined, the config keys read to render the templates are recorded on it.
+            minify_keys: the config keys read to define the minify argument.
+            fingerprint_keys: the config keys read to define the fingerprint argument.
+        """
+        self.template_loader = template_loader
+        self.context: Dict[str, Any] = {**(context or {}), "rendered_templates": self}
+        self.minify = minify
+        self.fingerprint = fingerprint
+        self.static_names: Dict[str, str] = static_names if static_names is not None else {}
+        self.templates: Dict[str, bytes] = {}
+        self.rendered_sizes: Dict[str, int] = {}
+        self.integrities: Dict[str, str] = {}
+        self.fragments: Dict[str, str] = {}
+        self.dependencies = dependencies
+        self.minify_keys = frozenset(minify_keys)
+        self.fingerprint_keys = frozenset(fingerprint_keys)
+        # The config keys read to define each context variable.
+        self.context_keys: Dict[str, FrozenSet[str]] = {}
+        self.template_keys: Dict[str, FrozenSet[str]] = {}
+        self.fragment_keys: Dict[str, FrozenSet[str]] = {}
+
+    def get_template(self, *, path: str) -> bytes:
+        """
+        Get a rendered template.
+
+        Args:
+            path: the template path, relative to the templates folder.
+
+        Returns:
+            The template rendered in UTF-8 format, minified if it's enabled.
+        """
+        if path not in self.templates:
+            with generator_dependencies.record(dependencies=self.dependencies) as keys:
+                template = self.template_loader.render_template(path=path, context=self.context)
+            self.rendered_sizes[path] = len(template)
+            if path in TEMPLATE_TYPES:
+                keys.update(self.minify_keys)
+                if self.minify:
+                    template = minifiers.minify(data=template, suffix=TEMPLATE_TYPES[path])
+            self.templates[path] = template
+            variables = self.template_loader.get_variables(path=path)
+            self.template_keys[path] = frozenset(keys).union(*(self.context_keys.get(variable, ()) for variable in variables))
+        if self.dependencies:
+            self.dependencies.add_keys(keys=self.template_keys[path])
+        return self.templates[path]
+
+    def get_fragment(self, *, name: str, caller: Callable[[], str]) -> str:
+        """
+        Get a rendered fragment of a template.
+
+        It's used by the fragment jinja extension.
+
+        Args:
+            name: the fragment name.
+            caller: the function that renders the fragment.
+
+        Returns:
+            The rendered fragment, cleaned if it can be yielded without cleaning it again.
+        """
+        if name not in self.fragments:
+            with generator_dependencies.record(dependencies=self.dependencies) as keys:
+                fragment = caller()
+            if fragment[:1].strip() and fragment[-1:].strip():
+                fragment = Fragment(BLANK_LINES_PATTERN.sub("\n", fragment))
+            self.fragments[name] = fragment
+            self.fragment_keys[name] = frozenset(keys)
+        if self.dependencies:
+            self.dependencies.add_keys(keys=self.fragment_keys[name])
+        return self.fragments[name]
+
+    def get_static_name(self, name: str) -> str:
+        """
+        Get the name of a file of the static folder.
+
+        Args:
+            name: the file name, without the content hash.
+
+        Returns:
+            The file name, with the content hash if the file has one.
+        """
+        if self.dependencies:
+            self.dependencies.add_keys(keys=self.fingerprint_keys)
+        if name not in self.static_names and self.fingerprint and name in STATIC_TEMPLATES:
+            self.static_names[name] = files.get_fingerprinted_name(name=name, data=self.get_template(path=STATIC_TEMPLATES[name]))
+        return self.static_names.get(name, name)
+
+    def get_integrity(self, path: str) -> str:
+        """
+        Get the Subresource Integrity of a rendered template.
+
+        It's used as the generate_sri jinja filter.
+
+        Args:
+            path: the template path, relative to the templates folder.
+
+        Returns:
+            The Subresource Integrity.
+        """
+        if path not in self.integrities:
+            self.integrities[path] = filters.generate_sri(self.get_template(path=path))
+        return self.integrities[path]
 
 
 def get_template_hash(*, template: bytes) -> str:
@@ -62,91 +418,116 @@ def get_template_hash(*, template: bytes) -> str:
     return hashlib.sha256(template).hexdigest()[0:6]
 
 
-def generate_templates(*, config: generator_config.Config) -> List[files.File]:
+def generate_templates(
+    *,
+    config: generator_config.Config,
+    skip_path: Optional[Callable[[pathlib.Path], bool]] = None,
+    cache: Optional[generator_cache.DiskCache] = None,
+    report: Optional[generator_report.BuildReport] = None,
+    static_names: Optional[Dict[str, str]] = None,
+    assets: Iterable[precache.Asset] = (),
+    dependencies: Optional[generator_dependencies.Dependencies] = None,
+) -> Iterator[files.File]:
     """
     Get templates ready to create.
 
+    The templates are rendered lazily, when they are consumed. If the minify key of the config is enabled, the
+    templates are minified before computing their hashes and Subresource Integrities. If the fingerprint key is
+    enabled, the names of the static templates include their content hash. If the precache key is enabled, the service
+    worker precaches the generated files that match the precache patterns. If the sitemap_urls key is defined, the
+    sitemap is an index of the gzipped sitemaps of its URLs. If the locales key is defined, the index page links to the
+    index pages of the locales.
+
     Args:
         config: the config used in the templates context.
+        skip_path: if defined, the templates whose path makes it return True are never rendered.
+        cache: if defined, the compiled templates are stored on it.
+        report: if defined, the sizes of the minified templates are collected on it.
+        static_names: the names of the static files that are already created, by their names without the content hash.
+        assets: the data of the images that are already created, used to precache them.
+        dependencies: if defined, the config keys read to render each template are recorded on it.
 
-    Returns:
+    Yields:
         The templates.
     """
-    template_loader = TemplateLoader(extensions=["cushead.generator.templates.jinja.extensions.OneLineExtension"])
-    template_loader.template_parser.globals["config"] = config
-    template_loader.template_parser.filters["generate_sri"] = filters.generate_sri
-    index_template = template_loader.render_template(path="index.jinja2")
-    index_hash = get_template_hash(template=index_template)
-    template_loader.template_parser.globals["index_hash"] = index_hash
-
-    templates = [
-        files.File(
-            path=config["output_folder_path"] / "index.html",
-            data=index_template,
-        ),
-        files.File(
-            path=config["output_folder_path"] / "manifest.json",
-            data=template_loader.render_template(path="manifest.jinja2"),
-        ),
-        files.File(
-            path=config["output_folder_path"] / "robots.txt",
-            data=template_loader.render_template(path="robots.jinja2"),
-        ),
-        files.File(
-            path=config["output_folder_path"] / "sw.js",
-            data=template_loader.render_template(path="sw.jinja2"),
-        ),
-        files.File(
-            path=config["output_folder_path"] / "static" / "early_script.js",
-            data=template_loader.render_template(path="early_script.jinja2"),
-        ),
-        files.File(
-            path=config["output_folder_path"] / "static" / "late_script.js",
-            data=template_loader.render_template(path="late_script.jinja2"),
-        ),
-        files.File(
-            path=config["output_folder_path"] / "static" / "styles.css",
-            data=template_loader.render_template(path="styles.jinja2"),
-        ),
+    template_loader = get_template_loader(cache_path=cache.path if cache else None)
+    with generator_dependencies.record(dependencies=dependencies) as minify_keys:
+        minify = config.get("minify", False)
+    with generator_dependencies.record(dependencies=dependencies) as fingerprint_keys:
+        fingerprint = config.get("fingerprint", False)
+    with generator_dependencies.record(dependencies=dependencies) as alternates_keys:
+        alternates = locales.get_alternates(config=config) if config.get("locales") else []
+    rendered_templates = RenderedTemplates(
+        template_loader=template_loader,
+        context={"config": generator_dependencies.get_template_config(config=config, dependencies=dependencies), "alternates": alternates},
+        minify=minify,
+        fingerprint=fingerprint,
+        static_names=static_names,
+        dependencies=dependencies,
+        minify_keys=minify_keys,
+        fingerprint_keys=fingerprint_keys,
+    )
+    rendered_templates.context_keys["alternates"] = frozenset(alternates_keys)
+    index_template = rendered_templates.get_template(path="index.jinja2")
+    rendered_templates.context["index_hash"] = get_template_hash(template=index_template)
+    rendered_templates.context_keys["index_hash"] = rendered_templates.template_keys["index.jinja2"]
+
+    templates_data = [
+        TemplateData(path=config["output_folder_path"] / "index.html", template="index.jinja2"),
+        TemplateData(path=config["output_folder_path"] / "manifest.json", template="manifest.jinja2"),
+        TemplateData(path=config["output_folder_path"] / "robots.txt", template="robots.jinja2"),
+        TemplateData(path=config["output_folder_path"] / "sw.js", template="sw.jinja2"),
+        TemplateData(path=config["output_folder_path"] / "static" / rendered_templates.get_static_name("early_script.js"), template="early_script.jinja2"),
+        TemplateData(path=config["output_folder_path"] / "static" / rendered_templates.get_static_name("late_script.js"), template="late_script.jinja2"),
+        TemplateData(path=config["output_folder_path"] / "static" / rendered_templates.get_static_name("styles.css"), template="styles.jinja2"),
     ]
 
     if config.get("domain"):
-        templates.append(
-            files.File(
-                path=config["output_folder_path"] / "sitemap.xml",
-                data=template_loader.render_template(path="sitemap.jinja2"),
-            ),
-        )
+        if config.get("sitemap_urls"):
+            # The sitemaps are created first, so the sitemap index can reference all of them.
+            sitemap_names: List[str] = []
+            # The sitemaps only depend on the content of the URLs file.
+            sitemap_keys = frozenset(("sitemap_urls",))
+            for sitemap in sitemaps.generate_sitemaps(config=config, sitemap_names=sitemap_names, skip_path=skip_path):
+                if dependencies:
+                    dependencies.add_output(path=sitemap.path, keys=sitemap_keys)
+                yield sitemap
+            rendered_templates.context["sitemaps"] = sitemap_names
+            rendered_templates.context_keys["sitemaps"] = sitemap_keys
+            templates_data.append(TemplateData(path=config["output_folder_path"] / "sitemap.xml", template="sitemap_index.jinja2"))
+        else:
+            templates_data.append(TemplateData(path=config["output_folder_path"] / "sitemap.xml", template="sitemap.jinja2"))
         if config.get("title"):
-            templates.append(
-                files.File(
-                    path=config["output_folder_path"] / "static" / "opensearch.xml",
-                    data=template_loader.render_template(path="opensearch.jinja2"),
-                ),
-            )
+            templates_data.append(TemplateData(path=config["output_folder_path"] / "static" / rendered_templates.get_static_name("opensearch.xml"), template="opensearch.jinja2"))
 
     if config.get("favicon_png") or config.get("main_color"):
-        templates.append(
-            files.File(
-                path=config["output_folder_path"] / "static" / "browserconfig.xml",
-                data=template_loader.render_template(path="browserconfig.jinja2"),
-            )
+        templates_data.append(
+            TemplateData(path=config["output_folder_path"] / "static" / rendered_templates.get_static_name("browserconfig.xml"), template="browserconfig.jinja2")
         )
 
     if config.get("author_email"):
-        templates.append(
-            files.File(
-                path=config["output_folder_path"] / ".well-known" / "security",
-                data=template_loader.render_template(path="security.jinja2"),
-            )
-        )
+        templates_data.append(TemplateData(path=config["output_folder_path"] / ".well-known" / "security", template="security.jinja2"))
 
     if config.get("author_name") or config.get("author_email"):
-        templates.append(
-            files.File(
-                path=config["output_folder_path"] / "humans.txt",
-                data=template_loader.render_template(path="humans.jinja2"),
+        templates_data.append(TemplateData(path=config["output_folder_path"] / "humans.txt", template="humans.jinja2"))
+
+    with generator_dependencies.record(dependencies=dependencies) as precache_keys:
+        rendered_templates.context["precache_entries"] = []
+        if config.get("precache"):
+            template_assets = (
+                precache.get_asset(file=files.File(path=template_data.path, data=rendered_templates.get_template(path=template_data.template)))
+                for template_data in templates_data
+                if template_data.template not in ("index.jinja2", "sw.jinja2") and not (skip_path and skip_path(template_data.path))
             )
-        )
+            rendered_templates.context["precache_entries"] = precache.get_precache_entries(config=config, assets=itertools.chain(assets, template_assets))
+    rendered_templates.context_keys["precache_entries"] = frozenset(precache_keys)
 
-    return templates
+    for template_data in templates_data:
+        if skip_path and skip_path(template_data.path):
+            continue
+        data = rendered_templates.get_template(path=template_data.template)
+        if report and rendered_templates.minify and template_data.template in TEMPLATE_TYPES:
+            report.add_minified_file(path=template_data.path, original_size=rendered_templates.rendered_sizes[template_data.template], size=len(data))
+        if dependencies:
+            dependencies.add_output(path=template_data.path, keys=rendered_templates.template_keys[template_data.template])
+        yield files.File(path=template_data.path, data=data)
@@ -12,6 +12,7 @@ from typing import Any
 from typing import Dict
 from typing import List
 from typing import Optional
+from unittest import mock
 
 from cushead import info
 from cushead.console import console
@@ -34,6 +35,7 @@ class BaseTests(unittest.TestCase):
         self.config_folder = self.base_folder / "config"
         self.config_file = self.config_folder / "config.json"
         self.output_folder = self.config_folder / "output"
+        self.cache_folder = self.config_folder / "cache" / info.PACKAGE_NAME
         self.usage = setup.get_parser().usage
         self.config: Dict[Any, Any] = {}
 
@@ -95,11 +97,15 @@ class BaseTests(unittest.TestCase):
         Create the default configuration file with images and set the default config in the config instance attribute.
         """
         os.makedirs(self.config_folder)
+        # Keep the cache of generated images inside the folder removed after each test.
+        self.environ_patch = mock.patch.dict(os.environ, {"XDG_CACHE_HOME": str(self.config_folder / "cache")})
+        self.environ_patch.start()
         self.execute_cli(args=["-d", "-i", str(self.config_file)])
         self.set_default_config()
 
     def tearDown(self) -> None:
         """
-        Remove all the files created by the tests and by the setUp method.
+        Remove all the files created by the tests and by the setUp method, and restore the environment variables.
         """
         self.remove_output_folder()
+        self.environ_patch.stop()
@@ -2,9 +2,35 @@
 """
 Test different configs.
 """
+import contextlib
+import gzip
+import http.client
+import io
 import pathlib
+import re
+import shutil
+import socket
+import threading
 import unittest
+from typing import Dict
+from typing import Optional
+from unittest import mock
 
+import colorama
+from PIL import Image
+from PIL import ImageChops
+from PIL import PngImagePlugin
+
+from cushead import api
+from cushead.console.arguments import execute
+from cushead.console.arguments import serve
+from cushead.console.arguments import setup
+from cushead.console.arguments import watch
+from cushead.generator import cache
+from cushead.generator import files
+from cushead.generator import images
+from cushead.generator.templates import templates
+from cushead.generator.templates.jinja import filters
 from tests import base_tests
 
 
@@ -13,24 +39,26 @@ class TestConfig(base_tests.BaseTests):
     Main config test class.
     """
 
-    def compare_output(self, *, template_folder_path: pathlib.Path) -> None:
+    def compare_output(self, *, template_folder_path: pathlib.Path, output_folder: Optional[pathlib.Path] = None) -> None:
         """
         Compare the expected output with the real output.
 
         Args:
             template_folder_path: the path, relative to the templates_folder instance attribute, that has the expected files.
+            output_folder: the folder that has the real output. Default: the output_folder instance attribute.
         """
         template_folder = self.base_folder / "templates" / template_folder_path
+        output_folder = output_folder or self.output_folder
 
         # Compare the folders structure.
         self.assertEqual(
-            [str(file.relative_to(self.output_folder)) for file in self.output_folder.rglob("*")],
+            [str(file.relative_to(output_folder)) for file in output_folder.rglob("*")],
             [str(file.relative_to(template_folder)) for file in template_folder.rglob("*")],
         )
 
         # Compare the files.
-        for generated_file in self.output_folder.rglob("*"):
-            template_file = template_folder / generated_file.relative_to(self.output_folder)
+        for generated_file in output_folder.rglob("*"):
+            template_file = template_folder / generated_file.relative_to(output_folder)
             if generated_file.is_dir():
                 self.assertTrue(template_file.is_dir())
             elif generated_file.suffix in (".png", ".ico"):
@@ -45,6 +73,363 @@ class TestConfig(base_tests.BaseTests):
         self.execute_cli(args=["-c", str(self.config_file)])
         self.compare_output(template_folder_path=pathlib.Path("default_config"))
 
+    def test_jobs(self) -> None:
+        """
+        Test that generating the images with many workers gives the same output as a serial run.
+        """
+        self.execute_cli(args=["-c", str(self.config_file), "-j", "4"])
+        self.compare_output(template_folder_path=pathlib.Path("default_config"))
+
+    def test_cache(self) -> None:
+        """
+        Test that a warm run reads all the images from the cache.
+        """
+        self.execute_cli(args=["-c", str(self.config_file)])
+        self.assertTrue(any(self.cache_folder.rglob("*")))
+        shutil.rmtree(self.output_folder)
+        with mock.patch.object(images, "render_image") as render_image:
+            self.execute_cli(args=["-c", str(self.config_file)])
+        render_image.assert_not_called()
+        self.compare_output(template_folder_path=pathlib.Path("default_config"))
+
+        # Without cache, all the images are rendered again.
+        shutil.rmtree(self.output_folder)
+        self.execute_cli(args=["-c", str(self.config_file), "--no-cache", "-j", "2"])
+        self.compare_output(template_folder_path=pathlib.Path("default_config"))
+
+    def test_validate_only(self) -> None:
+        """
+        Test that a config can be checked without decoding the PNG images or creating any file.
+        """
+        with mock.patch.object(PngImagePlugin.PngImageFile, "load") as load:
+            self.execute_cli(args=["-c", str(self.config_file), "--validate-only"])
+        load.assert_not_called()
+        self.assertFalse(self.output_folder.exists())
+
+    def test_minify(self) -> None:
+        """
+        Test that the hashes and the Subresource Integrities are computed from the minified files.
+        """
+        self.config["static_url"] = "https://cdn.sample.com/static"
+        self.write_config_file()
+        self.execute_cli(args=["-c", str(self.config_file), "--minify"])
+        index = (self.output_folder / "index.html").read_bytes()
+        for static_file in ("styles.css", "early_script.js", "late_script.js"):
+            data = (self.output_folder / "static" / static_file).read_bytes()
+            self.assertIn(filters.generate_sri(data).encode(), index)
+        self.assertIn(f'revision:"{templates.get_template_hash(template=index)}"', (self.output_folder / "sw.js").read_text())
+        self.assertNotIn(b"\n ", index)
+
+    def test_precompress(self) -> None:
+        """
+        Test that the text files have a compressed copy when it makes them smaller.
+        """
+        self.execute_cli(args=["-c", str(self.config_file), "--precompress"])
+        for path in ("index.html", "sw.js", "manifest.json", "sitemap.xml", "static/browserconfig.xml"):
+            generated_file = self.output_folder / path
+            self.assertEqual(gzip.decompress(generated_file.with_name(f"{generated_file.name}.gz").read_bytes()), generated_file.read_bytes())
+
+        # The images, and the files that are too small to benefit from the compression, don't have a compressed copy.
+        self.assertFalse(list(self.output_folder.rglob("*.png.gz")))
+        self.assertFalse((self.output_folder / "static" / "early_script.js.gz").exists())
+
+    def test_reduce_colors(self) -> None:
+        """
+        Test that the images are never bigger with reduce_colors, and that the ones without background color keep their pixels.
+        """
+        self.config["reduce_colors"] = True
+        self.write_config_file()
+        self.execute_cli(args=["-c", str(self.config_file)])
+        template_folder = self.base_folder / "templates" / "default_config"
+        for generated_file in self.output_folder.rglob("*.png"):
+            template_file = template_folder / generated_file.relative_to(self.output_folder)
+            self.assertLessEqual(generated_file.stat().st_size, template_file.stat().st_size)
+        self.assertLess((self.output_folder / "static" / "yandex.png").stat().st_size, (template_folder / "static" / "yandex.png").stat().st_size)
+        with Image.open(self.output_folder / "static" / "favicon-16x16.png") as image, Image.open(template_folder / "static" / "favicon-16x16.png") as template_image:
+            self.assertIsNone(ImageChops.difference(image.convert("RGBA"), template_image.convert("RGBA")).getbbox())
+
+    def test_fingerprint(self) -> None:
+        """
+        Test that the static files have a hash of their content in the name, and are referenced with that name.
+        """
+        self.execute_cli(args=["-c", str(self.config_file), "--fingerprint"])
+        static_folder = self.output_folder / "static"
+        static_names = {static_file.name for static_file in static_folder.iterdir()}
+        for static_file in static_folder.iterdir():
+            original_name = re.sub(r"\.[0-9a-f]{8}(\.\w+)$", r"\1", static_file.name)
+            self.assertEqual(files.get_fingerprinted_name(name=original_name, data=static_file.read_bytes()), static_file.name)
+
+        references = set()
+        for path in ("index.html", "manifest.json", f"static/{next(name for name in static_names if name.startswith('browserconfig.'))}"):
+            references.update(re.findall(r"/static/([^\"<,]+)", (self.output_folder / path).read_text()))
+        self.assertIn(next(name for name in static_names if name.startswith("styles.")), references)
+        self.assertLessEqual(references, static_names)
+
+    def test_precache(self) -> None:
+        """
+        Test that the service worker precaches the generated files with the revision of their content.
+        """
+        self.config["precache"] = True
+        self.write_config_file()
+        self.execute_cli(args=["-c", str(self.config_file)])
+        precache_entries = re.findall(r'url: "([^"]+)",\n      revision: "([^"]+)"', (self.output_folder / "sw.js").read_text())
+        self.assertEqual(precache_entries[1], ("/manifest.json", templates.get_template_hash(template=(self.output_folder / "manifest.json").read_bytes())))
+        self.assertIn("/static/favicon-32x32.png", dict(precache_entries))
+        for url, revision in precache_entries[1:]:
+            self.assertEqual(templates.get_template_hash(template=(self.output_folder / url.lstrip("/")).read_bytes()), revision)
+
+    def test_sitemap_urls(self) -> None:
+        """
+        Test that the sitemap is an index of the sitemaps of the URLs file.
+        """
+        (self.config_folder / "urls.txt").write_text("https://sample.com/\nhttps://sample.com/about\n")
+        self.config["sitemap_urls"] = "urls.txt"
+        self.write_config_file()
+        self.execute_cli(args=["-c", str(self.config_file)])
+        self.assertIn("<loc>https://sample.com/sitemap-1.xml.gz</loc>", (self.output_folder / "sitemap.xml").read_text())
+        self.assertIn(b"<loc>https://sample.com/about</loc>", gzip.decompress((self.output_folder / "sitemap-1.xml.gz").read_bytes()))
+        self.assertIn("Sitemap: https://sample.com/sitemap.xml", (self.output_folder / "robots.txt").read_text())
+
+    def test_pages(self) -> None:
+        """
+        Test that each record of the pages file has a page, and that many workers give the same output as a serial run.
+        """
+        (self.config_folder / "pages.jsonl").write_text("".join(f'{{"path": "blog/{index}.html", "title": "Post {index}"}}\n' for index in range(100)))
+        self.config["pages"] = "pages.jsonl"
+        self.write_config_file()
+        self.execute_cli(args=["-c", str(self.config_file)])
+        page = (self.output_folder / "blog" / "42.html").read_text()
+        self.assertIn("<title>Post 42</title>", page)
+        self.assertIn('<link rel="canonical" href="https://sample.com/blog/42.html">', page)
+        self.assertIn('<meta property="og:url" content="https://sample.com/blog/42.html">', page)
+        self.assertEqual(
+            page.replace("Post 42", "Sample").replace('    <link rel="canonical" href="https://sample.com/blog/42.html">\n', "").replace("https://sample.com/blog/42.html", "https://sample.com"),
+            (self.output_folder / "index.html").read_text(),
+        )
+        serial_pages = {path: path.read_bytes() for path in (self.output_folder / "blog").iterdir()}
+
+        shutil.rmtree(self.output_folder)
+        self.execute_cli(args=["-c", str(self.config_file), "-j", "2"])
+        self.assertEqual({path: path.read_bytes() for path in (self.output_folder / "blog").iterdir()}, serial_pages)
+
+    def test_locales(self) -> None:
+        """
+        Test that each locale has an index page, that all the index pages link to each other, and that the images are shared.
+        """
+        self.config["locales"] = [{"language": "es", "territory": "AR", "title": "Ejemplo"}, {"language": "fr"}]
+        self.write_config_file()
+        self.execute_cli(args=["-c", str(self.config_file), "-j", "2"])
+
+        alternates = "".join(
+            f'    <link rel="alternate" hreflang="{hreflang}" href="{url}">\n'
+            for hreflang, url in (("en-US", "https://sample.com/"), ("es-AR", "https://sample.com/es-AR/"), ("fr", "https://sample.com/fr/"), ("x-default", "https://sample.com/"))
+        )
+        self.assertIn(alternates, (self.output_folder / "index.html").read_text())
+        page = (self.output_folder / "es-AR" / "index.html").read_text()
+        self.assertIn(f'<title>Ejemplo</title>\n    <link rel="canonical" href="https://sample.com/es-AR/">\n{alternates}', page)
+        self.assertIn('<html class="no-js" lang="es-AR">', page)
+        self.assertIn('<meta name="description" content="We do things">', page)
+        self.assertIn('<html class="no-js" lang="fr">', (self.output_folder / "fr" / "index.html").read_text())
+        self.assertEqual([path.name for path in (self.output_folder / "es-AR").iterdir()], ["index.html"])
+
+    def test_batch(self) -> None:
+        """
+        Test that each config file of a batch gives the same output as a single build, and that the sites that can't be built are reported.
+        """
+        sites_folder = self.config_folder / "sites"
+        self.addCleanup(shutil.rmtree, sites_folder, ignore_errors=True)
+        for site in ("a", "b"):
+            self.execute_cli(args=["-d", "-i", str(sites_folder / site / "config.json")])
+        (sites_folder / "c").mkdir()
+        (sites_folder / "c" / "config.json").write_text("{}")
+        self.execute_cli(args=["-b", "-j", "2", str(sites_folder)], expected_exception="Can't build 1 of 3 sites.")
+        for site in ("a", "b"):
+            self.compare_output(template_folder_path=pathlib.Path("default_config"), output_folder=sites_folder / site / "output")
+
+        # A glob pattern selects some config files.
+        shutil.rmtree(sites_folder / "a" / "output")
+        self.execute_cli(args=["-b", str(sites_folder / "a" / "*.json")])
+        self.compare_output(template_folder_path=pathlib.Path("default_config"), output_folder=sites_folder / "a" / "output")
+
+    def test_watch(self) -> None:
+        """
+        Test that each change of the watched files only rebuilds the affected outputs, and that the last build gives the same output as a single build.
+        """
+        parser_namespace = setup.get_parser().parse_args(args=["-c", "-w", str(self.config_file)])
+        watcher = watch.Watcher(path=self.config_file, parser_namespace=parser_namespace, cache=execute.get_cache(parser_namespace=parser_namespace))
+        with io.StringIO() as buffer, contextlib.redirect_stdout(buffer):
+            watcher.poll()
+            watcher.build()
+            self.assertFalse(watcher.rebuild())
+
+            # The templates depend on the title, but the images don't.
+            self.set_default_config()
+            self.config["title"] = "Other title"
+            self.write_config_file()
+            self.assertEqual(watcher.poll(), {"title"})
+            created_paths = watcher.build().created_paths
+            self.assertIn(self.output_folder / "index.html", created_paths)
+            self.assertFalse([path for path in created_paths if path.suffix in (".png", ".ico")])
+
+            # The favicon family depends on the content of the favicon_png source, but the templates don't.
+            favicon_png = self.config_folder / self.config["favicon_png"]
+            with Image.open(favicon_png) as image:
+                image.save(favicon_png, compress_level=1)
+            self.assertEqual(watcher.poll(), {"favicon_png"})
+            created_paths = watcher.build().created_paths
+            self.assertIn(self.output_folder / "static" / "favicon-16x16.png", created_paths)
+            self.assertNotIn(self.output_folder / "favicon.ico", created_paths)
+            self.assertFalse([path for path in created_paths if path.suffix not in (".png",)])
+
+            # The invalid configs are reported, and the next valid one is built.
+            self.config_file.write_text("{")
+            self.assertTrue(watcher.rebuild())
+            self.set_default_config()
+            self.write_config_file()
+            self.assertTrue(watcher.rebuild())
+        self.compare_output(template_folder_path=pathlib.Path("default_config"))
+
+    def test_watch_pages(self) -> None:
+        """
+        Test that the pages are recorded as a single group, whose pages are only rebuilt when its keys or files change.
+        """
+        (self.config_folder / "pages.jsonl").write_text("".join(f'{{"path": "blog/{index}.html", "title": "Post {index}"}}\n' for index in range(100)))
+        self.config["pages"] = "pages.jsonl"
+        self.write_config_file()
+        parser_namespace = setup.get_parser().parse_args(args=["-c", "-w", str(self.config_file)])
+        watcher = watch.Watcher(path=self.config_file, parser_namespace=parser_namespace, cache=execute.get_cache(parser_namespace=parser_namespace))
+        with io.StringIO() as buffer, contextlib.redirect_stdout(buffer):
+            watcher.poll()
+            files_writer = watcher.build()
+            self.assertEqual(files_writer.created_pages, 100)
+            self.assertFalse([path for path in files_writer.created_paths if "blog" in path.parts])
+            self.assertIn(" - 100 pages", buffer.getvalue().replace(colorama.Fore.YELLOW, "").replace(colorama.Fore.RESET, ""))
+            # The records don't grow with the number of pages.
+            self.assertEqual(set(watcher.dependencies.groups), {"pages"})
+            self.assertFalse([path for path in watcher.dependencies.outputs if "blog" in pathlib.Path(path).parts])
+            self.assertEqual(watcher.build().created_files, 0)
+
+            # A page modified outside the builds is rebuilt alone.
+            page = self.output_folder / "blog" / "42.html"
+            page_data = page.read_bytes()
+            page.write_text("")
+            self.assertEqual(watcher.build().created_pages, 1)
+            self.assertEqual(page.read_bytes(), page_data)
+
+            # The pages depend on the title.
+            self.config["title"] = "Other title"
+            self.write_config_file()
+            self.assertEqual(watcher.poll(), {"title"})
+            self.assertEqual(watcher.build().created_pages, 100)
+
+    def test_serve(self) -> None:
+        """
+        Test that the files are served from memory, with ETags, conditional requests and gzip negotiation.
+        """
+        parser_namespace = setup.get_parser().parse_args(args=["-c", "--serve", str(self.config_file)])
+        with io.StringIO() as buffer, contextlib.redirect_stdout(buffer):
+            resources = serve.build_resources(path=self.config_file, parser_namespace=parser_namespace)
+            self.assertFalse(self.output_folder.exists())
+            with serve.Server(address=("127.0.0.1", 0), resources=resources) as http_server:
+                thread = threading.Thread(target=http_server.serve_forever)
+                thread.start()
+                try:
+                    connection = http.client.HTTPConnection(*http_server.server_address[0:2])
+
+                    def request(method: str, path: str, **headers: str) -> http.client.HTTPResponse:
+                        connection.request(method, path, headers=headers)
+                        response = connection.getresponse()
+                        response.read()
+                        return response
+
+                    index_html = (self.base_folder / "templates" / "default_config" / "index.html").read_bytes()
+                    connection.request("GET", "/")
+                    response = connection.getresponse()
+                    self.assertEqual(response.status, 200)
+                    self.assertEqual(response.getheader("Content-Type"), "text/html; charset=utf-8")
+                    self.assertIsNone(response.getheader("Content-Encoding"))
+                    self.assertEqual(response.read(), index_html)
+                    etag = response.getheader("ETag")
+                    self.assertRegex(etag, '^"[0-9a-f]{32}"$')
+                    self.assertEqual(request("GET", "/index.html?query", **{"If-None-Match": etag}).status, 304)
+
+                    connection.request("GET", "/", headers={"Accept-Encoding": "br;q=1.0, gzip;q=0.5"})
+                    response = connection.getresponse()
+                    self.assertEqual(response.getheader("Content-Encoding"), "gzip")
+                    self.assertEqual(response.getheader("Vary"), "Accept-Encoding")
+                    self.assertEqual(gzip.decompress(response.read()), index_html)
+                    self.assertNotEqual(response.getheader("ETag"), etag)
+                    self.assertIsNone(request("GET", "/", **{"Accept-Encoding": "gzip;q=0"}).getheader("Content-Encoding"))
+
+                    response = request("HEAD", "/static/favicon-16x16.png", **{"Accept-Encoding": "gzip"})
+                    self.assertEqual(response.getheader("Content-Type"), "image/png")
+                    self.assertIsNone(response.getheader("Content-Encoding"))
+                    self.assertEqual(request("GET", "/missing.html").status, 404)
+                    connection.close()
+                finally:
+                    http_server.shutdown()
+                    thread.join()
+
+        # A port that is already in use is reported.
+        with socket.socket() as used_socket:
+            used_socket.bind(("127.0.0.1", 0))
+            used_socket.listen()
+            port = used_socket.getsockname()[1]
+            self.execute_cli(
+                args=["-c", "--serve", "--port", str(port), str(self.config_file)],
+                expected_exception=f"Can't serve on 127.0.0.1:{port}: Address already in use.",
+            )
+
+    def test_api(self) -> None:
+        """
+        Test that a config dict is built in memory, and that the next builds of the process reuse the generated images.
+        """
+        self.set_default_config()
+        result = api.build(config=self.config, sources=self.config_folder, cache=cache.MemoryCache())
+        self.assertFalse(self.output_folder.exists())
+        for file in result.files:
+            file_path = self.output_folder / file.path
+            file_path.parent.mkdir(parents=True, exist_ok=True)
+            file_path.write_bytes(file.data)
+        self.compare_output(template_folder_path=pathlib.Path("default_config"))
+
+        # The second build reads all the images from the memory cache of the process.
+        api.build(config=self.config, sources=self.config_folder)
+        result = api.build(config={**self.config, "title": "Other title"}, sources=self.config_folder)
+        self.assertEqual(result.build_report.encoded_images, {})
+        self.assertGreater(result.build_report.cached_images, 0)
+        self.assertIn(b"Other title", dict(result.files)[pathlib.Path("index.html")])
+
+    def test_incremental(self) -> None:
+        """
+        Test that an incremental build only creates the files whose config keys changed.
+        """
+
+        def get_states() -> Dict[pathlib.Path, int]:
+            return {path: path.stat().st_mtime_ns for path in self.output_folder.rglob("*") if path.is_file()}
+
+        self.execute_cli(args=["-c", str(self.config_file), "--incremental"])
+        self.compare_output(template_folder_path=pathlib.Path("default_config"))
+        states = get_states()
+        self.execute_cli(args=["-c", str(self.config_file), "--incremental"])
+        self.assertEqual(get_states(), states)
+
+        # The templates depend on the title, but the images don't.
+        self.config["title"] = "Other title"
+        self.write_config_file()
+        self.execute_cli(args=["-c", str(self.config_file), "--incremental"])
+        changed_paths = {path for path, state in get_states().items() if states[path] != state}
+        self.assertIn(self.output_folder / "index.html", changed_paths)
+        self.assertNotIn(self.output_folder / "robots.txt", changed_paths)
+        self.assertFalse([path for path in changed_paths if path.suffix in (".png", ".ico")])
+
+        # The files changed outside the builds are created again.
+        (self.output_folder / "robots.txt").write_text("")
+        self.set_default_config()
+        self.write_config_file()
+        self.execute_cli(args=["-c", str(self.config_file), "--incremental"])
+        self.compare_output(template_folder_path=pathlib.Path("default_config"))
+
     def test_missing_keys(self) -> None:
         """
         Test a config without any non-required field.
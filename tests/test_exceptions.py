@@ -7,6 +7,7 @@ import pathlib
 import shutil
 import unittest
 
+from cushead import info
 from tests import base_tests
 
 
@@ -20,13 +21,43 @@ class TestArgs(base_tests.BaseTests):
         Test invalid arguments.
         """
         # Miss a required argument.
-        self.execute_cli(args=[""], expected_exception="Missing a required argument. Use --config, --default or --help.")
+        self.execute_cli(args=[""], expected_exception="Missing a required argument. Use --config, --batch, --default or --help.")
 
         # Invalid arguments combination.
         self.execute_cli(args=["-c", "-d"], expected_exception="Can't use -c and -d arguments together.")
 
         # Pass optional argument without a required ones.
         self.execute_cli(args=["-c", "-i"], expected_exception="Can't use -i argument without --default.")
+        self.execute_cli(args=["-d", "-j", "2"], expected_exception="Can't use -j argument without --config or --batch.")
+        self.execute_cli(args=["-d", "--no-cache"], expected_exception="Can't use --no-cache argument without --config or --batch.")
+        self.execute_cli(args=["-d", "--validate-only"], expected_exception="Can't use --validate-only argument without --config or --batch.")
+        self.execute_cli(args=["-d", "--png-profile", "fast"], expected_exception="Can't use --png-profile argument without --config or --batch.")
+        self.execute_cli(args=["-d", "--minify"], expected_exception="Can't use --minify argument without --config or --batch.")
+        self.execute_cli(args=["-d", "--precompress"], expected_exception="Can't use --precompress argument without --config or --batch.")
+        self.execute_cli(args=["-d", "--fingerprint"], expected_exception="Can't use --fingerprint argument without --config or --batch.")
+        self.execute_cli(args=["-d", "-w"], expected_exception="Can't use -w argument without --config.")
+        self.execute_cli(args=["-c", "--watch", "--validate-only"], expected_exception="Can't use --validate-only and --watch arguments together.")
+        self.execute_cli(args=["-d", "--serve"], expected_exception="Can't use --serve argument without --config.")
+        self.execute_cli(args=["-c", "--serve", "-w"], expected_exception="Can't use -w and --serve arguments together.")
+        self.execute_cli(args=["-c", "--serve", "--validate-only"], expected_exception="Can't use --validate-only and --serve arguments together.")
+        self.execute_cli(args=["-c", "--port", "8000"], expected_exception="Can't use --port argument without --serve.")
+        self.execute_cli(args=["-d", "--incremental"], expected_exception="Can't use --incremental argument without --config.")
+        self.execute_cli(args=["-c", "--incremental", "--validate-only"], expected_exception="Can't use --validate-only and --incremental arguments together.")
+        self.execute_cli(args=["-c", "--incremental", "--no-cache"], expected_exception="Can't use --no-cache and --incremental arguments together.")
+        self.execute_cli(args=["-c", "-b", str(self.config_file)], expected_exception="Can't use -c and -b arguments together.")
+        self.execute_cli(args=["--batch"], expected_exception="The folder or the glob pattern of the config files is missing.")
+        batch_path = self.config_folder / "sites"
+        self.execute_cli(
+            args=["--batch", str(batch_path)],
+            expected_exception="\n".join((f"The batch ({batch_path}) doesn't match any config file.", f"ABSOLUTE PATH: {batch_path.absolute()}")),
+        )
+        self.execute_cli(args=["-c", "--no-cache", "--cache-size", "1"], expected_exception="Can't use --no-cache and --cache-size arguments together.")
+
+        # Invalid argument values.
+        self.execute_cli(args=["-c", "-j", "0"], expected_exception="The number of jobs must be greater than zero.")
+        self.execute_cli(args=["-c", "--cache-size", "0"], expected_exception="The cache size must be greater than zero.")
+        self.execute_cli(args=["-c", "--serve", "--port", "65536"], expected_exception="The port must be between 0 and 65535.")
+        self.execute_cli(args=["-c", "--png-profile", "tiny"], expected_exception="The PNG profile must be one of: fast, balanced, smallest.")
 
         # Miss the file.
         self.execute_cli(args=["-c"], expected_exception="The path to the config file is missing.")
@@ -101,6 +132,36 @@ class TestConfig(base_tests.BaseTests):
         self.write_config_file()
         self.execute_cli(args=["-c", str(self.config_file)], expected_exception=exception.format(key="background_color"))
 
+    def test_number_wrong_values(self) -> None:
+        """
+        Test if the numeric values are in range.
+        """
+        self.config["downscale_ratio"] = 0.5
+        self.write_config_file()
+        self.execute_cli(
+            args=["-c", str(self.config_file)],
+            expected_exception="The key downscale_ratio must be a number greater than or equal to 1. To resize every image from the source, set the value to null.",
+        )
+
+        self.config["downscale_ratio"] = None
+        self.config["precache_budget"] = -1
+        self.write_config_file()
+        self.execute_cli(
+            args=["-c", str(self.config_file)],
+            expected_exception="The key precache_budget must be a number of bytes greater than or equal to 0. To use 2097152 bytes, set the value to null.",
+        )
+
+    def test_option_wrong_values(self) -> None:
+        """
+        Test if the values are one of the available options.
+        """
+        self.config["png_profile"] = "tiny"
+        self.write_config_file()
+        self.execute_cli(
+            args=["-c", str(self.config_file)],
+            expected_exception="The key png_profile must be one of: fast, balanced, smallest. To use the balanced profile, set the value to null.",
+        )
+
 
 class TestReferences(base_tests.BaseTests):
     """
@@ -160,6 +221,82 @@ class TestReferences(base_tests.BaseTests):
         )
         self.execute_cli(args=["-c", str(self.config_file)], expected_exception=expected_exception)
 
+    def test_svg_reference_is_not_a_file(self) -> None:
+        """
+        The SVG path doesn't exist or is a directory.
+        """
+        reference = self.config_folder / "favicon_svg_scalable.svg"
+        os.remove(reference)
+        expected_exception = "\n".join(
+            (
+                f"favicon_svg reference ({reference}) doesn't exists.",
+                f"ABSOLUTE PATH: {reference.absolute()}",
+            ),
+        )
+        self.execute_cli(args=["-c", str(self.config_file), "--validate-only"], expected_exception=expected_exception)
+
+        os.makedirs(reference)
+        expected_exception = "\n".join(
+            (
+                f"favicon_svg reference ({reference}) must be a file, not a directory.",
+                f"ABSOLUTE PATH: {reference.absolute()}",
+            ),
+        )
+        self.execute_cli(args=["-c", str(self.config_file)], expected_exception=expected_exception)
+
+    def test_invalid_sitemap_urls(self) -> None:
+        """
+        The sitemap URLs file has an invalid line, or the config doesn't have a domain.
+        """
+        reference = self.config_folder / "urls.txt"
+        reference.write_text("https://sample.com/a\n\n{\"loc\": \"https://sample.com/b\", \"priority\": 2}\n")
+        self.config["sitemap_urls"] = "urls.txt"
+        self.write_config_file()
+        expected_exception = "\n".join(
+            (
+                f"Invalid URL in the line 3 of the sitemap_urls file ({reference})",
+                f"ABSOLUTE PATH: {reference.absolute()}",
+                "Exception: Invalid priority.",
+            ),
+        )
+        self.execute_cli(args=["-c", str(self.config_file), "--validate-only"], expected_exception=expected_exception)
+
+        self.config["domain"] = None
+        self.write_config_file()
+        self.execute_cli(args=["-c", str(self.config_file)], expected_exception="The key sitemap_urls requires the key domain, that is used in the sitemap index.")
+
+    def test_invalid_locales(self) -> None:
+        """
+        The locales have the same code, an invalid code, or the config doesn't have a domain.
+        """
+        expected_exception = "The language and territory of each locale must be letters and digits, and be different than the ones of the config and the other locales."
+        for locales in ([{"language": "en", "territory": "us"}], [{"language": "es"}, {"language": "es", "territory": None}], [{"language": "../es"}]):
+            self.config["locales"] = locales
+            self.write_config_file()
+            self.execute_cli(args=["-c", str(self.config_file)], expected_exception=expected_exception)
+
+        self.config["locales"] = [{"language": "es"}]
+        self.config["domain"] = None
+        self.write_config_file()
+        self.execute_cli(args=["-c", str(self.config_file)], expected_exception="The key locales requires the key domain, that is used in the alternate links.")
+
+    def test_invalid_pages(self) -> None:
+        """
+        The pages file has an invalid line.
+        """
+        reference = self.config_folder / "pages.jsonl"
+        reference.write_text('{"path": "a.html"}\n{"path": "../b.html"}\n')
+        self.config["pages"] = "pages.jsonl"
+        self.write_config_file()
+        expected_exception = "\n".join(
+            (
+                f"Invalid page in the line 2 of the pages file ({reference})",
+                f"ABSOLUTE PATH: {reference.absolute()}",
+                "Exception: Invalid path, it must be a relative .html path inside the output folder, different than index.html.",
+            ),
+        )
+        self.execute_cli(args=["-c", str(self.config_file), "--validate-only"], expected_exception=expected_exception)
+
     def test_image_reference_is_directory(self) -> None:
         """
         The image path is a directory.
@@ -204,6 +341,25 @@ class TestReferences(base_tests.BaseTests):
         )
         self.execute_cli(args=["-c", str(self.config_file)], expected_exception=expected_exception)
 
+    def test_truncated_image(self) -> None:
+        """
+        The image data is truncated, when it's checked and when it's decoded.
+        """
+        reference = self.config_folder / "favicon_png_2688px.png"
+        reference.write_bytes(reference.read_bytes()[: reference.stat().st_size // 2])
+        for args in (["-c", "--validate-only", str(self.config_file)], ["-c", "--no-cache", str(self.config_file)]):
+            with self.assertRaises(SystemExit) as exception:
+                self._execute_cli_silently(args=args)
+            self.assertIn(
+                "\n".join(
+                    (
+                        f"{info.PACKAGE_NAME}: error: Can't decode the favicon_png reference ({reference}).",
+                        f"ABSOLUTE PATH: {reference.absolute()}",
+                    ),
+                ),
+                str(exception.exception),
+            )
+
 
 class TestFileCreation(base_tests.BaseTests):
     """
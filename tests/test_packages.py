@@ -2,9 +2,40 @@
 """
 Test functions that can't be tested with the other tests.
 """
+import contextlib
+import gzip
+import io
+import json
+import os
+import pathlib
+import random
+import re
+import shutil
 import unittest
+import zlib
+from typing import List
+from unittest import mock
 
+import jinja2
+import PIL
+from PIL import Image
+from PIL import ImageChops
+from PIL import ImageStat
+
+from cushead.console.arguments import batch
+from cushead.console.arguments import files_creator
+from cushead.console.assets import assets
+from cushead.generator import cache
+from cushead.generator import compression
+from cushead.generator import files
 from cushead.generator import images
+from cushead.generator import pages
+from cushead.generator import precache
+from cushead.generator import report
+from cushead.generator import sitemaps
+from cushead.generator.templates import minifiers
+from cushead.generator.templates import templates
+from cushead.generator.templates.jinja import filters
 from tests import base_tests
 
 
@@ -21,6 +52,424 @@ class TestPackages(base_tests.BaseTests):
         self.assertIsNone(images.get_opaque_image(image=None, background_color=""))
         self.assertEqual(images.get_image_bytes(image=None), b"")
 
+        # The hash of an unchanged file is only computed once, and a changed file is read again.
+        path = self.config_folder / "digest.txt"
+        path.write_bytes(b"a")
+        with mock.patch.object(pathlib.Path, "read_bytes", autospec=True, side_effect=pathlib.Path.read_bytes) as read_bytes:
+            digest = images.get_file_digest(path=path)
+            self.assertEqual(images.get_file_digest(path=path), digest)
+            self.assertEqual(read_bytes.call_count, 1)
+            path.write_bytes(b"ab")
+            self.assertNotEqual(images.get_file_digest(path=path), digest)
+            self.assertEqual(read_bytes.call_count, 2)
+
+    def test_cushead_console_arguments_files_creator(self) -> None:
+        """
+        Test functions of 'cushead.console.arguments.files_creator'.
+        """
+        (self.config_folder / "blocked").write_bytes(b"")
+        files_to_create = (
+            files.File(path=self.config_folder / "created" / "b.txt", data=b"b"),
+            files.File(path=self.config_folder / "created" / "a.txt", data=b"a"),
+            files.File(path=self.config_folder / "blocked" / "b.txt", data=b"b"),
+        )
+        files_writer = files_creator.FilesWriter()
+        with io.StringIO() as buffer, contextlib.redirect_stdout(buffer):
+            files_creator.create_files(files_to_create=files_to_create, files_writer=files_writer)
+            output = buffer.getvalue()
+        self.assertEqual((self.config_folder / "created" / "a.txt").read_bytes(), b"a")
+        # The created files are printed sorted, not in the order they are generated.
+        self.assertLess(output.index("a.txt"), output.index("b.txt"))
+        self.assertEqual([error.path for error in files_writer.errors], [self.config_folder / "blocked"])
+
+        # The files already created, and the ones inside folders that can't be created, are skipped.
+        self.assertTrue(files_writer.skip_path(self.config_folder / "created" / "a.txt"))
+        self.assertTrue(files_writer.skip_path(self.config_folder / "blocked" / "c.txt"))
+        self.assertFalse(files_writer.skip_path(self.config_folder / "created" / "c.txt"))
+
+    def test_cushead_console_arguments_batch(self) -> None:
+        """
+        Test that only the images used by more than one site are stored in shared memory.
+        """
+        sites_folder = self.config_folder / "sites"
+        self.addCleanup(shutil.rmtree, sites_folder, ignore_errors=True)
+        for site, config_file in (
+            ("a", {"favicon_png": "../../favicon_png_2688px.png", "preview_png": "../../preview_png_600px.png"}),
+            ("b", {"favicon_png": "favicon.png"}),
+            ("c", {"favicon_png": "../../favicon_png_2688px.png", "preview_png": "preview.png"}),
+        ):
+            (sites_folder / site).mkdir(parents=True)
+            (sites_folder / site / "config.json").write_text(json.dumps(config_file))
+        # The same content in another file is shared too.
+        shutil.copyfile(self.config_folder / "favicon_png_2688px.png", sites_folder / "b" / "favicon.png")
+        Image.new("RGB", (2, 2)).save(sites_folder / "c" / "preview.png")
+        config_paths = sorted(sites_folder.glob("*/config.json"))
+
+        favicon_paths = {(self.config_folder / "favicon_png_2688px.png").resolve(), (sites_folder / "b" / "favicon.png").resolve()}
+        with batch.share_images(config_paths=config_paths) as shared_images:
+            self.assertEqual(set(shared_images), favicon_paths)
+            # Each preview image is used by a single site.
+            self.assertNotIn((self.config_folder / "preview_png_600px.png").resolve(), shared_images)
+            self.assertNotIn((sites_folder / "c" / "preview.png").resolve(), shared_images)
+            self.assertEqual(len({shared_image.name for shared_image in shared_images.values()}), 1)
+            self.assertEqual(batch.attach_image(shared_image=next(iter(shared_images.values()))).size, (2688, 2688))
+
+        # The images that don't fit in the maximum size, or when the shared memory can't be created, are left to the workers.
+        with batch.share_images(config_paths=config_paths, max_size=2688 * 2688 * 4 - 1) as shared_images:
+            self.assertEqual(shared_images, {})
+        with mock.patch.object(batch.shared_memory, "SharedMemory", side_effect=OSError):
+            with batch.share_images(config_paths=config_paths) as shared_images:
+                self.assertEqual(shared_images, {})
+
+    def test_cushead_generator_cache(self) -> None:
+        """
+        Test functions of 'cushead.generator.cache'.
+        """
+        disk_cache = cache.DiskCache(path=self.config_folder / "cache", max_size=20)
+        disk_cache_key = cache.get_key("a")
+        self.assertIsNone(disk_cache.get(key=cache.get_key("a")))
+        # The entries created with other versions of Pillow or zlib, that can be encoded differently, aren't used.
+        with mock.patch.object(PIL, "__version__", "0"):
+            self.assertNotEqual(cache.get_key("a"), disk_cache_key)
+        with mock.patch.object(zlib, "ZLIB_RUNTIME_VERSION", "0"):
+            self.assertNotEqual(cache.get_key("a"), disk_cache_key)
+        for index, key in enumerate((cache.get_key("a"), cache.get_key("b"), cache.get_key("c"))):
+            disk_cache.set(key=key, data=b"0123456789")
+            os.utime(disk_cache.get_entry_path(key=key), (index, index))
+        self.assertEqual(disk_cache.get(key=cache.get_key("a")), b"0123456789")
+
+        # "b" is the least recently used entry.
+        disk_cache.evict()
+        self.assertIsNone(disk_cache.get(key=cache.get_key("b")))
+        self.assertIsNotNone(disk_cache.get(key=cache.get_key("a")))
+        self.assertIsNotNone(disk_cache.get(key=cache.get_key("c")))
+
+        # The memory cache keeps the recently used entries, and reads the folder for the others.
+        memory_cache = cache.MemoryCache(path=self.config_folder / "cache", max_memory_size=20)
+        self.assertEqual(memory_cache.get(key=cache.get_key("a")), b"0123456789")
+        for key in (cache.get_key("d"), cache.get_key("e")):
+            memory_cache.set(key=key, data=b"0123456789")
+        self.assertEqual(list(memory_cache.entries), [cache.get_key("d"), cache.get_key("e")])
+        self.assertEqual(memory_cache.get(key=cache.get_key("d")), b"0123456789")
+        memory_cache = cache.MemoryCache()
+        memory_cache.set(key=cache.get_key("f"), data=b"0123456789")
+        self.assertEqual(memory_cache.get(key=cache.get_key("f")), b"0123456789")
+        self.assertIsNone(memory_cache.get(key=cache.get_key("a")))
+
+    def test_cushead_generator_images_downscale_pyramid(self) -> None:
+        """
+        Test the images resized from intermediate ones.
+        """
+        image = Image.open(io.BytesIO(assets.get_images().favicon_png.data))
+        sizes = ((1024, 1024), (310, 150), (120, 120), (16, 16))
+
+        # Without intermediates, the result is the same as resizing from the source.
+        pyramid = images.DownscalePyramid(image=image, sizes=sizes, ratio=float("inf"))
+        for width, height in sizes:
+            self.assertEqual(
+                images.get_image_bytes(image=pyramid.get_resized_image(width=width, height=height)),
+                images.get_image_bytes(image=images.get_resized_image(image=image, width=width, height=height)),
+            )
+
+        # With intermediates, the result is almost the same.
+        pyramid = images.DownscalePyramid(image=image, sizes=sizes, ratio=2)
+        self.assertEqual(pyramid.parents[(16, 16)], (120, 120))
+        for width, height in sizes:
+            difference = ImageChops.difference(
+                pyramid.get_resized_image(width=width, height=height),
+                images.get_resized_image(image=image, width=width, height=height),
+            )
+            self.assertLess(max(ImageStat.Stat(difference).mean), 2)
+
+    def test_cushead_generator_images_compositor(self) -> None:
+        """
+        Test that the boxes with the same contained size share the resized image.
+        """
+        image = Image.open(io.BytesIO(assets.get_images().favicon_png.data))
+        sizes = ((2048, 2732), (2732, 2048), (120, 120))
+        pyramid = images.DownscalePyramid(image=image, sizes=sizes)
+        self.assertEqual(pyramid.uses, {(2048, 2048): 2, (120, 120): 1})
+        with mock.patch.object(image, "resize", wraps=image.resize) as resize:
+            portrait = pyramid.get_resized_image(width=2048, height=2732, background_color="#00ff00")
+            landscape = pyramid.get_resized_image(width=2732, height=2048, background_color="#00ff00")
+        self.assertEqual(resize.call_count, 1)
+        self.assertEqual(portrait.getpixel((0, 0)), (0, 255, 0, 255))
+        self.assertEqual(landscape.getpixel((0, 0)), (0, 255, 0, 255))
+
+        # The thumbnails are forgotten after their last use.
+        self.assertNotIn((2048, 2048), pyramid.thumbnails)
+
+        # The result is the same as resizing and then replacing the transparency.
+        self.assertEqual(
+            images.get_image_bytes(image=pyramid.get_resized_image(width=120, height=120, background_color="#00ff00")),
+            images.get_image_bytes(
+                image=images.get_opaque_image(image=images.get_resized_image(image=image, width=120, height=120), background_color="#00ff00"),
+            ),
+        )
+
+    def test_cushead_generator_images_reduce_colors(self) -> None:
+        """
+        Test that the images are stored with the smallest color type, without losses.
+        """
+        favicon = images.get_resized_image(image=Image.open(io.BytesIO(assets.get_images().favicon_png.data)), width=512, height=512)
+        cases = (
+            (Image.new("RGBA", (64, 64), (10, 10, 10, 255)), "L"),
+            (Image.new("RGBA", (64, 64), (10, 20, 30, 128)), "P"),
+            (images.get_opaque_image(image=favicon, background_color="#ffffff", composite_alpha=True), "RGB"),
+            (images.get_opaque_image(image=favicon, background_color="#ffffff"), "RGBA"),
+            (favicon.convert("LA").convert("RGBA"), "LA"),
+            (favicon, "RGBA"),
+        )
+        for image, mode in cases:
+            image.format = "PNG"
+            reduced_image = images.get_reduced_image(image=image)
+            self.assertEqual(reduced_image.mode, mode)
+            with Image.open(io.BytesIO(images.get_image_bytes(image=reduced_image))) as saved_image:
+                self.assertIsNone(ImageChops.difference(saved_image.convert("RGBA"), image).getbbox())
+
+    def test_cushead_generator_templates_rendered_templates(self) -> None:
+        """
+        Test that the Subresource Integrity is computed from the rendered templates, rendering each one once.
+        """
+        template_loader = templates.TemplateLoader()
+        rendered_templates = templates.RenderedTemplates(template_loader=template_loader)
+        with mock.patch.object(template_loader, "render_template", wraps=template_loader.render_template) as render_template:
+            integrity = rendered_templates.get_integrity("styles.jinja2")
+            self.assertEqual(rendered_templates.get_integrity("styles.jinja2"), integrity)
+            data = rendered_templates.get_template(path="styles.jinja2")
+        render_template.assert_called_once_with(path="styles.jinja2", context=rendered_templates.context)
+        self.assertEqual(integrity, filters.generate_sri(data))
+        self.assertTrue(integrity.startswith("sha512-"))
+
+    def test_cushead_generator_templates_clean_chunks(self) -> None:
+        """
+        Test that cleaning a text in chunks gives the same result as cleaning the whole text.
+        """
+        generator = random.Random(0)
+        for _ in range(1000):
+            text = "".join(generator.choice("\n\n  x") for _ in range(generator.randint(0, 40)))
+            cuts = sorted(generator.sample(range(len(text) + 1), min(len(text) + 1, generator.randint(0, 6))))
+            chunks = [text[start:end] for start, end in zip([0, *cuts], [*cuts, len(text)])]
+            # The chunks that start and end with a character that isn't a space or a newline can be cleaned fragments.
+            chunks = [
+                templates.Fragment(re.sub("(\n +)+\n", "\n", chunk)) if chunk[:1].strip() and chunk[-1:].strip() and generator.random() < 0.5 else chunk
+                for chunk in chunks
+            ]
+            self.assertEqual(
+                "".join(templates.clean_chunks(chunks=chunks, buffer_size=generator.randint(1, 8))),
+                re.sub("((\n +)+\n)|(\n\n$)", "\n", text),
+            )
+
+    def test_cushead_generator_templates_fragments(self) -> None:
+        """
+        Test that each fragment is rendered once, and cleaned when it can be yielded as it is.
+        """
+        rendered_templates = templates.RenderedTemplates(template_loader=templates.get_template_loader())
+        caller = mock.Mock(return_value="<a>\n  \n</a>")
+        self.assertEqual(rendered_templates.get_fragment(name="a", caller=caller), templates.Fragment("<a>\n</a>"))
+        self.assertIsInstance(rendered_templates.get_fragment(name="a", caller=caller), templates.Fragment)
+        caller.assert_called_once()
+        self.assertNotIsInstance(rendered_templates.get_fragment(name="b", caller=lambda: "<b>\n  "), templates.Fragment)
+
+    def test_cushead_generator_templates_bytecode_cache(self) -> None:
+        """
+        Test that the compiled templates are reused by the next processes.
+        """
+        templates.get_template_loader.cache_clear()
+        cache_path = self.config_folder / "cache"
+        first_template = templates.get_template_loader(cache_path=cache_path).render_template(path="robots.jinja2", context={"config": {}})
+        self.assertIs(templates.get_template_loader(cache_path=cache_path), templates.get_template_loader(cache_path=cache_path))
+
+        # Simulate a new process.
+        templates.get_template_loader.cache_clear()
+        with mock.patch.object(jinja2.Environment, "compile") as compile_template:
+            second_template = templates.get_template_loader(cache_path=cache_path).render_template(path="robots.jinja2", context={"config": {}})
+        compile_template.assert_not_called()
+        self.assertEqual(first_template, second_template)
+        templates.get_template_loader.cache_clear()
+
+    def test_cushead_generator_templates_minifiers(self) -> None:
+        """
+        Test that the minifiers only remove what is safe to remove.
+        """
+        self.assertEqual(minifiers.minify_json('{\n  "a": [1, "b c"]\n}'), '{"a":[1,"b c"]}')
+        self.assertEqual(minifiers.minify_json("{"), "{")
+        self.assertEqual(minifiers.minify_css("/* a */\na :hover ,b > c {\n  content: 'x  y';\n  margin: 0 auto;\n}\n"), "a :hover,b>c{content:'x  y';margin:0 auto}")
+        self.assertEqual(
+            minifiers.minify_js("// a\nvar a = b / 2 /* c */ + +d;\nreturn\nx\nvar r = /\\/\\/ [/]/g.test('a  // b')\n"),
+            "var a=b/2+ +d;return\nx\nvar r=/\\/\\/ [/]/g.test('a  // b')",
+        )
+        self.assertEqual(minifiers.minify_js("var a = `${b}  c`;"), "var a = `${b}  c`;")
+        self.assertEqual(
+            minifiers.minify_html(
+                "<html>\n  <head>\n    <!-- a -->\n    <!--[if IE]><p>b</p><![endif]-->\n"
+                '    <script type="application/ld+json">\n      {"a": 1}\n    </script>\n  </head>\n'
+                '  <body>\n    <p title="a  b">c\n      d</p>\n    <pre>  e\n  f</pre>\n  </body>\n</html>\n'
+            ),
+            '<html><head><!--[if IE]><p>b</p><![endif]--><script type="application/ld+json">{"a":1}</script></head>'
+            '<body> <p title="a  b">c d</p> <pre>  e\n  f</pre> </body></html>',
+        )
+        self.assertEqual(minifiers.minify(data=b"User-agent: *\n", suffix=".txt"), b"User-agent: *\n")
+
+    def test_cushead_generator_compression(self) -> None:
+        """
+        Test the compressed copies of the files.
+        """
+        file = files.File(path=pathlib.Path("a.html"), data=b"<p>a</p>" * 100)
+        brotli = mock.Mock(MODE_TEXT=1, compress=mock.Mock(return_value=b"br"))
+        with mock.patch.object(compression, "brotli", brotli):
+            compressed_files = list(compression.generate_compressed_files(file=file))
+        self.assertEqual([compressed_file.path for compressed_file in compressed_files], [pathlib.Path("a.html.gz"), pathlib.Path("a.html.br")])
+        self.assertEqual(compressed_files[0].data, compression.compress_gzip(file.data))
+        brotli.compress.assert_called_once_with(file.data, mode=1, quality=11)
+
+        # Without brotli, only the gzip copy is created.
+        with mock.patch.object(compression, "brotli", None):
+            self.assertEqual([compressed_file.path for compressed_file in compression.generate_compressed_files(file=file)], [pathlib.Path("a.html.gz")])
+        self.assertFalse(list(compression.generate_compressed_files(file=files.File(path=pathlib.Path("a.png"), data=file.data))))
+        self.assertFalse(list(compression.generate_compressed_files(file=files.File(path=pathlib.Path("a.js"), data=b"a"))))
+
+    def test_cushead_generator_precache(self) -> None:
+        """
+        Test the files precached by the service worker.
+        """
+        output_folder = pathlib.Path("output")
+        config = {
+            "output_folder_path": output_folder,
+            "static_url": "https://cdn.sample.com/static",
+            "precache_budget": 25,
+            "precache_include": ["static/*.css", "*.json", "static/*"],
+            "precache_exclude": ["static/*.png"],
+        }
+        assets = (
+            precache.Asset(path=output_folder / "static" / "a.png", size=1, revision="a"),
+            precache.Asset(path=output_folder / "static" / "b.js", size=20, revision="b"),
+            precache.Asset(path=output_folder / "static" / "c.js", size=10, revision="c"),
+            precache.Asset(path=output_folder / "static" / "d.css", size=5, revision="d"),
+            precache.Asset(path=output_folder / "manifest.json", size=5, revision="e"),
+        )
+
+        # The patterns set the order, and the files that don't fit in the budget are skipped.
+        self.assertEqual(
+            precache.get_precache_entries(config=config, assets=assets),
+            [
+                precache.PrecacheEntry(url="https://cdn.sample.com/static/d.css", revision="d"),
+                precache.PrecacheEntry(url="/manifest.json", revision="e"),
+                precache.PrecacheEntry(url="https://cdn.sample.com/static/c.js", revision="c"),
+            ],
+        )
+        self.assertEqual(precache.get_asset(file=files.File(path=output_folder / "a.js", data=b"a")).revision, templates.get_template_hash(template=b"a"))
+
+    def test_cushead_generator_sitemaps(self) -> None:
+        """
+        Test that the sitemaps are split at the protocol limits.
+        """
+        urls = [sitemaps.SitemapUrl(loc=f"https://sample.com/{index}?a&b") for index in range(5)]
+        url_size = len(sitemaps.get_url_element(url=urls[0]))
+        urls_path = self.config_folder / "urls.txt"
+        urls_path.write_text("\n".join(url.loc for url in urls))
+        config = {"sitemap_urls": urls_path, "output_folder_path": self.output_folder}
+        with mock.patch.object(sitemaps, "MAX_URLS", 2):
+            sitemaps_data = [gzip.decompress(file.data) for file in sitemaps.generate_sitemaps(config=config, sitemap_names=[])]
+        self.assertEqual([sitemap_data.count(b"<url>") for sitemap_data in sitemaps_data], [2, 2, 1])
+        self.assertIn(b"<loc>https://sample.com/4?a&amp;b</loc>", sitemaps_data[2])
+
+        max_size = len(sitemaps.SITEMAP_HEADER) + 3 * url_size + len(sitemaps.SITEMAP_FOOTER)
+        with mock.patch.object(sitemaps, "MAX_SIZE", max_size):
+            sitemaps_data = [gzip.decompress(file.data) for file in sitemaps.generate_sitemaps(config=config, sitemap_names=[])]
+        self.assertEqual([len(sitemap_data) for sitemap_data in sitemaps_data], [max_size, max_size - url_size])
+        urls_path.write_text("")
+        self.assertFalse(list(sitemaps.generate_sitemaps(config=config, sitemap_names=[])))
+
+        # The skipped sitemaps are named and referenced, but they aren't compressed.
+        urls_path.write_text("\n".join(url.loc for url in urls))
+        sitemap_names: List[str] = []
+        with mock.patch.object(sitemaps, "MAX_URLS", 2), mock.patch.object(sitemaps, "compress_sitemap", wraps=sitemaps.compress_sitemap) as compress_sitemap:
+            sitemap_files = list(sitemaps.generate_sitemaps(config=config, sitemap_names=sitemap_names, skip_path=lambda path: path.name == "sitemap-2.xml.gz"))
+        self.assertEqual(sitemap_names, ["sitemap-1.xml.gz", "sitemap-2.xml.gz", "sitemap-3.xml.gz"])
+        self.assertEqual([file.path.name for file in sitemap_files], ["sitemap-1.xml.gz", "sitemap-3.xml.gz"])
+        self.assertEqual(compress_sitemap.call_count, 2)
+        self.assertIn(b"<loc>https://sample.com/4?a&amp;b</loc>", gzip.decompress(sitemap_files[1].data))
+
+        # The lines are URLs, or objects with their data.
+        self.assertEqual(
+            sitemaps.parse_url(line='{"loc": "https://sample.com/", "lastmod": "2021-01-01", "changefreq": "daily", "priority": 0.5}'),
+            sitemaps.SitemapUrl(loc="https://sample.com/", lastmod="2021-01-01", changefreq="daily", priority=0.5),
+        )
+        for line in ("sample.com", '{"loc": "https://sample.com/", "title": "a"}', '{"loc": "https://sample.com/", "changefreq": "often"}'):
+            with self.assertRaises(ValueError):
+                sitemaps.parse_url(line=line)
+
+    def test_cushead_generator_pages(self) -> None:
+        """
+        Test functions of 'cushead.generator.pages'.
+        """
+        self.assertEqual(pages.parse_page(line='{"path": "blog/index.html", "title": "Blog"}'), pages.Page(path="blog/index.html", title="Blog"))
+        for line in (
+            '{"title": "a"}',
+            '{"path": "a.html", "lang": "en"}',
+            '{"path": "a.html", "title": 1}',
+            '{"path": "../a.html"}',
+            '{"path": "/a.html"}',
+            '{"path": "a.txt"}',
+            '{"path": "index.html"}',
+            "[]",
+        ):
+            with self.assertRaises((ValueError, TypeError)):
+                pages.parse_page(line=line)
+
+        # The canonical URL is the one of the record, or the path in the domain.
+        config = {"domain": "sample.com"}
+        self.assertEqual(pages.get_page_url(config=config, page=pages.Page(path="blog/index.html")), "https://sample.com/blog/")
+        self.assertEqual(pages.get_page_url(config=config, page=pages.Page(path="a.html", url="https://a.com/")), "https://a.com/")
+        self.assertIsNone(pages.get_page_url(config={"domain": None}, page=pages.Page(path="a.html")))
+
+    def test_cushead_generator_images_render_once(self) -> None:
+        """
+        Test that the images with the same render key are rendered once.
+        """
+        image = Image.new("RGBA", (64, 64), (255, 0, 0, 128))
+        image.format = "PNG"
+        images_data = (
+            images.ImageData(path=pathlib.Path("a.png"), width=32, height=32),
+            images.ImageData(path=pathlib.Path("b.png"), width=16, height=16),
+            images.ImageData(path=pathlib.Path("c.png"), width=32, height=32),
+            images.ImageData(path=pathlib.Path("d.png"), width=32, height=32, background_color="#fff"),
+        )
+        with mock.patch.object(images, "render_image", wraps=images.render_image) as render_image:
+            generated_images = list(images.generate_images_in_parallel(image=image, images_data=images_data, jobs=2))
+        self.assertEqual(render_image.call_count, 3)
+        self.assertEqual([image.path for image in generated_images], [image_data.path for image_data in images_data])
+        self.assertEqual(generated_images[0].data, generated_images[2].data)
+        self.assertNotEqual(generated_images[0].data, generated_images[3].data)
+
+    def test_cushead_generator_images_png_profiles(self) -> None:
+        """
+        Test the PNG profiles.
+        """
+        image = images.get_resized_image(image=Image.open(io.BytesIO(assets.get_images().favicon_png.data)), width=310, height=150)
+        with io.BytesIO() as io_file:
+            image.save(io_file, format="PNG")
+            default_bytes = io_file.getvalue()
+        profiles_bytes = {png_profile: images.get_image_bytes(image=image, png_profile=png_profile) for png_profile in images.PNG_PROFILES}
+
+        # The balanced profile uses the Pillow defaults, and all the profiles are lossless.
+        self.assertEqual(profiles_bytes["balanced"], default_bytes)
+        self.assertLess(len(profiles_bytes["smallest"]), len(profiles_bytes["balanced"]))
+        self.assertLess(len(profiles_bytes["balanced"]), len(profiles_bytes["fast"]))
+        for data in profiles_bytes.values():
+            self.assertIsNone(ImageChops.difference(Image.open(io.BytesIO(data)), image).getbbox())
+
+        # The profile is part of the render key, and the encoded images are reported.
+        build_report = report.BuildReport()
+        images_data = (images.ImageData(path=pathlib.Path("a.png"), width=310, height=150),)
+        generated_images = list(
+            images.generate_images_in_parallel(image=image, images_data=images_data, jobs=1, png_profile="fast", report=build_report)
+        )
+        self.assertEqual(generated_images[0].data, profiles_bytes["fast"])
+        self.assertEqual(build_report.encoded_images["fast"].images, 1)
+        self.assertEqual(build_report.encoded_images["fast"].size, len(profiles_bytes["fast"]))
+
 
 if __name__ == "__main__":
     unittest.main()